@@ -3,61 +3,244 @@ Flask Application for Skin Disease Expert System
 Handles routes and API endpoints for multi-page navigation
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, abort, render_template, request, jsonify, session
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+from backend.analysis import analyze
 from backend.inference_engine import InferenceEngine
-from backend.knowledge_base import (
-    QUESTIONS, INPUT_VARIABLES, OUTPUT_VARIABLES, 
-    DISEASE_RULES, TREATMENT_RULES, LIFESTYLE_RULES, DIET_RULES
+from backend.knowledge_loader import KnowledgeBaseWatcher
+from backend.payloads import (
+    HtmlPayload, PayloadCache, documentation_payload, questions_payload,
+    recommendation_details_payload, with_recommendation_details
 )
+from backend.result_store import create_result_store
+from backend.rule_order import load_profile
+from backend import serialization
+import click
+import os
 import secrets
+import shutil
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by backend.serialization: orjson when it is
+    installed, the standard library otherwise
+
+    Calls with options that orjson does not support, such as the
+    object_hook and separators of the session cookie serializer, are left
+    to the standard library.
+    """
+    
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {'sort_keys', 'indent'}:
+            return super().dumps(obj, **kwargs)
+        return serialization.dumps(
+            obj, kwargs.get('sort_keys', self.sort_keys), bool(kwargs.get('indent')), self.default
+        )
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return serialization.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = serialization.dumps_bytes(obj, self.sort_keys, indent, self.default)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
 
 app = Flask(__name__, 
             template_folder='frontend/templates',
             static_folder='frontend/static')
-app.secret_key = secrets.token_hex(16)
+app.json = FastJSONProvider(app)
+app.config.from_object(Config)
+if not app.secret_key:
+    # Sessions then only last until the server restarts
+    app.logger.warning('SKIN_ES_SECRET_KEY is not set, using a random session key')
+    app.secret_key = secrets.token_hex(16)
 
 # Initialize inference engine
-engine = InferenceEngine()
+engine = InferenceEngine(
+    compiled=app.config['COMPILED_ENGINE'],
+    cache_size=app.config['RESULT_CACHE_SIZE'],
+    knowledge_base=app.config['KNOWLEDGE_BASE'],
+    metrics=app.config['METRICS'],
+    rule_profile=load_profile(app.config['RULE_PROFILE']) if app.config['RULE_PROFILE'] else None
+)
+
+
+def log_analysis(knowledge_base):
+    """Log the errors and warnings of the static analysis of a knowledge base"""
+    if not app.config['ANALYZE_KNOWLEDGE_BASE']:
+        return
+    for finding in analyze(knowledge_base)['findings']:
+        if finding['severity'] == 'error':
+            app.logger.error('Knowledge base %s: %s', knowledge_base.version, finding['message'])
+        elif finding['severity'] == 'warning':
+            app.logger.warning('Knowledge base %s: %s', knowledge_base.version, finding['message'])
+
+
+def reload_knowledge_base():
+    """Reload the knowledge base from its files and analyze a new version"""
+    if engine.reload():
+        log_analysis(engine.knowledge_base)
+
+
+log_analysis(engine.knowledge_base)
+
+# Hot-reload the knowledge base when its data files change
+if app.config['KNOWLEDGE_BASE'] and app.config['KNOWLEDGE_BASE_POLL_INTERVAL'] > 0:
+    kb_watcher = KnowledgeBaseWatcher(
+        app.config['KNOWLEDGE_BASE'], reload_knowledge_base, app.config['KNOWLEDGE_BASE_POLL_INTERVAL']
+    )
+    kb_watcher.start()
+
+# Diagnosis results, referenced from the session by id
+result_store = create_result_store(app.config['RESULT_STORE'], app.config['RESULT_TTL'])
+
+# Serialized /api/questions and /api/documentation bodies and rendered pages
+payloads = PayloadCache()
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/ndjson')
+
+
+# Page templates by route. They take no request context, so each one is
+# rendered once per knowledge base version and served from memory.
+PAGES = {
+    '/': 'index.html',
+    '/diagnosis': 'diagnosis.html',
+    '/documentation': 'documentation.html',
+    '/report': 'report.html'
+}
 
 
 @app.route('/')
 def index():
     """Main landing page with Start Diagnosis button"""
-    return render_template('index.html')
+    return _page_response('index.html')
 
 
 @app.route('/diagnosis')
 def diagnosis():
     """Diagnosis page for input selection"""
-    return render_template('diagnosis.html')
+    return _page_response('diagnosis.html')
 
 
 @app.route('/documentation')
 def documentation():
     """Documentation page with system information"""
-    return render_template('documentation.html')
+    return _page_response('documentation.html')
 
 
 @app.route('/report')
 def report():
     """Diagnosis report page"""
-    return render_template('report.html')
+    return _page_response('report.html')
+
+
+def _page_payload(template):
+    """Rendered page, keyed by script root since it appears in the page's URLs"""
+    return payloads.get(
+        ('page', template, request.script_root), engine.knowledge_base,
+        lambda kb: render_template(template), HtmlPayload
+    )
+
+
+def _page_response(template):
+    """Serve a page rendered once, revalidated by browsers after PAGE_MAX_AGE"""
+    return _cached_response(_page_payload(template), app.config['PAGE_MAX_AGE'])
 
 
 @app.route('/api/questions', methods=['GET'])
 def get_questions():
     """Get all questions for diagnosis form"""
-    return jsonify({
-        'success': True,
-        'questions': QUESTIONS
-    })
+    return _payload_response('questions', questions_payload)
+
+
+def _payload_response(name, build):
+    """
+    Serve an API payload serialized once per knowledge base version. It is
+    revalidated on every use, so clients never keep questions or options
+    of a knowledge base version that was reloaded since.
+    """
+    payload = payloads.get(name, engine.knowledge_base, build)
+    return _cached_response(payload, 0)
+
+
+def _cached_response(payload, max_age):
+    """
+    Serve a prepared payload, gzip-compressed when the client accepts it,
+    answering conditional requests with 304 Not Modified. A max_age of 0
+    marks it no-cache: stored, but revalidated with its ETag on every use.
+    """
+    compressed = 'gzip' in request.accept_encodings
+    etag = payload.gzip_etag if compressed else payload.etag
+    
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(payload.gzip_body if compressed else payload.body,
+                            mimetype=payload.mimetype)
+        if compressed:
+            response.content_encoding = 'gzip'
+    
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def warm_up():
+    """
+    Build the payloads, pages, decision table and top question tree levels
+    that would otherwise be built on first use. A preforking server calls this
+    once in the master so that every worker shares the results
+    copy-on-write.
+    """
+    kb = engine.knowledge_base
+    payloads.get('questions', kb, questions_payload)
+    payloads.get('documentation', kb, documentation_payload)
+    payloads.get('recommendation_details', kb, recommendation_details_payload)
+    
+    with app.test_request_context('/'):
+        for template in PAGES.values():
+            _page_payload(template)
+    
+    engine.warm_up()
+
+
+@app.cli.command('export-static')
+@click.argument('directory')
+@click.option('--gzip', 'precompress', is_flag=True, help='Also write .gz copies of the pages.')
+def export_static(directory, precompress):
+    """Render the pages and copy the static assets into DIRECTORY for a CDN"""
+    with app.test_request_context('/'):
+        for route, template in PAGES.items():
+            payload = _page_payload(template)
+            path = os.path.join(directory, route.strip('/'), 'index.html')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(payload.body)
+            if precompress:
+                with open(path + '.gz', 'wb') as f:
+                    f.write(payload.gzip_body)
+            click.echo(f'{route} -> {path}')
+    
+    shutil.copytree(app.static_folder, os.path.join(directory, 'static'), dirs_exist_ok=True)
+    click.echo(f"{app.static_folder} -> {os.path.join(directory, 'static')}")
 
 
 @app.route('/api/diagnose', methods=['POST'])
 def diagnose():
     """Run inference engine with all answers and return complete diagnosis"""
-    data = request.json
-    answers = data.get('answers', {})
+    data = request.get_json(silent=True)
+    answers = data.get('answers', {}) if isinstance(data, dict) else None
     
     if not answers:
         return jsonify({
@@ -65,103 +248,261 @@ def diagnose():
             'message': 'No answers provided. Please complete all fields.'
         })
     
-    # Store answers in session for report page
-    session['answers'] = answers
+    # Reject malformed answers before any inference or session write
+    errors = engine.validate(answers)
+    if errors:
+        return _invalid_answers(errors)
     
     # Run inference
     result = engine.diagnose(answers)
+    _store_result(answers, result)
     
-    # Store result in session
-    session['diagnosis_result'] = result
-    
-    return jsonify(result)
+    return jsonify(_present(result))
 
 
-@app.route('/api/get-result', methods=['GET'])
-def get_result():
-    """Get stored diagnosis result for report page"""
-    result = session.get('diagnosis_result')
-    answers = session.get('answers', {})
+def _requested(option, value):
+    """
+    Whether a response option was requested, as ?option=value or as
+    "option": value in the request body
+    """
+    requested = request.args.get(option)
+    if requested is None:
+        data = request.get_json(silent=True)
+        requested = data.get(option) if isinstance(data, dict) else None
+    return str(requested).lower() == value
+
+
+def _presentation():
+    """Response options of the current request: (details, compact explanation)"""
+    return _requested('details', 'true'), _requested('explanation', 'ids')
+
+
+def _present(result, presentation=None):
+    """
+    Result as sent to the client: with the educational details of its
+    recommendations on ?details=true, and with an explanation listing rule
+    ids only on ?explanation=ids
+    """
+    details, compact = presentation or _presentation()
+    if details:
+        result = with_recommendation_details(result, engine.knowledge_base)
+    if compact:
+        result = serialization.compact_result(result)
+    return result
+
+
+def _invalid_answers(errors, **extra):
+    """400 response for answers that failed validation"""
+    return jsonify({
+        'success': False,
+        'message': 'Some answers are not valid. See errors for details.',
+        'errors': errors,
+        **extra
+    }), 400
+
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """Reject bodies larger than MAX_CONTENT_LENGTH without reading them"""
+    return jsonify({
+        'success': False,
+        'message': f"Request body exceeds {app.config['MAX_CONTENT_LENGTH']} bytes."
+    }), 413
+
+
+def _store_result(answers, result):
+    """Store answers and result server-side, only their id goes in the session"""
+    _store_in_session('result_id', {
+        'answers': answers,
+        'result': result
+    })
+
+
+def _store_in_session(key, value):
+    """
+    Store a value under the session's id for key, overwriting the value
+    stored there before: a session keeps one entry per key in the store,
+    however often it is updated.
+    """
+    session[key] = result_store.put(value, session.get(key))
+
+
+@app.route('/api/session/answer', methods=['POST'])
+def session_answer():
+    """
+    Push newly answered questions into the step-by-step session
+    
+    Only the rules that test the given answers are re-checked. The response
+    lists the diseases still possible and those ruled out; once no further
+    answer can change the outcome it is 'complete' and carries the final
+    diagnosis, stored for the report page like /api/diagnose.
     
-    if not result:
+    The session keeps one stored state, which every push updates in place.
+    Answers equal to the stored ones are skipped, so a client may send the
+    whole form (None for unanswered questions) on every push.
+    """
+    data = request.get_json(silent=True)
+    answers = data.get('answers') if isinstance(data, dict) else None
+    
+    if answers is None:
         return jsonify({
             'success': False,
-            'message': 'No diagnosis result found. Please complete the diagnosis first.'
+            'message': 'No answers provided. Send {"answers": {"question_id": value}}.'
         })
     
+    errors = engine.validate(answers)
+    if errors:
+        return _invalid_answers(errors)
+    
+    match_id = session.get('match_id')
+    stored = result_store.get(match_id) if match_id else None
+    state, progress = engine.match(stored and stored['state'], answers)
+    _store_in_session('match_id', {'state': state})
+    
+    if progress['complete']:
+        result = engine.diagnose(state['answers'])
+        _store_result(state['answers'], result)
+        progress['result'] = _present(result)
+    
     return jsonify({
-        **result,
-        'user_answers': answers
+        'success': True,
+        **progress
     })
 
 
-@app.route('/api/documentation', methods=['GET'])
-def get_documentation():
-    """Get system documentation data"""
-    # Format rules for display
-    all_rules = []
-    
-    # Layer 1: Disease Rules
-    for rule in DISEASE_RULES:
-        all_rules.append({
-            'layer': 1,
-            'layer_name': 'Disease Identification',
-            'id': rule['id'],
-            'name': rule['name'],
-            'logic': rule['logic'],
-            'conclusion': rule['conclusion']
-        })
+@app.route('/api/diagnose/batch', methods=['POST'])
+def diagnose_batch():
+    """
+    Run inference for many answer sets in one request
     
-    # Layer 2: Treatment Rules
-    for rule in TREATMENT_RULES:
-        all_rules.append({
-            'layer': 2,
-            'layer_name': 'Suggested Treatment',
-            'id': rule['id'],
-            'name': rule['name'],
-            'logic': rule['logic'],
-            'conclusion': rule['conclusion']
-        })
+    Accepts a JSON array of answer objects (or {"answers": [...]}) or an
+    NDJSON stream with one answer object per line. Results come back in
+    input order, as NDJSON when the request was NDJSON. Nothing is written
+    to the session.
+    """
+    ndjson = request.mimetype in NDJSON_MIMETYPES
     
-    # Layer 3: Lifestyle Rules
-    for rule in LIFESTYLE_RULES:
-        conclusion = rule['conclusion']
-        if isinstance(conclusion, list):
-            conclusion = ' OR '.join(conclusion)
-        all_rules.append({
-            'layer': 3,
-            'layer_name': 'Suggested Lifestyle',
-            'id': rule['id'],
-            'name': rule['name'],
-            'logic': rule['logic'],
-            'conclusion': conclusion
-        })
+    if ndjson:
+        items = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(serialization.loads(line))
+            except ValueError:
+                items.append(None)
+    else:
+        items = request.get_json(silent=True)
+        if isinstance(items, dict):
+            items = items.get('answers')
     
-    # Layer 4: Diet Rules
-    for rule in DIET_RULES:
-        conclusion = rule['conclusion']
-        if isinstance(conclusion, list):
-            conclusion = ' OR '.join(conclusion)
-        all_rules.append({
-            'layer': 4,
-            'layer_name': 'Diet Recommendation',
-            'id': rule['id'],
-            'name': rule['name'],
-            'logic': rule['logic'],
-            'conclusion': conclusion
+    if not isinstance(items, list) or not items:
+        return jsonify({
+            'success': False,
+            'message': 'No answer sets provided. Send a JSON array or NDJSON stream of answers.'
         })
     
+    errors = []
+    for index, answers in enumerate(items):
+        if isinstance(answers, dict) and not answers:
+            item_errors = [{'field': None, 'code': 'empty', 'message': 'Answers must not be empty.'}]
+        else:
+            item_errors = engine.validate(answers)
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+    if errors:
+        return _invalid_answers(errors, invalid_indexes=[error['index'] for error in errors])
+    
+    presentation = _presentation()
+    results = [_present(result, presentation) for result in engine.diagnose_many(items)]
+    
+    if ndjson:
+        return Response(
+            (serialization.dumps_bytes(result) + b'\n' for result in results),
+            mimetype='application/x-ndjson'
+        )
+    
+    return jsonify({
+        'success': True,
+        'count': len(results),
+        'results': results
+    })
+
+
+@app.route('/api/next-question', methods=['POST'])
+def next_question():
+    """
+    Adaptive questionnaire: get the most informative question to ask next
+    given the answers so far, or the final diagnosis once it is fixed
+    """
+    data = request.get_json(silent=True)
+    if data is None and request.get_data():
+        return _invalid_answers([
+            {'field': None, 'code': 'invalid_json', 'message': 'Request body must be a JSON object.'}
+        ])
+    # No body at all asks for the first question
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return _invalid_answers([
+            {'field': None, 'code': 'invalid_type', 'message': 'Request body must be a JSON object.'}
+        ])
+    answers = data.get('answers', {})
+    
+    errors = engine.validate(answers)
+    if errors:
+        return _invalid_answers(errors)
+    
+    step = engine.next_question(answers)
+    
+    if step['complete']:
+        _store_result(answers, step['result'])
+        step['result'] = _present(step['result'])
+    
     return jsonify({
         'success': True,
-        'input_variables': INPUT_VARIABLES,
-        'output_variables': OUTPUT_VARIABLES,
-        'rules': all_rules
+        **step
+    })
+
+
+@app.route('/api/recommendation-details', methods=['GET'])
+def get_recommendation_details():
+    """Get the educational details of every treatment, lifestyle and diet recommendation"""
+    return _payload_response('recommendation_details', recommendation_details_payload)
+
+
+@app.route('/api/get-result', methods=['GET'])
+def get_result():
+    """Get stored diagnosis result for report page"""
+    result_id = session.get('result_id')
+    stored = result_store.get(result_id) if result_id else None
+    
+    if not stored:
+        return jsonify({
+            'success': False,
+            'message': 'No diagnosis result found. Please complete the diagnosis first.'
+        })
+    
+    return jsonify({
+        **_present(stored['result']),
+        'user_answers': stored['answers']
     })
 
 
+@app.route('/api/documentation', methods=['GET'])
+def get_documentation():
+    """Get system documentation data"""
+    return _payload_response('documentation', documentation_payload)
+
+
 @app.route('/api/reset', methods=['POST'])
 def reset():
     """Reset session and clear diagnosis"""
+    for key in ('result_id', 'match_id'):
+        stored_id = session.get(key)
+        if stored_id:
+            result_store.delete(stored_id)
     session.clear()
     return jsonify({
         'success': True,
@@ -169,5 +510,16 @@ def reset():
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Engine metrics in Prometheus text format, 404 unless SKIN_ES_METRICS is set"""
+    if engine.metrics is None:
+        abort(404)
+    return Response(
+        engine.metrics.render(engine.knowledge_base, engine.cache),
+        mimetype='text/plain; version=0.0.4'
+    )
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
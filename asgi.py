@@ -0,0 +1,216 @@
+"""
+ASGI Entry Point for Skin Disease Expert System
+Serves the Flask app of app.py to ASGI servers, so that slow clients hold an
+open connection while their request body arrives instead of a worker thread
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi:application
+    hypercorn asgi:application
+
+Every request is handled by the Flask app itself: routes, sessions and
+error responses are the same as under a WSGI server. The body is read
+asynchronously, then the app runs in a thread, or directly on the event
+loop for the routes that only read memory once the app is warmed up.
+"""
+
+import asyncio
+import io
+import sys
+
+from app import app, engine, result_store, warm_up
+from backend import serialization
+from backend.result_store import MemoryResultStore
+
+# ============================================
+# ROUTING
+# ============================================
+
+# Routes served from prepared payloads and pages: cheaper to run on the
+# event loop than to hand to a thread
+MEMORY_ROUTES = {
+    ('GET', '/'), ('GET', '/diagnosis'), ('GET', '/documentation'), ('GET', '/report'),
+    ('GET', '/api/questions'), ('GET', '/api/documentation'), ('GET', '/api/recommendation-details')
+}
+
+# Routes that are a table lookup plus a result store access, run on the
+# event loop only when the store is in memory
+STORE_ROUTES = {
+    ('POST', '/api/diagnose'), ('POST', '/api/session/answer'),
+    ('GET', '/api/get-result'), ('POST', '/api/reset')
+}
+
+
+def runs_inline(method, path):
+    """
+    Whether a request runs on the event loop rather than in a thread.
+    Batches, the question tree, static files and anything that may wait
+    on a database or the disk always run in a thread, and so do the store
+    routes until the decision table is built: building it on the event
+    loop would stall every connection.
+    """
+    if (method, path) in MEMORY_ROUTES:
+        return True
+    return (method, path) in STORE_ROUTES and isinstance(result_store, MemoryResultStore) \
+        and _table_ready()
+
+
+def _table_ready():
+    """Whether diagnoses are table lookups rather than a first table build"""
+    return not engine.compiled or engine._snapshot.decision_table is not None
+
+
+# ============================================
+# ASGI APPLICATION
+# ============================================
+
+async def application(scope, receive, send):
+    """
+    ASGI application running the Flask app
+    """
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    try:
+        body, length = await _read_body(scope, receive)
+    except ValueError:
+        await _send(send, 400, [('Content-Type', 'application/json')], serialization.dumps_bytes(
+            {'message': 'Invalid Content-Length header.', 'success': False}, sort_keys=True
+        ) + b'\n')
+        return
+
+    environ = _environ(scope, body, length)
+    if runs_inline(scope['method'], environ['PATH_INFO']):
+        status, headers, body = _call_flask(environ)
+    else:
+        status, headers, body = await asyncio.to_thread(_call_flask, environ)
+
+    await _send(send, status, headers, body)
+
+
+async def _lifespan(receive, send):
+    """Warm up the app before the server accepts requests"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.to_thread(warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _read_body(scope, receive):
+    """
+    Read the request body
+
+    A body larger than MAX_CONTENT_LENGTH is not read: the app gets its
+    length and an empty stream, and answers 413 when it reads the body,
+    as it does under a WSGI server.
+
+    Returns:
+        tuple: (body, length announced to the app)
+
+    Raises:
+        ValueError: If the Content-Length header is not a number
+    """
+    limit = app.config['MAX_CONTENT_LENGTH']
+    length = None
+
+    for name, value in scope['headers']:
+        if name.lower() == b'content-length':
+            if not value.strip().isdigit():
+                raise ValueError('Invalid Content-Length header')
+            length = int(value)
+    if limit is not None and length is not None and length > limit:
+        return b'', length
+
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            return b'', size
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            break
+
+    return b''.join(chunks), size
+
+
+async def _send(send, status, headers, body):
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+               if name.lower() != 'content-length']
+    headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# ============================================
+# WSGI BRIDGE
+# ============================================
+
+def _environ(scope, body, length):
+    """WSGI environ of an ASGI HTTP request"""
+    server = scope.get('server') or ('localhost', 80)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    # Servers may or may not include the root path in the path
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(length)
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _call_flask(environ):
+    """
+    Run the Flask app for one request, buffering its response
+
+    Returns:
+        tuple: (status code, headers, body)
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    chunks = app(environ, start_response)
+    try:
+        body = b''.join(chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+    return started['status'], started['headers'], body
@@ -3,6 +3,7 @@ Backend package for Skin Disease Expert System
 """
 
 from .inference_engine import InferenceEngine
+from .knowledge_loader import KnowledgeBase, default_knowledge_base, load_knowledge_base
 from .knowledge_base import (
     QUESTIONS,
     INPUT_VARIABLES,
@@ -17,6 +18,9 @@ from .knowledge_base import (
 
 __all__ = [
     'InferenceEngine',
+    'KnowledgeBase',
+    'default_knowledge_base',
+    'load_knowledge_base',
     'QUESTIONS',
     'INPUT_VARIABLES',
     'OUTPUT_VARIABLES',
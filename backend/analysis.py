@@ -0,0 +1,295 @@
+"""
+Static Analysis for Skin Disease Expert System
+Finds rules and values of a knowledge base that can never take effect
+
+Every accepted answer set is considered: each question answered with one of
+its values or left unanswered, and any selection of appearance values.
+Values that no rule tells apart are evaluated once and counted with their
+multiplicity, which keeps the input space down to a few thousand records.
+"""
+
+from itertools import product
+
+from backend.encoding import AnswerCodec
+from backend.rule_compiler import disease_rule_masks, rule_masks
+from backend.rules import compile_rules
+
+# Output variable concluded by each layer
+LAYER_OUTPUTS = {1: 'disease', 2: 'treatment', 3: 'lifestyle', 4: 'diet'}
+
+SEVERITIES = ('error', 'warning', 'info')
+
+
+def analyze(knowledge_base):
+    """
+    Analyze a knowledge base
+
+    Findings, each a dict with 'severity', 'kind', 'rule' (None when not
+    about one rule) and 'message':
+
+    - unknown_fact (error): a rule tests a fact that is not an input
+      variable; the engine cannot compile it, and the rest of the analysis
+      leaves it out
+    - dead_value (warning): a rule tests a value its question does not offer
+    - question_mismatch (warning): question options differ from the values
+      of their input variable
+    - never_matches (error): a rule that no accepted answer set satisfies
+    - shadowed (error): a disease rule that matches some answer sets but
+      always after an earlier rule fired
+    - partially_shadowed (info): a disease rule that an earlier rule
+      pre-empts on some of the answer sets it matches
+    - unreachable_rule (error): a layer 2-4 rule that no diagnosis fires
+    - unreachable_value (warning): an output value no answer set produces
+    - undeclared_value (warning): a conclusion missing from OUTPUT_VARIABLES
+
+    Returns:
+        dict: 'answer_sets' (number of accepted answer sets), 'no_diagnosis'
+            (how many of them get no diagnosis) and 'findings'
+    """
+    kb = knowledge_base
+    layers = {1: kb.disease_rules, 2: kb.treatment_rules, 3: kb.lifestyle_rules, 4: kb.diet_rules}
+    codec = AnswerCodec(
+        kb.input_variables, kb.all_rules,
+        kb.output_variables['disease']['possible_values'] + [rule['conclusion'] for rule in kb.disease_rules]
+    )
+    findings = _unknown_fact_findings(codec, layers)
+    unknown = {finding['rule'] for finding in findings}
+    layers = {layer: [rule for rule in rules if rule['id'] not in unknown] for layer, rules in layers.items()}
+    masks = {
+        layer: [(disease_rule_masks if layer == 1 else rule_masks)(rule, codec) for rule in rules]
+        for layer, rules in layers.items()
+    }
+
+    findings += _value_findings(kb, codec, layers)
+    space = _answer_space(codec, [pair for layer in masks.values() for rule in layer for pair in rule])
+    coverage = _layer_one_coverage(compile_rules(layers[1], 1, codec), space)
+    findings += _disease_rule_findings(layers[1], coverage)
+
+    # Layers 2-4 see the inferred disease and the facts they test, nothing else
+    later_mask = 0
+    for layer in (2, 3, 4):
+        for rule in masks[layer]:
+            for fact, _ in rule:
+                if fact in codec.by_id and fact != 'disease':
+                    later_mask |= codec.by_id[fact]['mask']
+    reachable = {}
+    for record, disease, weight in coverage['diagnosed']:
+        key = (record & later_mask) | codec.bit('disease', disease)
+        reachable[key] = reachable.get(key, 0) + weight
+
+    produced = {'disease': set(coverage['diseases'])}
+    for layer in (2, 3, 4):
+        produced[LAYER_OUTPUTS[layer]] = set()
+        for rule in compile_rules(layers[layer], layer, codec):
+            if any(rule.test(record) for record in reachable):
+                produced[LAYER_OUTPUTS[layer]].update(rule.conclusions)
+            else:
+                findings.append(_finding('error', 'unreachable_rule', rule.id,
+                                         f'Layer {layer} rule {rule.id} fires for no diagnosis'))
+
+    findings += _output_findings(kb, layers, produced)
+    findings.sort(key=lambda finding: SEVERITIES.index(finding['severity']))
+
+    return {
+        'answer_sets': space['total'],
+        'no_diagnosis': coverage['no_diagnosis'],
+        'findings': findings
+    }
+
+
+def _finding(severity, kind, rule, message):
+    return {'severity': severity, 'kind': kind, 'rule': rule, 'message': message}
+
+
+# ============================================
+# VALUES
+# ============================================
+
+def _unknown_fact_findings(codec, layers):
+    findings = []
+
+    for layer, rules in layers.items():
+        for rule in rules:
+            # disease_not is a condition on the inferred disease
+            unknown = [fact for fact in rule['conditions'] if fact != 'disease_not' and fact not in codec.by_id]
+            if unknown:
+                findings.append(_finding(
+                    'error', 'unknown_fact', rule['id'],
+                    f"Layer {layer} rule {rule['id']} tests {', '.join(unknown)}, "
+                    'which no input variable defines'
+                ))
+
+    return findings
+
+
+def _value_findings(kb, codec, layers):
+    findings = []
+    names = {variable['id']: variable['name'] for group in kb.input_variables.values() for variable in group}
+
+    for question in kb.questions:
+        field = codec.by_id.get(question['id'])
+        if field is None:
+            continue
+        offered = set(question.get('options', ()))
+        accepted = set(field['values'][:field['domain']])
+        if offered != accepted:
+            findings.append(_finding(
+                'warning', 'question_mismatch', None,
+                f"Question {question['id']} offers {sorted(offered)} but its input variable "
+                f'accepts {sorted(accepted)}'
+            ))
+
+    for rules in layers.values():
+        for rule in rules:
+            for fact, required in rule['conditions'].items():
+                field = codec.by_id.get(fact)
+                if field is None or fact == 'disease':
+                    continue
+                for value in required if isinstance(required, list) else [required]:
+                    if field['index'].get(value, field['domain']) >= field['domain']:
+                        findings.append(_finding(
+                            'warning', 'dead_value', rule['id'],
+                            f"Rule {rule['id']} tests {fact} = {value!r}, which the "
+                            f"{names.get(fact, fact)} question does not offer"
+                        ))
+
+    return findings
+
+
+def _output_findings(kb, layers, produced):
+    findings = []
+
+    for layer, output in LAYER_OUTPUTS.items():
+        declared = kb.output_variables.get(output, {}).get('possible_values', [])
+        for value in declared:
+            if value not in produced[output]:
+                findings.append(_finding('warning', 'unreachable_value', None,
+                                         f'{output} value {value!r} is never concluded'))
+
+        concluded = []
+        for rule in layers[layer]:
+            conclusion = rule['conclusion']
+            for value in conclusion if isinstance(conclusion, list) else [conclusion]:
+                if value not in declared and value not in concluded:
+                    concluded.append(value)
+                    findings.append(_finding(
+                        'warning', 'undeclared_value', rule['id'],
+                        f"Rule {rule['id']} concludes {output} {value!r}, which OUTPUT_VARIABLES does not list"
+                    ))
+
+    return findings
+
+
+# ============================================
+# INPUT SPACE
+# ============================================
+
+def _answer_space(codec, masks):
+    """
+    Representative records of every accepted answer set
+
+    Values of a field are grouped by the rule masks they fall in; values in
+    the same group are indistinguishable to every rule, so one of them
+    stands for all. Returns the per-field (bits, multiplicity) options and
+    the total number of answer sets.
+    """
+    by_fact = {}
+    for fact, mask in masks:
+        by_fact.setdefault(fact, []).append(mask)
+
+    options = []
+    total = 1
+    for field in codec.fields:
+        groups = {}
+        for position in range(field['domain']):
+            bit = 1 << (field['offset'] + position)
+            signature = tuple(bool(mask & bit) for mask in by_fact.get(field['id'], ()))
+            groups.setdefault(signature, []).append(bit)
+        untested = groups.pop(tuple(False for _ in by_fact.get(field['id'], ())), [])
+
+        if field['multiple']:
+            # Any subset of the values: per group either none or some of them
+            field_options = []
+            for chosen in product((False, True), repeat=len(groups)):
+                bits, weight = 0, 2 ** len(untested)
+                for picked, members in zip(chosen, groups.values()):
+                    if picked:
+                        bits |= members[0]
+                        weight *= 2 ** len(members) - 1
+                field_options.append((bits, weight))
+            total *= 2 ** field['domain']
+        else:
+            # One value, or no answer, which no rule tells apart from an untested value
+            field_options = [(0, len(untested) + 1)]
+            field_options += [(members[0], len(members)) for members in groups.values()]
+            total *= field['domain'] + 1
+        options.append(field_options)
+
+    return {'options': options, 'total': total}
+
+
+def _layer_one_coverage(rules, space):
+    """
+    First-match evaluation of the disease rules over the whole input space
+    """
+    matches = [0] * len(rules)
+    fires = [0] * len(rules)
+    preempted = [{} for _ in rules]
+    diagnosed = []
+    diseases = set()
+    no_diagnosis = 0
+
+    for choice in product(*space['options']):
+        record = 0
+        weight = 1
+        for bits, multiplicity in choice:
+            record |= bits
+            weight *= multiplicity
+
+        first = None
+        for position, rule in enumerate(rules):
+            if rule.test(record):
+                matches[position] += weight
+                if first is None:
+                    first = position
+                    fires[position] += weight
+                else:
+                    preempted[position][first] = preempted[position].get(first, 0) + weight
+
+        if first is None:
+            no_diagnosis += weight
+        else:
+            diagnosed.append((record, rules[first].conclusion, weight))
+            diseases.add(rules[first].conclusion)
+
+    return {
+        'matches': matches,
+        'fires': fires,
+        'preempted': preempted,
+        'diagnosed': diagnosed,
+        'diseases': diseases,
+        'no_diagnosis': no_diagnosis
+    }
+
+
+def _disease_rule_findings(rules, coverage):
+    findings = []
+
+    for position, rule in enumerate(rules):
+        matches = coverage['matches'][position]
+        fires = coverage['fires'][position]
+        by = ', '.join(rules[other]['id'] for other in sorted(coverage['preempted'][position]))
+        if not matches:
+            findings.append(_finding('error', 'never_matches', rule['id'],
+                                     f"Disease rule {rule['id']} matches no answer set"))
+        elif not fires:
+            findings.append(_finding('error', 'shadowed', rule['id'],
+                                     f"Disease rule {rule['id']} never fires: it is always pre-empted by {by}"))
+        elif fires < matches:
+            findings.append(_finding(
+                'info', 'partially_shadowed', rule['id'],
+                f"Disease rule {rule['id']} is pre-empted by {by} on {matches - fires} "
+                f'of the {matches} answer sets it matches'
+            ))
+
+    return findings
@@ -0,0 +1,236 @@
+"""
+Columnar Evaluation for Skin Disease Expert System
+Diagnoses whole cohorts at once with NumPy array operations, one array per
+input variable instead of one answer dict per patient
+
+Requires NumPy (pip install numpy).
+"""
+
+from backend.rule_compiler import disease_rule_masks, rule_masks
+from backend.rules import compile_rules
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Output variable concluded by each layer 2-4, with its rules in the knowledge base
+LAYER_RULES = ((2, 'treatment', 'treatment_rules'), (3, 'lifestyle', 'lifestyle_rules'), (4, 'diet', 'diet_rules'))
+
+
+class ColumnarEvaluator:
+    """
+    Rules of one compiled knowledge base as boolean array operations
+
+    Input columns, one per input variable and all of the same length:
+    - a 'Selection' is an integer array of positions in the variable's
+      values (-1 for unanswered), or an array of the values themselves
+      (None for unanswered)
+    - a 'Multiple Selection' (appearance) is an integer mask column, bit i
+      set when the i-th value is selected
+    A missing column leaves that question unanswered in every row.
+
+    Each rule condition becomes a lookup table over positions (or a mask
+    over the selection column), so a rule is a chain of array ANDs over all
+    rows. Layer 1 stacks its rule matches and takes the first match per row
+    with argmax; layers 2-4 OR the rules concluding each value into one
+    membership column per value. Every row gets the same disease and the
+    same recommendations as diagnose() on the equivalent answer dict.
+    """
+
+    def __init__(self, snapshot):
+        """
+        Args:
+            snapshot (CompiledKnowledgeBase): Compiled knowledge base to evaluate
+        """
+        if np is None:
+            raise ImportError('Columnar evaluation requires NumPy (pip install numpy)')
+
+        codec = snapshot.codec
+        self.codec = codec
+        self.diseases = list(codec.disease['values'])
+        # Disease rules in the order the snapshot tests them
+        self.disease_rules = [
+            (rule.id,
+             self._conditions(disease_rule_masks({'id': rule.id, 'conditions': rule.conditions}, codec)),
+             self.diseases.index(rule.conclusion))
+            for rule in snapshot.disease_rules
+        ]
+
+        kb = snapshot.knowledge_base
+        self.layers = []
+        for layer, output, section in LAYER_RULES:
+            rules = getattr(kb, section)
+            compiled = compile_rules(rules, layer, codec)
+            values = list(dict.fromkeys(value for rule in compiled for value in rule.conclusions))
+            self.layers.append((output, values, [
+                (self._conditions(rule_masks(rule, codec)), [values.index(value) for value in record.conclusions])
+                for rule, record in zip(rules, compiled)
+            ]))
+
+    def _conditions(self, masks):
+        """
+        Rule conditions, given as (fact, record mask) pairs, as (fact, lookup)
+        pairs: a boolean table over value positions (the last entry standing
+        for unanswered) for a single selection or the disease, an int mask
+        over the selection column for a multiple selection
+        """
+        codec = self.codec
+        conditions = []
+
+        for fact, mask in masks:
+            field = codec.by_id[fact]
+            local = mask >> field['offset']
+            if field['multiple']:
+                conditions.append((fact, local & ((1 << field['domain']) - 1)))
+            else:
+                table = np.zeros(len(field['values']) + 1, dtype=bool)
+                for position in range(len(field['values'])):
+                    table[position] = bool(local >> position & 1)
+                conditions.append((fact, table))
+
+        return conditions
+
+    def positions(self, columns):
+        """
+        Convert input columns to position and mask arrays
+
+        Returns:
+            tuple: (number of rows, dict of fact -> array)
+        """
+        rows = None
+        for value in columns.values():
+            length = len(value)
+            if rows is not None and length != rows:
+                raise ValueError('All columns must have the same length')
+            rows = length
+        rows = rows or 0
+
+        facts = {}
+        for field in self.codec.fields:
+            column = columns.get(field['id'])
+            if field['multiple']:
+                facts[field['id']] = self._mask_column(field, column, rows)
+            else:
+                facts[field['id']] = self._position_column(field, column, rows)
+
+        return rows, facts
+
+    @staticmethod
+    def _mask_column(field, column, rows):
+        if column is None:
+            return np.zeros(rows, dtype=np.int64)
+        masks = np.asarray(column)
+        if masks.dtype.kind not in 'iu':
+            raise ValueError(f"Column '{field['id']}' must hold integer selection masks")
+        masks = masks.astype(np.int64)
+        if ((masks < 0) | (masks >> field['domain'] != 0)).any():
+            raise ValueError(f"Column '{field['id']}' masks use bits beyond its {field['domain']} values")
+        return masks
+
+    @staticmethod
+    def _position_column(field, column, rows):
+        # Unanswered maps to the last slot of every lookup table
+        unanswered = len(field['values'])
+        if column is None:
+            return np.full(rows, unanswered, dtype=np.int64)
+
+        array = np.asarray(column)
+        if array.dtype.kind in 'iu':
+            positions = array.astype(np.int64)
+            if ((positions < -1) | (positions >= field['domain'])).any():
+                raise ValueError(f"Column '{field['id']}' positions must be -1 to {field['domain'] - 1}")
+            return np.where(positions < 0, unanswered, positions)
+
+        # Values: look up each distinct value once
+        array = np.asarray(column, dtype=object)
+        missing = np.equal(array, None)
+        texts = array.astype(str)
+        texts[missing] = ''
+        distinct, inverse = np.unique(texts, return_inverse=True)
+        lookup = np.array([field['index'].get(value, unanswered) for value in distinct.tolist()] + [unanswered],
+                          dtype=np.int64)
+        positions = lookup[inverse.reshape(-1)]
+        positions[missing] = unanswered
+        return positions
+
+    def evaluate(self, columns):
+        """
+        Diagnose every row of a columnar batch
+
+        Returns:
+            dict: Columnar result:
+                'disease': int array of positions in 'diseases', -1 for no diagnosis
+                'diseases': disease names
+                'rule': int array of positions of the fired disease rule, -1 for none
+                'rules': disease rule ids
+                'treatment', 'lifestyle', 'diet': dicts with 'values' (names)
+                    and 'members', a (rows, values) boolean array
+        """
+        rows, facts = self.positions(columns)
+
+        matched = np.zeros((len(self.disease_rules) + 1, rows), dtype=bool)
+        for position, (_, conditions, _) in enumerate(self.disease_rules):
+            matched[position] = self._test(conditions, facts, rows)
+        # The extra row matches everywhere, so argmax finds it when no rule matched
+        matched[-1] = True
+        fired = np.argmax(matched, axis=0)
+        fired[fired == len(self.disease_rules)] = -1
+
+        conclusions = np.array([disease for _, _, disease in self.disease_rules] + [-1], dtype=np.int64)
+        disease = conclusions[fired]
+        diagnosed = disease >= 0
+        facts['disease'] = np.where(diagnosed, disease, len(self.diseases))
+
+        result = {
+            'disease': disease,
+            'diseases': self.diseases,
+            'rule': fired,
+            'rules': [rule_id for rule_id, _, _ in self.disease_rules]
+        }
+        for output, values, rules in self.layers:
+            members = np.zeros((rows, len(values)), dtype=bool)
+            for conditions, targets in rules:
+                fires = self._test(conditions, facts, rows) & diagnosed
+                for target in targets:
+                    members[:, target] |= fires
+            result[output] = {'values': values, 'members': members}
+
+        return result
+
+    @staticmethod
+    def _test(conditions, facts, rows):
+        matched = np.ones(rows, dtype=bool)
+        for fact, lookup in conditions:
+            if isinstance(lookup, int):
+                matched &= (facts[fact] & lookup) != 0
+            else:
+                matched &= lookup[facts[fact]]
+        return matched
+
+
+def answers_to_columns(answer_sets, input_variables):
+    """
+    Convert answer dicts to columns (position arrays and selection masks),
+    e.g. to compare the columnar and the row-by-row results
+
+    Values outside a variable's domain are treated as unanswered.
+    """
+    if np is None:
+        raise ImportError('Columnar evaluation requires NumPy (pip install numpy)')
+
+    columns = {}
+    for variables in input_variables.values():
+        for variable in variables:
+            index = {value: position for position, value in enumerate(variable['values'])}
+            values = [answers.get(variable['id']) for answers in answer_sets]
+            if variable['type'] == 'Multiple Selection':
+                column = [
+                    sum(1 << index[item] for item in set(value) if isinstance(item, str) and item in index)
+                    if isinstance(value, list) else 0
+                    for value in values
+                ]
+            else:
+                column = [index.get(value, -1) if isinstance(value, str) else -1 for value in values]
+            columns[variable['id']] = np.array(column, dtype=np.int64)
+    return columns
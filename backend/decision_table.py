@@ -0,0 +1,103 @@
+"""
+Decision Table for Skin Disease Expert System
+Precomputes the diagnosis for every possible answer set so that a
+diagnosis becomes a single array lookup
+"""
+
+from array import array
+
+from backend.encoding import AnswerCodec
+
+# Slot marker for codes that do not correspond to a valid answer set
+NO_ENTRY = 0xFFFF
+
+
+class DecisionTable:
+    """
+    Compiled form of the 4-layer rule base over the whole input space
+
+    Each valid answer code maps to an index into a list of distinct
+    diagnosis results. Only a few dozen distinct results exist, so the
+    table itself is a flat array of 16-bit indexes.
+
+    Results returned by lookup() are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(self, diagnose, codec=None):
+        """
+        Args:
+            diagnose (callable): Interpreted diagnosis function used to fill the table
+            codec (AnswerCodec): Encoding of answer sets into table slots
+        """
+        self.codec = codec or AnswerCodec()
+        self.results = []
+        self.slots = array('H', [NO_ENTRY]) * self.codec.size
+        self.entries = 0
+
+        seen = {}
+        for code in self.codec.iter_codes():
+            result = diagnose(self.codec.unpack(code))
+            key = _result_key(result)
+
+            if key not in seen:
+                seen[key] = len(self.results)
+                self.results.append(result)
+
+            self.slots[code] = seen[key]
+            self.entries += 1
+
+        if len(self.results) >= NO_ENTRY:
+            raise ValueError('Too many distinct results for a 16-bit decision table')
+
+    def __len__(self):
+        """Number of answer sets covered by the table"""
+        return self.entries
+
+    def lookup(self, answers):
+        """
+        Get the precomputed diagnosis for an answer set
+
+        Returns:
+            dict: Diagnosis result, or None if the answers fall outside the table
+        """
+        return self.lookup_record(self.codec.encode(answers))
+
+    def lookup_record(self, record):
+        """
+        Get the precomputed diagnosis for an encoded answer record
+
+        Returns:
+            dict: Diagnosis result, or None if the record has no answer code
+        """
+        code = self.codec.pack_record(record)
+        if code is None:
+            return None
+        return self.results[self.slots[code]]
+
+    def verify(self, diagnose):
+        """
+        Check the table against an interpreted diagnosis function on every input
+
+        Each answer set is decoded, re-encoded through lookup() and compared
+        with a fresh interpreted diagnosis.
+
+        Returns:
+            list: Answer sets on which the table and the engine disagree
+        """
+        mismatches = []
+
+        for code in self.codec.iter_codes():
+            answers = self.codec.unpack(code)
+            expected = diagnose(answers)
+            if self.lookup(answers) != expected:
+                mismatches.append(answers)
+
+        return mismatches
+
+
+def _result_key(result):
+    """
+    Identify a diagnosis result by the sequence of rules that fired
+    """
+    return tuple(rule['rule_id'] for rule in result['explanation'])
@@ -0,0 +1,296 @@
+"""
+Answer Encoding for Skin Disease Expert System
+Interns answer values into small-integer encodings derived from INPUT_VARIABLES
+"""
+
+from backend.knowledge_base import (
+    INPUT_VARIABLES, OUTPUT_VARIABLES,
+    DISEASE_RULES, TREATMENT_RULES, LIFESTYLE_RULES, DIET_RULES
+)
+
+
+class AnswerCodec:
+    """
+    Encodings of an answer set, built once from the input variables
+
+    Records: an answer set interned into a single int with one bit per value.
+    A 'Selection' variable sets at most one of its bits, a 'Multiple Selection'
+    variable sets one bit per selected value. Missing or unknown values set no
+    bit. The record is what rules are matched against and doubles as a
+    canonical, hashable key: two answer sets with the same record cannot be
+    told apart by any rule.
+
+    Codes: a complete, in-domain answer set packed into as few bits as
+    possible (17 with the current INPUT_VARIABLES), used to address the
+    decision table.
+
+    Values that only occur in rule conditions (such as 'Smaller than 5mm' as
+    an appearance) get a record bit of their own but are outside the domain,
+    so answer sets using them have no code.
+    """
+
+    def __init__(self, input_variables=INPUT_VARIABLES, rules=None, diseases=None):
+        """
+        Args:
+            input_variables (dict): Variable definitions, grouped by category
+            rules (list): All rules of all layers, scanned for extra values
+            diseases (list): Possible values of the derived 'disease' fact,
+                including every layer 1 conclusion
+        """
+        if rules is None:
+            rules = DISEASE_RULES + TREATMENT_RULES + LIFESTYLE_RULES + DIET_RULES
+        if diseases is None:
+            diseases = OUTPUT_VARIABLES['disease']['possible_values'] + [
+                rule['conclusion'] for rule in DISEASE_RULES
+            ]
+
+        self.fields = []
+        self.by_id = {}
+        shift = 0
+        offset = 0
+
+        for variables in input_variables.values():
+            for variable in variables:
+                multiple = variable['type'] == 'Multiple Selection'
+                domain = list(variable['values'])
+                width = len(domain) if multiple else max(1, (len(domain) - 1).bit_length())
+                field = self._field(variable['id'], domain, _rule_values(rules, variable['id']),
+                                    multiple, offset)
+                field['shift'] = shift
+                field['width'] = width
+                self.fields.append(field)
+                self.by_id[field['id']] = field
+                shift += width
+                offset += len(field['values'])
+
+        # The disease is derived by layer 1, so it is in records but not in codes
+        self.disease = self._field('disease', list(dict.fromkeys(diseases)), [], False, offset)
+        self.by_id['disease'] = self.disease
+
+        self.bits = shift
+        self.extra_mask = 0
+        for field in self.fields:
+            self.extra_mask |= field['mask'] & ~field['domain_mask']
+
+    @staticmethod
+    def _field(field_id, domain, extra, multiple, offset):
+        values = list(dict.fromkeys(domain + [value for value in extra if value is not None]))
+        return {
+            'id': field_id,
+            'values': values,
+            'index': {value: i for i, value in enumerate(values)},
+            'multiple': multiple,
+            'domain': len(domain),
+            'offset': offset,
+            'mask': ((1 << len(values)) - 1) << offset,
+            'domain_mask': ((1 << len(domain)) - 1) << offset
+        }
+
+    @property
+    def size(self):
+        """Number of slots needed to address every code"""
+        return 1 << self.bits
+
+    # ============================================
+    # RECORDS
+    # ============================================
+
+    def encode(self, answers):
+        """
+        Intern an answer dict into a record
+
+        Keys that are not input variables are dropped, selection order and
+        duplicates do not matter, and anything but a list selects nothing
+        for a multiple selection.
+        """
+        record = 0
+
+        for field in self.fields:
+            value = answers.get(field['id'])
+            index = field['index']
+            offset = field['offset']
+
+            if field['multiple']:
+                if isinstance(value, list):
+                    for item in value:
+                        try:
+                            position = index.get(item)
+                        except TypeError:
+                            continue
+                        if position is not None:
+                            record |= 1 << (offset + position)
+            else:
+                try:
+                    position = index.get(value)
+                except TypeError:
+                    continue
+                if position is not None:
+                    record |= 1 << (offset + position)
+
+        return record
+
+    def decode(self, record):
+        """
+        Decode a record back into an answer dict, omitting unanswered selections
+        """
+        answers = {}
+
+        for field in self.fields + [self.disease]:
+            selected = [value for i, value in enumerate(field['values'])
+                        if record & (1 << (field['offset'] + i))]
+            if field['multiple']:
+                answers[field['id']] = selected
+            elif selected:
+                answers[field['id']] = selected[0]
+
+        return answers
+
+    def bit(self, field_id, value):
+        """
+        Record bit of one value, 0 if the value is unknown
+        """
+        field = self.by_id[field_id]
+        try:
+            position = field['index'].get(value)
+        except TypeError:
+            return 0
+        return 0 if position is None else 1 << (field['offset'] + position)
+
+    def value_mask(self, field_id, values):
+        """
+        Record bits of several values of one field
+        """
+        mask = 0
+        for value in values:
+            mask |= self.bit(field_id, value)
+        return mask
+
+    # ============================================
+    # CODES
+    # ============================================
+
+    def pack(self, answers):
+        """
+        Pack an answer dict into an integer code, None when it has no code
+        """
+        return self.pack_record(self.encode(answers))
+
+    def pack_record(self, record):
+        """
+        Pack a record into an integer code
+
+        Returns None unless every selection is answered with an in-domain value
+        and no multiple selection contains a value outside the domain.
+        """
+        if record & self.extra_mask:
+            return None
+
+        code = 0
+        for field in self.fields:
+            bits = (record & field['mask']) >> field['offset']
+            if field['multiple']:
+                code |= bits << field['shift']
+            elif bits:
+                code |= (bits.bit_length() - 1) << field['shift']
+            else:
+                return None
+
+        return code
+
+    def pack_partial(self, answers):
+        """
+        Pack the answered fields of a partial answer set
+
+        Fields that are missing or None are unanswered. An answered
+        multiple selection must be a list.
+
+        Returns:
+            tuple: (mask of the answered code bits, code bits), or None when
+                an answer is outside the domain
+        """
+        mask = 0
+        code = 0
+
+        for field in self.fields:
+            value = answers.get(field['id'])
+            if value is None:
+                continue
+
+            if field['multiple']:
+                if not isinstance(value, list):
+                    return None
+                bits = 0
+                for item in value:
+                    position = self._domain_position(field, item)
+                    if position is None:
+                        return None
+                    bits |= 1 << position
+            else:
+                bits = self._domain_position(field, value)
+                if bits is None:
+                    return None
+
+            mask |= ((1 << field['width']) - 1) << field['shift']
+            code |= bits << field['shift']
+
+        return mask, code
+
+    @staticmethod
+    def _domain_position(field, value):
+        try:
+            position = field['index'].get(value)
+        except TypeError:
+            return None
+        if position is None or position >= field['domain']:
+            return None
+        return position
+
+    def unpack(self, code):
+        """
+        Unpack an integer code back into an answer dict
+        """
+        answers = {}
+
+        for field in self.fields:
+            raw = (code >> field['shift']) & ((1 << field['width']) - 1)
+            values = field['values']
+
+            if field['multiple']:
+                answers[field['id']] = [values[i] for i in range(field['domain']) if raw & (1 << i)]
+            else:
+                if raw >= field['domain']:
+                    return None
+                answers[field['id']] = values[raw]
+
+        return answers
+
+    def iter_codes(self):
+        """
+        Yield every valid code, i.e. every complete in-domain answer set
+        """
+        for code in range(self.size):
+            if self.is_valid(code):
+                yield code
+
+    def is_valid(self, code):
+        """
+        Check that every single-selection field of a code indexes a real value
+        """
+        for field in self.fields:
+            if not field['multiple']:
+                raw = (code >> field['shift']) & ((1 << field['width']) - 1)
+                if raw >= field['domain']:
+                    return False
+        return True
+
+
+def _rule_values(rules, field_id):
+    """
+    Values that rules require for one field
+    """
+    values = []
+    for rule in rules:
+        required = rule['conditions'].get(field_id)
+        if required is not None:
+            values.extend(required if isinstance(required, list) else [required])
+    return values
@@ -0,0 +1,191 @@
+"""
+Incremental Matcher for Skin Disease Expert System
+Matches answers as they are given, re-checking only the rules that test the
+facts that changed
+"""
+
+from backend.rule_compiler import disease_rule_masks, rule_masks
+
+# Pending count of a rule with a failed condition
+RULED_OUT = -1
+
+
+class IncrementalMatcher:
+    """
+    TREAT-style match network over one compiled knowledge base
+
+    Every rule condition is an alpha node on the fact it tests. A session
+    state keeps, per rule, the number of conditions still waiting for an
+    answer, or RULED_OUT once an answered condition fails. Asserting facts
+    re-checks only the rules with a condition on those facts. When the layer 1
+    outcome changes, the derived 'disease' fact is asserted in turn and the
+    layer 2-4 rules that test it are re-checked.
+
+    States are plain JSON-serializable dicts, so they can be kept in a result
+    store between requests.
+    """
+
+    def __init__(self, snapshot):
+        kb = snapshot.knowledge_base
+        self.version = snapshot.version
+        self.codec = snapshot.codec
+        self.facts = [field['id'] for field in self.codec.fields]
+        self.diseases = self.codec.disease['values']
+        self.first_layer = len(kb.disease_rules)
+
+        # (conclusions, ((fact, mask), ...)) per rule, layer 1 first
+        self.rules = []
+        for rule in kb.disease_rules:
+            self.rules.append(((rule['conclusion'],), tuple(disease_rule_masks(rule, self.codec))))
+        for rule in kb.treatment_rules + kb.lifestyle_rules + kb.diet_rules:
+            conclusion = rule['conclusion']
+            conclusions = tuple(conclusion) if isinstance(conclusion, list) else (conclusion,)
+            self.rules.append((conclusions, tuple(rule_masks(rule, self.codec))))
+
+        # Alpha memory: fact -> positions of the rules testing it
+        self.alpha = {}
+        for position, (_, conditions) in enumerate(self.rules):
+            for fact, _ in conditions:
+                positions = self.alpha.setdefault(fact, [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+
+    def start(self):
+        """
+        State of a session with no answers yet
+        """
+        state = {
+            'version': self.version,
+            'answers': {},
+            'decided': False,
+            'disease': None,
+            'pending': [len(conditions) for _, conditions in self.rules]
+        }
+        return self._propagate(state, {}, set(self.alpha) - {'disease'})
+
+    def assert_facts(self, state, facts):
+        """
+        Add, change or retract answers
+
+        Args:
+            state (dict): Current session state, left unchanged
+            facts (dict): Newly answered facts, None retracts an answer.
+                Keys that are not input variables and answers equal to the
+                current ones are ignored, so a client may send the whole form.
+
+        Returns:
+            dict: The new session state
+        """
+        answers = dict(state['answers'])
+        changed = set()
+        for fact, value in facts.items():
+            if fact not in self.codec.by_id or fact == 'disease' or answers.get(fact) == value:
+                continue
+            if value is None:
+                del answers[fact]
+            else:
+                answers[fact] = value
+            changed.add(fact)
+
+        return self._propagate(state, answers, changed)
+
+    def _propagate(self, state, answers, changed):
+        """
+        New session state for the given answers, re-checking the rules that
+        test the changed facts
+        """
+        pending = list(state['pending'])
+        record = self.codec.encode(answers)
+        answered = set(answers)
+        affected = sorted({position for fact in changed for position in self.alpha.get(fact, ())})
+
+        # Layer 1 first: its outcome is a fact for layers 2-4
+        for position in affected:
+            if position >= self.first_layer:
+                break
+            pending[position] = self._check(position, record, answered)
+
+        decided, disease = self._outcome(pending)
+        if decided:
+            answered.add('disease')
+            record |= self.codec.bit('disease', disease)
+        if (decided, disease) != (state['decided'], state['disease']):
+            affected = sorted(set(affected).union(self.alpha.get('disease', ())))
+
+        for position in affected:
+            if position >= self.first_layer:
+                pending[position] = self._check(position, record, answered)
+
+        return {
+            'version': self.version,
+            'answers': answers,
+            'decided': decided,
+            'disease': disease,
+            'pending': pending
+        }
+
+    def _check(self, position, record, answered):
+        remaining = 0
+        for fact, mask in self.rules[position][1]:
+            if not mask:
+                return RULED_OUT
+            if fact not in answered:
+                remaining += 1
+            elif not record & mask:
+                return RULED_OUT
+        return remaining
+
+    def _outcome(self, pending):
+        """
+        Layer 1 fires its first matching rule: the outcome is decided once
+        the first rule that is not ruled out has matched, or all are ruled out
+        """
+        for position in range(self.first_layer):
+            if pending[position] == 0:
+                return True, self.rules[position][0][0]
+            if pending[position] != RULED_OUT:
+                return False, None
+        return True, None
+
+    def progress(self, state):
+        """
+        Summarize a session state
+
+        Returns:
+            dict: 'possible_diseases' and 'ruled_out_diseases', the 'disease'
+                once layer 1 is decided, 'open_questions' that can still change
+                the outcome and 'complete' when no further answer can
+        """
+        pending = state['pending']
+        possible = []
+        open_facts = set()
+
+        for position in range(self.first_layer):
+            if pending[position] == RULED_OUT:
+                continue
+            conclusion = self.rules[position][0][0]
+            if conclusion not in possible:
+                possible.append(conclusion)
+            if pending[position] == 0:
+                break
+            open_facts.update(self._unanswered(position, state['answers']))
+
+        complete = state['decided']
+        if state['decided'] and state['disease'] is not None:
+            for position in range(self.first_layer, len(self.rules)):
+                if pending[position] > 0:
+                    complete = False
+                    open_facts.update(self._unanswered(position, state['answers']))
+
+        return {
+            'decided': state['decided'],
+            'disease': state['disease'],
+            'possible_diseases': possible,
+            'ruled_out_diseases': [disease for disease in self.diseases if disease not in possible],
+            'open_questions': [fact for fact in self.facts if fact in open_facts],
+            'complete': complete
+        }
+
+    def _unanswered(self, position, answers):
+        return [fact for fact, _ in self.rules[position][1]
+                if fact != 'disease' and fact not in answers]
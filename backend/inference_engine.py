@@ -3,9 +3,62 @@ Inference Engine for Skin Disease Expert System
 Implements forward chaining with 4-layer rule evaluation
 """
 
-from backend.knowledge_base import (
-    DISEASE_RULES, TREATMENT_RULES, LIFESTYLE_RULES, DIET_RULES, DISEASE_INFO
-)
+import threading
+from time import perf_counter
+
+from backend.columnar import ColumnarEvaluator
+from backend.decision_table import DecisionTable
+from backend.encoding import AnswerCodec
+from backend.incremental import IncrementalMatcher
+from backend.question_tree import QuestionTree
+from backend.knowledge_loader import default_knowledge_base, load_knowledge_base
+from backend.metrics import EngineMetrics
+from backend.result_cache import ResultCache
+from backend.rule_order import profile_order
+from backend.rule_index import RuleIndex
+from backend.rules import compile_rules
+from backend.validation import AnswerValidator
+
+
+class CompiledKnowledgeBase:
+    """
+    Immutable compiled form of one knowledge base version: the answer codec,
+    the compiled rules of every layer and, optionally, the decision table
+    
+    An engine swaps whole snapshots on reload, so a request that started on
+    one snapshot finishes on it.
+    
+    With a rule profile, the disease rules are tested in profile order (see
+    backend.rule_order), which fires the same rule for every record.
+    """
+    
+    __slots__ = (
+        'knowledge_base', 'version', 'codec', 'disease_rules',
+        'treatment_index', 'lifestyle_index', 'diet_index', 'decision_table', 'matcher',
+        'question_tree', 'validator', 'columnar'
+    )
+    
+    def __init__(self, knowledge_base, rule_profile=None):
+        kb = knowledge_base
+        self.knowledge_base = kb
+        self.version = kb.version
+        self.codec = AnswerCodec(
+            kb.input_variables, kb.all_rules,
+            kb.output_variables['disease']['possible_values']
+            + [rule['conclusion'] for rule in kb.disease_rules]
+        )
+        self.disease_rules = compile_rules(kb.disease_rules, 1, self.codec)
+        if rule_profile:
+            order = profile_order(kb.disease_rules, self.codec, rule_profile)
+            self.disease_rules = tuple(self.disease_rules[position] for position in order)
+        self.treatment_index = _compiled_index(kb.treatment_rules, 2, self.codec)
+        self.lifestyle_index = _compiled_index(kb.lifestyle_rules, 3, self.codec)
+        self.diet_index = _compiled_index(kb.diet_rules, 4, self.codec)
+        self.decision_table = None
+        self.matcher = IncrementalMatcher(self)
+        self.question_tree = None
+        self.validator = AnswerValidator(kb.input_variables)
+        self.columnar = None
 
 
 class InferenceEngine:
@@ -15,11 +68,145 @@ class InferenceEngine:
     Layer 2: Treatment Recommendation
     Layer 3: Lifestyle Recommendation
     Layer 4: Diet Recommendation
+    
+    The engine keeps no per-request state on the instance, so a single
+    engine can be shared by any number of threads or greenlets.
     """
     
-    def __init__(self):
-        self.fired_rules = []
+    def __init__(self, compiled=False, cache_size=None, knowledge_base=None, metrics=False,
+                 rule_profile=None):
+        """
+        Args:
+            compiled (bool): Precompute a decision table over the whole input
+                space so that complete answer sets are answered by lookup.
+                The table is built by warm_up(), on reload or on the first
+                diagnosis, never by the constructor.
+            cache_size (int): Keep up to this many results in an LRU cache,
+                None or 0 for no cache
+            knowledge_base (str): Knowledge base file or directory to load,
+                None for the built-in knowledge base
+            metrics (bool): Record layer latencies and rule counters in
+                self.metrics (an EngineMetrics); None when disabled
+            rule_profile (dict): Disease rule id -> fire count, to test the
+                most frequent disease rules first (kept across reloads)
+        """
+        self._local = threading.local()
+        self._reload_lock = threading.Lock()
+        self._table_lock = threading.Lock()
+        self._tree_lock = threading.Lock()
+        self.compiled = compiled
+        self.source = knowledge_base
+        self.cache = ResultCache(cache_size) if cache_size else None
+        self.metrics = EngineMetrics() if metrics else None
+        self.rule_profile = rule_profile
+        self._snapshot = self._compile(self._load())
+    
+    def _load(self):
+        if self.source is None:
+            return default_knowledge_base()
+        return load_knowledge_base(self.source)
+    
+    def _compile(self, knowledge_base):
+        """
+        Intern answers into records and compile rule conditions into
+        predicates over those records, once per knowledge base version
+        """
+        return CompiledKnowledgeBase(knowledge_base, self.rule_profile)
+    
+    def _build_table(self, snapshot):
+        """Evaluate every complete answer set of a snapshot into a decision table"""
+        return DecisionTable(
+            lambda answers: self._evaluate_record(snapshot.codec.encode(answers), snapshot),
+            snapshot.codec
+        )
+    
+    def _decision_table(self, snapshot):
+        """
+        Decision table of a snapshot when the engine is compiled, built on
+        first use
+        """
+        if snapshot.decision_table is None and self.compiled:
+            with self._table_lock:
+                if snapshot.decision_table is None:
+                    snapshot.decision_table = self._build_table(snapshot)
+        return snapshot.decision_table
+    
+    def warm_up(self, question_levels=4):
+        """
+        Build the decision table (when compiled) and the top levels of the
+        question tree now rather than on first use
+        
+        Args:
+            question_levels (int): Number of answers down to which every
+                question tree node is built. The top levels hold the nodes
+                with the most answer sets, which are the slowest to build.
+        """
+        snapshot = self._snapshot
+        self._decision_table(snapshot)
+        self._question_tree(snapshot).expand(question_levels)
+    
+    def reload(self, knowledge_base=None):
+        """
+        Reload the knowledge base from its source and atomically swap to the
+        newly compiled snapshot. Requests already running finish on the old
+        snapshot, cached results are dropped.
+        
+        Args:
+            knowledge_base (KnowledgeBase): Already loaded knowledge base to
+                use instead of reading the source again
         
+        Returns:
+            bool: True if the version changed
+        """
+        with self._reload_lock:
+            if knowledge_base is None:
+                knowledge_base = self._load()
+            if knowledge_base.version == self._snapshot.version:
+                return False
+            
+            snapshot = self._compile(knowledge_base)
+            # Reloads run off the request path, so the table is ready before the swap
+            self._decision_table(snapshot)
+            self._snapshot = snapshot
+            if self.cache is not None:
+                self.cache.clear()
+            return True
+    
+    @property
+    def knowledge_base(self):
+        """The knowledge base currently in use"""
+        return self._snapshot.knowledge_base
+    
+    @property
+    def version(self):
+        """Content hash of the knowledge base currently in use"""
+        return self._snapshot.version
+    
+    @property
+    def codec(self):
+        """Answer codec of the knowledge base currently in use"""
+        return self._snapshot.codec
+    
+    @property
+    def decision_table(self):
+        """Decision table of the knowledge base currently in use, None unless compiled"""
+        return self._decision_table(self._snapshot)
+    
+    @property
+    def fired_rules(self):
+        """Rules fired by the last diagnose() call made from the current thread"""
+        return getattr(self._local, 'fired_rules', [])
+        
+    def validate(self, user_facts):
+        """
+        Check an answer set against the input variables of the current
+        knowledge base, without running any inference
+        
+        Returns:
+            list: Structured errors, empty when the answers are valid
+        """
+        return self._snapshot.validator.validate(user_facts)
+    
     def diagnose(self, user_facts):
         """
         Main diagnosis method using forward chaining through 4 layers
@@ -30,38 +217,267 @@ class InferenceEngine:
         Returns:
             dict: Complete diagnosis results with disease, treatment, lifestyle, and diet
         """
-        self.fired_rules = []
+        result, trace = self.evaluate(user_facts)
+        self._local.fired_rules = trace
+        return result
+    
+    def evaluate(self, user_facts):
+        """
+        Stateless diagnosis that returns the trace instead of keeping it
+        per thread
+        
+        Args:
+            user_facts (dict): User's answers to questions
+            
+        Returns:
+            tuple: (diagnosis result, list of fired rules). The trace is the
+                same list as the result's 'explanation'; both belong to the
+                caller, even when they come from the decision table or the
+                result cache.
+        """
+        snapshot = self._snapshot
+        result = self._diagnose_record(snapshot.codec.encode(user_facts), snapshot)
+        return result, result['explanation']
+    
+    def diagnose_many(self, answer_sets):
+        """
+        Diagnose many answer sets at once
+        
+        Answer sets with the same encoded record are evaluated only once;
+        each of them still gets its own copy of the result.
+        
+        Args:
+            answer_sets (iterable): User answer dicts
+            
+        Returns:
+            list: Diagnosis results in input order
+        """
+        return list(self.iter_diagnose(answer_sets))
+    
+    def iter_diagnose(self, answer_sets, memo_size=None):
+        """
+        Lazily diagnose a stream of answer sets, yielding results in order
+        
+        Args:
+            answer_sets (iterable): User answer dicts
+            memo_size (int): Maximum number of distinct answer sets to remember,
+                None for no limit
+        """
+        snapshot = self._snapshot
+        memo = {}
+        
+        for answers in answer_sets:
+            record = snapshot.codec.encode(answers)
+            result = memo.get(record)
+            if result is None:
+                result = self._shared_result(record, snapshot)
+                if memo_size is None or len(memo) < memo_size:
+                    memo[record] = result
+            elif self.metrics is not None:
+                self.metrics.observe_diagnosis(result)
+            yield _copy_result(result)
+    
+    def diagnose_columns(self, columns):
+        """
+        Diagnose a whole cohort given as columns, with NumPy array operations
+        
+        Args:
+            columns (dict): One array per input variable, see ColumnarEvaluator
+            
+        Returns:
+            dict: Columnar result with the disease and fired rule of every row
+                and one membership column per treatment, lifestyle and diet
+                recommendation (see ColumnarEvaluator.evaluate)
+        """
+        snapshot = self._snapshot
+        if snapshot.columnar is None:
+            # Built on first use; building it twice in a race is harmless
+            snapshot.columnar = ColumnarEvaluator(snapshot)
+        return snapshot.columnar.evaluate(columns)
+    
+    def match(self, state, facts):
+        """
+        Incrementally match answers of a step-by-step questionnaire
+        
+        Only the rules that test the given facts are re-checked. A state
+        from an older knowledge base version is rebuilt from its answers.
+        
+        Args:
+            state (dict): Session state returned by a previous call, None to
+                start a new session
+            facts (dict): Newly answered facts, None retracts an answer
+            
+        Returns:
+            tuple: (new session state, progress with the possible and
+                ruled-out diseases)
+        """
+        matcher = self._snapshot.matcher
+        if state is None or state.get('version') != matcher.version:
+            answers = state['answers'] if state else {}
+            state = matcher.assert_facts(matcher.start(), answers)
+        state = matcher.assert_facts(state, facts)
+        return state, matcher.progress(state)
+    
+    def next_question(self, answers):
+        """
+        Adaptive questionnaire: the most informative question still to ask
+        
+        Args:
+            answers (dict): Answers given so far
+            
+        Returns:
+            dict: The next question, or the final result once no answer can
+                change it (see QuestionTree.next_step). None when an answer
+                is outside the domain of its question.
+        """
+        return self._question_tree(self._snapshot).next_step(answers)
+    
+    def _question_tree(self, snapshot):
+        """
+        Question tree of a snapshot, built on first use. It needs the
+        decision table, which is built for it when the engine is not compiled.
+        """
+        if snapshot.question_tree is None:
+            with self._tree_lock:
+                if snapshot.question_tree is None:
+                    table = self._decision_table(snapshot) or self._build_table(snapshot)
+                    snapshot.question_tree = QuestionTree(table, snapshot.knowledge_base.questions)
+        return snapshot.question_tree
+    
+    def _diagnose_record(self, record, snapshot):
+        """
+        Diagnose an encoded answer record into a result the caller owns
+        """
+        return _copy_result(self._shared_result(record, snapshot))
+    
+    def _shared_result(self, record, snapshot):
+        """
+        Result of an encoded answer record, from the decision table or the
+        result cache when possible. Table and cached results are shared
+        between callers and must not be handed out without a copy.
+        """
+        metrics = self.metrics
+        if metrics is None:
+            return self._lookup_record(record, snapshot)
+        
+        start = perf_counter()
+        result = self._lookup_record(record, snapshot, metrics)
+        metrics.observe_diagnosis(result, perf_counter() - start)
+        return result
+    
+    def _lookup_record(self, record, snapshot, metrics=None):
+        """
+        Result of an encoded answer record: from the decision table, else
+        from the result cache, else evaluated
+        """
+        table = snapshot.decision_table
+        if table is None and self.compiled:
+            table = self._decision_table(snapshot)
+        if table is not None:
+            result = table.lookup_record(record)
+            if result is not None:
+                return result
+        
+        if self.cache is None:
+            return self._evaluate_record(record, snapshot, metrics)
+        
+        # Records are only meaningful within one knowledge base version
+        key = (snapshot.version, record)
+        result = self.cache.get(key)
+        if result is None:
+            generation = self.cache.generation
+            result = self._evaluate_record(record, snapshot, metrics)
+            self.cache.put(key, result, generation)
+        return result
+    
+    def _evaluate(self, user_facts):
+        """
+        Forward chaining through the 4 rule layers, without the decision table
+        """
+        snapshot = self._snapshot
+        return self._evaluate_record(snapshot.codec.encode(user_facts), snapshot)
+    
+    def _evaluate_record(self, record, snapshot, metrics=None):
+        """
+        Forward chaining through the 4 rule layers over an encoded record,
+        timing each layer when metrics are given
+        """
+        if metrics is not None:
+            return self._evaluate_measured(record, snapshot, metrics)
+        
+        trace = []
         
         # Layer 1: Disease Identification
-        disease = self._infer_disease(user_facts)
+        disease = self._infer_disease(snapshot, record, trace)
         
         if not disease:
-            return {
-                'success': False,
-                'message': 'No diagnosis found based on the provided symptoms. Please consult a healthcare professional.',
-                'disease': None,
-                'contagious': None,
-                'treatment': [],
-                'lifestyle': [],
-                'diet': [],
-                'explanation': self.fired_rules
-            }
+            return self._no_diagnosis(trace)
         
         # Add disease to facts for subsequent layers
-        facts_with_disease = user_facts.copy()
-        facts_with_disease['disease'] = disease
+        facts_with_disease = record | snapshot.codec.bit('disease', disease)
         
         # Layer 2: Treatment Recommendation
-        treatments = self._infer_treatment(facts_with_disease)
+        treatments = self._infer_treatment(snapshot, facts_with_disease, trace)
         
         # Layer 3: Lifestyle Recommendation
-        lifestyle = self._infer_lifestyle(facts_with_disease)
+        lifestyle = self._infer_lifestyle(snapshot, facts_with_disease, trace)
         
         # Layer 4: Diet Recommendation
-        diet = self._infer_diet(facts_with_disease)
+        diet = self._infer_diet(snapshot, facts_with_disease, trace)
+        
+        return self._diagnosis(snapshot, disease, treatments, lifestyle, diet, trace)
+    
+    def _evaluate_measured(self, record, snapshot, metrics):
+        """
+        Same as _evaluate_record, recording the latency of each layer and
+        the rules it tested
+        """
+        trace = []
+        
+        start = perf_counter()
+        disease = self._infer_disease(snapshot, record, trace)
+        elapsed = perf_counter() - start
+        # Layer 1 tests its rules in order up to the first one that fires
+        rules = snapshot.disease_rules
+        tested = len(rules)
+        if disease:
+            tested = next(i for i, rule in enumerate(rules) if rule.explanation is trace[-1]) + 1
+        metrics.observe_layer(1, elapsed, rules[:tested])
         
+        if not disease:
+            return self._no_diagnosis(trace)
+        
+        facts_with_disease = record | snapshot.codec.bit('disease', disease)
+        conclusions = []
+        for layer, infer, index in ((2, self._infer_treatment, snapshot.treatment_index),
+                                    (3, self._infer_lifestyle, snapshot.lifestyle_index),
+                                    (4, self._infer_diet, snapshot.diet_index)):
+            start = perf_counter()
+            conclusions.append(infer(snapshot, facts_with_disease, trace))
+            elapsed = perf_counter() - start
+            metrics.observe_layer(layer, elapsed, index.candidates(facts_with_disease))
+        
+        return self._diagnosis(snapshot, disease, *conclusions, trace)
+    
+    @staticmethod
+    def _no_diagnosis(trace):
+        """Result when no disease rule fired"""
+        return {
+            'success': False,
+            'message': 'No diagnosis found based on the provided symptoms. Please consult a healthcare professional.',
+            'disease': None,
+            'contagious': None,
+            'treatment': [],
+            'lifestyle': [],
+            'diet': [],
+            'explanation': trace
+        }
+    
+    @staticmethod
+    def _diagnosis(snapshot, disease, treatments, lifestyle, diet, trace):
+        """Result of a diagnosed disease and its recommendations"""
         # Get disease info
-        disease_info = DISEASE_INFO.get(disease, {})
+        disease_info = snapshot.knowledge_base.disease_info.get(disease, {})
         
         return {
             'success': True,
@@ -71,173 +487,78 @@ class InferenceEngine:
             'treatment': treatments,
             'lifestyle': lifestyle,
             'diet': diet,
-            'explanation': self.fired_rules
+            'explanation': trace
         }
     
-    def _infer_disease(self, user_facts):
+    def _infer_disease(self, snapshot, record, trace):
         """
         Layer 1: Fire disease identification rules
         """
-        for rule in DISEASE_RULES:
-            if self._evaluate_disease_rule(rule, user_facts):
-                self.fired_rules.append({
-                    'layer': 1,
-                    'rule_id': rule['id'],
-                    'name': rule['name'],
-                    'logic': rule['logic'],
-                    'conclusion': rule['conclusion']
-                })
-                return rule['conclusion']
+        for rule in snapshot.disease_rules:
+            if rule.test(record):
+                trace.append(rule.explanation)
+                return rule.conclusion
         return None
     
-    def _evaluate_disease_rule(self, rule, facts):
-        """
-        Evaluate disease identification rule conditions
-        """
-        conditions = rule['conditions']
-        
-        for key, required_value in conditions.items():
-            # Skip disease_not conditions (handled separately)
-            if key == 'disease_not':
-                continue
-                
-            user_value = facts.get(key)
-            
-            if user_value is None:
-                return False
-            
-            # Handle appearance (multiple selection in both rule and user input)
-            if key == 'appearance':
-                # User's appearance is a list, required is also a list
-                # Need to check if ANY of the required values are in user's selection
-                if isinstance(user_value, list):
-                    if not any(val in user_value for val in required_value):
-                        return False
-                else:
-                    return False
-            
-            # Handle allergy with list of valid values
-            elif key == 'allergy':
-                if isinstance(required_value, list):
-                    if user_value not in required_value:
-                        return False
-                else:
-                    if user_value != required_value:
-                        return False
-            
-            # Handle single value comparison
-            else:
-                if isinstance(required_value, list):
-                    if user_value not in required_value:
-                        return False
-                else:
-                    if user_value != required_value:
-                        return False
-        
-        return True
-    
-    def _infer_treatment(self, facts):
+    def _infer_treatment(self, snapshot, facts, trace):
         """
         Layer 2: Fire treatment rules
         """
-        treatments = []
-        
-        for rule in TREATMENT_RULES:
-            if self._evaluate_rule_with_disease(rule, facts):
-                self.fired_rules.append({
-                    'layer': 2,
-                    'rule_id': rule['id'],
-                    'name': rule['name'],
-                    'logic': rule['logic'],
-                    'conclusion': rule['conclusion']
-                })
-                if rule['conclusion'] not in treatments:
-                    treatments.append(rule['conclusion'])
-        
-        return treatments
+        return _fire(snapshot.treatment_index, facts, trace)
     
-    def _infer_lifestyle(self, facts):
+    def _infer_lifestyle(self, snapshot, facts, trace):
         """
         Layer 3: Fire lifestyle rules
         """
-        lifestyle = []
-        
-        for rule in LIFESTYLE_RULES:
-            if self._evaluate_rule_with_disease(rule, facts):
-                self.fired_rules.append({
-                    'layer': 3,
-                    'rule_id': rule['id'],
-                    'name': rule['name'],
-                    'logic': rule['logic'],
-                    'conclusion': rule['conclusion']
-                })
-                # Conclusion can be a list
-                if isinstance(rule['conclusion'], list):
-                    for item in rule['conclusion']:
-                        if item not in lifestyle:
-                            lifestyle.append(item)
-                else:
-                    if rule['conclusion'] not in lifestyle:
-                        lifestyle.append(rule['conclusion'])
-        
-        return lifestyle
-    
-    def _infer_diet(self, facts):
+        return _fire(snapshot.lifestyle_index, facts, trace)
+    
+    def _infer_diet(self, snapshot, facts, trace):
         """
         Layer 4: Fire diet rules
         """
-        diet = []
-        
-        for rule in DIET_RULES:
-            if self._evaluate_rule_with_disease(rule, facts):
-                self.fired_rules.append({
-                    'layer': 4,
-                    'rule_id': rule['id'],
-                    'name': rule['name'],
-                    'logic': rule['logic'],
-                    'conclusion': rule['conclusion']
-                })
-                # Conclusion can be a list
-                if isinstance(rule['conclusion'], list):
-                    for item in rule['conclusion']:
-                        if item not in diet:
-                            diet.append(item)
-                else:
-                    if rule['conclusion'] not in diet:
-                        diet.append(rule['conclusion'])
-        
-        return diet
-    
-    def _evaluate_rule_with_disease(self, rule, facts):
-        """
-        Evaluate rules that may have disease conditions and disease_not conditions
-        """
-        conditions = rule['conditions']
-        
-        for key, required_value in conditions.items():
-            # Handle negative disease condition
-            if key == 'disease_not':
-                if facts.get('disease') == required_value:
-                    return False
-                continue
-            
-            user_value = facts.get(key)
-            
-            if user_value is None:
-                return False
-            
-            # Handle value comparison
-            if isinstance(required_value, list):
-                if user_value not in required_value:
-                    return False
-            else:
-                if user_value != required_value:
-                    return False
-        
-        return True
+        return _fire(snapshot.diet_index, facts, trace)
     
     def get_explanation(self):
         """
         Get list of rules that fired during last diagnosis
+        
+        Compatibility shim: the trace is tracked per thread, prefer the
+        'explanation' of the result or the trace returned by evaluate()
         """
-        return self.fired_rules
\ No newline at end of file
+        return self.fired_rules
+
+
+def _copy_result(result):
+    """
+    Copy of a diagnosis result that shares nothing mutable with it: the
+    recommendation lists, the explanation and its entries are copied
+    """
+    return {
+        **result,
+        'treatment': list(result['treatment']),
+        'lifestyle': list(result['lifestyle']),
+        'diet': list(result['diet']),
+        'explanation': [dict(step) for step in result['explanation']]
+    }
+
+
+def _compiled_index(rules, layer, codec):
+    """Index a layer 2-4 rule list by the compiled Rule records"""
+    return RuleIndex(rules, codec, compile_rules(rules, layer, codec))
+
+
+def _fire(index, facts, trace):
+    """
+    Fire every matching rule of a layer 2-4 index, collecting their
+    conclusions in rule order without duplicates
+    """
+    conclusions = []
+    
+    for rule in index.candidates(facts):
+        if rule.test(facts):
+            trace.append(rule.explanation)
+            for item in rule.conclusions:
+                if item not in conclusions:
+                    conclusions.append(item)
+    
+    return conclusions
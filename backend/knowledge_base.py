@@ -586,4 +586,159 @@ DISEASE_INFO = {
         'description': 'An open sore on the skin that fails to heal properly.',
         'contagious': False
     }
-}
\ No newline at end of file
+}
+
+# ============================================
+# RECOMMENDATION DETAILS
+# ============================================
+
+# Educational details shown for each recommendation in the report,
+# keyed by output variable and conclusion
+RECOMMENDATION_DETAILS = {
+    'treatment': {
+        'Topical Corticosteroid': [
+            'Reduces redness, swelling, and itching',
+            'Apply thin layer on affected area only',
+            'Use 1–2 times daily as directed',
+            'Do not use on broken skin unless advised',
+            'Avoid long-term use without doctor approval'
+        ],
+        'Antifungal Cream': [
+            'Kills fungus causing skin infection',
+            'Apply on clean, dry skin',
+            'Use regularly until symptoms disappear',
+            'Do not stop early even if skin improves',
+            'Wash hands before and after application'
+        ],
+        'Antibiotic Ointment': [
+            'Treats bacterial skin infections',
+            'Apply to minor cuts, wounds, or infected areas',
+            'Use only for a short duration',
+            'Cover with clean dressing if necessary',
+            'Stop and consult doctor if irritation occurs'
+        ],
+        'Moisturizer Therapy': [
+            'Prevents dryness and skin cracking',
+            'Apply after bathing for better absorption',
+            'Use fragrance-free products',
+            'Apply at least twice daily',
+            'Suitable for long-term skin care'
+        ],
+        'Pain Relief Medication': [
+            'Helps reduce pain and discomfort',
+            'Use only when pain is present',
+            'Follow recommended dosage strictly',
+            'Avoid mixing with alcohol',
+            'Seek advice if pain persists'
+        ]
+    },
+    'lifestyle': {
+        'Avoid Irritants': [
+            'Avoid harsh soaps and chemicals',
+            'Use mild skin-friendly products',
+            'Wear gloves when handling cleaning agents',
+            'Avoid perfumes on affected skin',
+            'Reduce exposure to allergens'
+        ],
+        'Maintain Skin Hygiene': [
+            'Clean skin gently every day',
+            'Use clean towels and clothing',
+            'Dry skin properly after washing',
+            'Change sweaty clothes promptly',
+            'Keep wounds clean and covered'
+        ],
+        'Reduce Sun Exposure': [
+            'Avoid direct sunlight during peak hours',
+            'Use protective clothing',
+            'Apply sunscreen if needed',
+            'Stay in shaded areas',
+            'Sun exposure may worsen skin irritation'
+        ],
+        'Avoid Scratching': [
+            'Scratching can worsen infection',
+            'Keep nails short and clean',
+            'Use cold compress to reduce itching',
+            'Wear loose clothing',
+            'Apply anti-itch treatment if needed'
+        ],
+        'Regular Wound Care': [
+            'Clean wounds daily',
+            'Use sterile dressing',
+            'Monitor for signs of infection',
+            'Avoid touching wounds unnecessarily',
+            'Seek help if wound does not heal'
+        ],
+        'Avoid Sharing Personal Items': [
+            'Do not share towels or clothes',
+            'Avoid sharing skincare products',
+            'Wash personal items regularly',
+            'Prevent spread of infection',
+            'Keep personal items separate'
+        ],
+        'Seek Medical Attention': [
+            'If symptoms worsen significantly',
+            'If pain becomes severe',
+            'If infection spreads to other areas',
+            'If fever develops',
+            'If condition does not improve after treatment'
+        ],
+        'Parental Supervision and Assistance': [
+            'Parents should help apply treatment correctly',
+            'Monitor child to prevent scratching or touching wounds',
+            'Ensure medication is taken as prescribed',
+            'Keep affected area clean and protected',
+            'Observe symptoms and seek medical help if worsening'
+        ],
+        'Caregiver or Guardian Assistance': [
+            'Caregiver should assist with treatment application',
+            'Ensure medication is taken correctly and on time',
+            'Help maintain cleanliness of affected area',
+            'Monitor for signs of infection or complications',
+            'Seek medical attention if condition does not improve'
+        ]
+    },
+    'diet': {
+        'Anti-Inflammatory Diet': [
+            'Helps reduce skin inflammation',
+            'Include fruits and vegetables daily',
+            'Eat healthy fats like olive oil',
+            'Avoid processed foods',
+            'Supports skin healing naturally'
+        ],
+        'Low Sugar Diet': [
+            'Reduces inflammation and infection risk',
+            'Avoid sugary drinks and snacks',
+            'Choose whole grains instead',
+            'Helps improve immune function',
+            'Supports overall skin health'
+        ],
+        'High Protein Diet': [
+            'Supports skin repair and healing',
+            'Include eggs, chicken, and legumes',
+            'Helps regenerate damaged skin',
+            'Important during recovery phase',
+            'Balance with vegetables for nutrients'
+        ],
+        'Adequate Hydration': [
+            'Keeps skin hydrated from inside',
+            'Drink enough water daily (8 glasses)',
+            'Helps flush toxins from body',
+            'Improves skin elasticity',
+            'Supports overall health and healing'
+        ],
+        'Avoid Peanut Products': [
+            'Prevents allergic skin reactions',
+            'Especially important for sensitive patients',
+            'Read food labels carefully',
+            'Avoid cross-contaminated foods',
+            'Consult doctor if unsure about allergies'
+        ],
+        'Avoid Seafood': [
+            'Reduces risk of allergic flare-ups',
+            'Common trigger for skin reactions',
+            'Avoid during active symptoms',
+            'Reintroduce only with medical advice',
+            'Monitor skin for improvement'
+        ]
+    }
+}
@@ -0,0 +1,227 @@
+"""
+Knowledge Base Loader for Skin Disease Expert System
+Loads the knowledge base from JSON/YAML data files, versions it by content hash
+and watches the files for hot reload
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from backend import knowledge_base as builtin
+
+logger = logging.getLogger(__name__)
+
+# Top-level sections of a knowledge base file, and their module-level names
+SECTIONS = {
+    'input_variables': 'INPUT_VARIABLES',
+    'output_variables': 'OUTPUT_VARIABLES',
+    'disease_rules': 'DISEASE_RULES',
+    'treatment_rules': 'TREATMENT_RULES',
+    'lifestyle_rules': 'LIFESTYLE_RULES',
+    'diet_rules': 'DIET_RULES',
+    'questions': 'QUESTIONS',
+    'disease_info': 'DISEASE_INFO',
+    'recommendation_details': 'RECOMMENDATION_DETAILS'
+}
+
+# Sections a knowledge base file may leave out, with their default
+OPTIONAL_SECTIONS = {
+    'recommendation_details': {}
+}
+
+RULE_SECTIONS = ['disease_rules', 'treatment_rules', 'lifestyle_rules', 'diet_rules']
+
+DATA_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+
+class KnowledgeBase:
+    """
+    One loaded version of the knowledge base
+
+    The data must not be modified once loaded: engines compile it into
+    derived structures, and the version is a hash of its content.
+    """
+
+    def __init__(self, data, source=None):
+        _validate(data)
+        self.source = source
+        self.input_variables = data['input_variables']
+        self.output_variables = data['output_variables']
+        self.disease_rules = data['disease_rules']
+        self.treatment_rules = data['treatment_rules']
+        self.lifestyle_rules = data['lifestyle_rules']
+        self.diet_rules = data['diet_rules']
+        self.questions = data['questions']
+        self.disease_info = data['disease_info']
+        self.recommendation_details = data['recommendation_details']
+        self.version = content_hash(data)
+
+    @property
+    def all_rules(self):
+        """Rules of all four layers, in evaluation order"""
+        return self.disease_rules + self.treatment_rules + self.lifestyle_rules + self.diet_rules
+
+    def to_dict(self):
+        """Get the knowledge base as a plain data dict"""
+        return {section: getattr(self, section) for section in SECTIONS}
+
+
+def content_hash(data):
+    """
+    Version of a knowledge base: a hash of its canonical JSON form, so the
+    same content gives the same version whatever the file format or layout
+    """
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def default_knowledge_base():
+    """
+    Knowledge base defined by the literals in backend/knowledge_base.py
+    """
+    data = {section: copy.deepcopy(getattr(builtin, name)) for section, name in SECTIONS.items()}
+    return KnowledgeBase(data)
+
+
+def load_knowledge_base(path):
+    """
+    Load a knowledge base from a data file or a directory of data files
+
+    A file holds some or all of the sections as top-level keys. In a
+    directory every .json/.yaml/.yml file contributes its sections, and a
+    section may only be defined once.
+
+    Raises:
+        ValueError: If the data is incomplete or malformed
+    """
+    data = {}
+
+    for file_path in data_files(path):
+        for section, value in _read_file(file_path).items():
+            if section not in SECTIONS:
+                raise ValueError(f"Unknown knowledge base section '{section}' in {file_path}")
+            if section in data:
+                raise ValueError(f"Knowledge base section '{section}' is defined twice")
+            data[section] = value
+
+    for section, default in OPTIONAL_SECTIONS.items():
+        data.setdefault(section, copy.deepcopy(default))
+
+    return KnowledgeBase(data, source=path)
+
+
+def data_files(path):
+    """
+    Data files making up a knowledge base path, in a stable order
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.endswith(DATA_EXTENSIONS)]
+
+
+def _read_file(file_path):
+    with open(file_path, encoding='utf-8') as f:
+        if file_path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f'PyYAML is required to load {file_path}') from None
+            content = yaml.safe_load(f)
+        else:
+            content = json.load(f)
+
+    if not isinstance(content, dict):
+        raise ValueError(f'{file_path} must contain a mapping of knowledge base sections')
+    return content
+
+
+def _validate(data):
+    missing = [section for section in SECTIONS if section not in data]
+    if missing:
+        raise ValueError(f"Knowledge base is missing sections: {', '.join(missing)}")
+
+    seen = set()
+    for section in RULE_SECTIONS:
+        for rule in data[section]:
+            for key in ('id', 'name', 'logic', 'conditions', 'conclusion'):
+                if key not in rule:
+                    raise ValueError(f"Rule {rule.get('id', '?')} in {section} has no '{key}'")
+            if rule['id'] in seen:
+                raise ValueError(f"Rule id {rule['id']} is used more than once")
+            seen.add(rule['id'])
+
+
+class KnowledgeBaseWatcher:
+    """
+    Polls knowledge base files and calls on_change() when any of them changes
+
+    Errors raised by on_change(), e.g. a malformed file, are logged and the
+    running knowledge base stays in place.
+    """
+
+    def __init__(self, path, on_change, interval=2.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._fingerprint = self._read_fingerprint()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read_fingerprint(self):
+        fingerprint = []
+        try:
+            for file_path in data_files(self.path):
+                stat = os.stat(file_path)
+                fingerprint.append((file_path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            return None
+        return tuple(fingerprint)
+
+    def check(self):
+        """
+        Reload if the files changed since the last check
+
+        Returns:
+            bool: True if a change was seen
+        """
+        fingerprint = self._read_fingerprint()
+        if fingerprint is None or fingerprint == self._fingerprint:
+            return False
+
+        self._fingerprint = fingerprint
+        try:
+            self.on_change()
+        except Exception:
+            logger.exception('Reloading the knowledge base from %s failed', self.path)
+        return True
+
+    def start(self):
+        """
+        Start polling in a daemon thread
+
+        Threads do not survive fork(), so a forked child (e.g. a preforked
+        server worker) starts a polling thread of its own.
+        """
+        if self._thread is None:
+            self._start_thread()
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._start_thread)
+
+    def _start_thread(self):
+        if self._stop.is_set():
+            return
+        self._thread = threading.Thread(target=self._run, name='kb-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
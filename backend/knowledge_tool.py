@@ -0,0 +1,96 @@
+"""
+Knowledge Base Tool for Skin Disease Expert System
+Exports the built-in knowledge base to a data file, validates and analyzes
+data files and builds disease rule profiles (see backend.rule_order)
+
+Usage:
+    python -m backend.knowledge_tool export knowledge_base.json
+    python -m backend.knowledge_tool version path/to/knowledge_base
+    python -m backend.knowledge_tool analyze [path/to/knowledge_base]
+    python -m backend.knowledge_tool profile intake.ndjson -o profile.json
+    python -m backend.knowledge_tool verify-order profile.json
+"""
+
+import argparse
+import json
+import sys
+
+from backend.analysis import analyze
+from backend.inference_engine import InferenceEngine
+from backend.knowledge_loader import content_hash, default_knowledge_base, load_knowledge_base
+from backend.rule_order import load_profile, profile_answers, profile_order, verify_order
+from backend.score import read_csv, read_ndjson
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m backend.knowledge_tool',
+        description='Export or inspect knowledge base data files'
+    )
+    parser.add_argument('--knowledge-base',
+                        help='Knowledge base file or directory for profile/verify-order (default: built-in)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='Write the built-in knowledge base to a data file')
+    export.add_argument('path', help='Output .json, .yaml or .yml file')
+    version = commands.add_parser('version', help='Validate a knowledge base and print its version')
+    version.add_argument('path', help='Knowledge base file or directory')
+    analysis = commands.add_parser('analyze', help='Report dead values, shadowed and unreachable rules')
+    analysis.add_argument('path', nargs='?', help='Knowledge base file or directory (default: built-in)')
+    analysis.add_argument('--json', action='store_true', help='Print the report as JSON')
+    profile = commands.add_parser('profile', help='Count the disease rule fired by each recorded answer set')
+    profile.add_argument('input', help='NDJSON or CSV file of answer sets')
+    profile.add_argument('-o', '--output', default='-', help='Profile file, or - for stdout (default)')
+    verify = commands.add_parser('verify-order', help='Print the disease rule order of a profile and verify it')
+    verify.add_argument('profile', help='Profile file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        data = default_knowledge_base().to_dict()
+        with open(args.path, 'w', encoding='utf-8') as f:
+            if args.path.endswith(('.yaml', '.yml')):
+                import yaml
+                yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True)
+            else:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+        print(f'Exported knowledge base version {content_hash(data)} to {args.path}')
+    elif args.command == 'version':
+        print(load_knowledge_base(args.path).version)
+    elif args.command == 'analyze':
+        kb = load_knowledge_base(args.path) if args.path else default_knowledge_base()
+        report = analyze(kb)
+        if args.json:
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            for finding in report['findings']:
+                print(f"{finding['severity']:8} {finding['kind']:20} {finding['message']}")
+            print(f"{report['answer_sets']} answer sets, {report['no_diagnosis']} without a diagnosis")
+        return 1 if any(finding['severity'] == 'error' for finding in report['findings']) else 0
+    elif args.command == 'profile':
+        engine = InferenceEngine(knowledge_base=args.knowledge_base)
+        with open(args.input, newline='', encoding='utf-8') as source:
+            records = read_csv(source) if args.input.lower().endswith('.csv') else read_ndjson(source)
+            text = json.dumps(profile_answers(engine, records), indent=2) + '\n'
+        if args.output == '-':
+            sys.stdout.write(text)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text)
+    else:
+        engine = InferenceEngine(knowledge_base=args.knowledge_base)
+        counts = load_profile(args.profile)
+        rules = engine.knowledge_base.disease_rules
+        for position in profile_order(rules, engine.codec, counts):
+            print(f"{rules[position]['id']:12} {counts.get(rules[position]['id'], 0)}")
+
+        errors = verify_order(engine.knowledge_base, counts)
+        for error in errors:
+            print(error, file=sys.stderr)
+        print('verified: FAIL' if errors else 'verified: ok')
+        return 1 if errors else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
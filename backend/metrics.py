@@ -0,0 +1,176 @@
+"""
+Engine Metrics for Skin Disease Expert System
+Latency histograms and rule counters, exported in Prometheus text format
+"""
+
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# Upper bounds in seconds. A table lookup takes about a microsecond and a
+# full evaluation of the four layers some tens of microseconds.
+LATENCY_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025,
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.01
+)
+
+LAYERS = {1: 'disease', 2: 'treatment', 3: 'lifestyle', 4: 'diet'}
+
+
+class Histogram:
+    """
+    Cumulative latency histogram. Not locked: EngineMetrics updates it
+    under its own lock.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels=''):
+        """Prometheus sample lines of the histogram"""
+        lines = []
+        cumulative = 0
+        separator = ',' if labels else ''
+
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum!r}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class EngineMetrics:
+    """
+    Metrics of one InferenceEngine
+
+    - every diagnosis: its latency, whether it found a disease, and the
+      rules that fired for it (read from its explanation, so results from
+      the decision table or the result cache are counted too)
+    - every evaluation of the rule layers: the latency of each layer and
+      the rules whose conditions were tested. Diagnoses answered by the
+      decision table or the cache evaluate no rules.
+
+    Counters are kept across knowledge base reloads, by rule id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.diagnoses = 0
+        self.no_diagnosis = 0
+        self.diagnosis_seconds = Histogram()
+        self.layer_seconds = {layer: Histogram() for layer in LAYERS}
+        self.evaluations = Counter()
+        self.fires = Counter()
+
+    def observe_diagnosis(self, result, seconds=None):
+        """
+        Count one diagnosis result
+
+        Args:
+            result (dict): Result returned by the engine
+            seconds (float): Time taken, None when the result was reused
+                (e.g. a repeated answer set within a batch)
+        """
+        with self._lock:
+            self.diagnoses += 1
+            if result['disease'] is None:
+                self.no_diagnosis += 1
+            if seconds is not None:
+                self.diagnosis_seconds.observe(seconds)
+            for step in result['explanation']:
+                self.fires[(step['layer'], step['rule_id'])] += 1
+
+    def observe_layer(self, layer, seconds, evaluated):
+        """
+        Count one evaluation of a rule layer
+
+        Args:
+            layer (int): Layer number
+            seconds (float): Time taken by the layer
+            evaluated (iterable): Rule records whose conditions were tested
+        """
+        with self._lock:
+            self.layer_seconds[layer].observe(seconds)
+            for rule in evaluated:
+                self.evaluations[(layer, rule.id)] += 1
+
+    def render(self, knowledge_base, cache=None):
+        """
+        Prometheus text exposition of all metrics
+
+        Args:
+            knowledge_base (KnowledgeBase): Knowledge base in use; each of its
+                rules is listed, with zero counts for rules never evaluated
+            cache (ResultCache): Result cache of the engine, if any
+        """
+        with self._lock:
+            rules = [
+                (layer, rule['id'])
+                for layer, section in enumerate((knowledge_base.disease_rules, knowledge_base.treatment_rules,
+                                                 knowledge_base.lifestyle_rules, knowledge_base.diet_rules), 1)
+                for rule in section
+            ]
+            # Rules of older knowledge base versions keep their counts
+            rules += sorted((set(self.evaluations) | set(self.fires)) - set(rules))
+
+            lines = [
+                '# HELP skin_es_knowledge_base_info Knowledge base version in use',
+                '# TYPE skin_es_knowledge_base_info gauge',
+                f'skin_es_knowledge_base_info{{version="{knowledge_base.version}"}} 1',
+                '# HELP skin_es_diagnoses_total Diagnoses made',
+                '# TYPE skin_es_diagnoses_total counter',
+                f'skin_es_diagnoses_total {self.diagnoses}',
+                '# HELP skin_es_no_diagnosis_total Diagnoses where no disease rule fired',
+                '# TYPE skin_es_no_diagnosis_total counter',
+                f'skin_es_no_diagnosis_total {self.no_diagnosis}',
+                '# HELP skin_es_diagnosis_seconds Time to answer a diagnosis',
+                '# TYPE skin_es_diagnosis_seconds histogram'
+            ]
+            lines += self.diagnosis_seconds.samples('skin_es_diagnosis_seconds')
+
+            lines += [
+                '# HELP skin_es_layer_seconds Time to evaluate one rule layer',
+                '# TYPE skin_es_layer_seconds histogram'
+            ]
+            for layer, name in LAYERS.items():
+                lines += self.layer_seconds[layer].samples(
+                    'skin_es_layer_seconds', f'layer="{layer}",name="{name}"'
+                )
+
+            for metric, counts, description in (
+                ('skin_es_rule_evaluations_total', self.evaluations, 'Times the conditions of a rule were tested'),
+                ('skin_es_rule_fires_total', self.fires, 'Diagnoses a rule fired in')
+            ):
+                lines += [f'# HELP {metric} {description}', f'# TYPE {metric} counter']
+                lines += [
+                    f'{metric}{{layer="{layer}",rule="{_escape(rule_id)}"}} {counts[(layer, rule_id)]}'
+                    for layer, rule_id in rules
+                ]
+
+        if cache is not None:
+            lines += [
+                '# HELP skin_es_result_cache_hits_total Result cache hits',
+                '# TYPE skin_es_result_cache_hits_total counter',
+                f'skin_es_result_cache_hits_total {cache.hits}',
+                '# HELP skin_es_result_cache_misses_total Result cache misses',
+                '# TYPE skin_es_result_cache_misses_total counter',
+                f'skin_es_result_cache_misses_total {cache.misses}'
+            ]
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
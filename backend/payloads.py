@@ -0,0 +1,145 @@
+"""
+Static Payloads for Skin Disease Expert System
+Builds the questions and documentation payloads and the HTML pages once per
+knowledge base version
+"""
+
+import gzip
+import hashlib
+import threading
+
+from backend.serialization import dumps_bytes
+
+# Layer number, display name and rule section, in evaluation order
+RULE_LAYERS = [
+    (1, 'Disease Identification', 'disease_rules'),
+    (2, 'Suggested Treatment', 'treatment_rules'),
+    (3, 'Suggested Lifestyle', 'lifestyle_rules'),
+    (4, 'Diet Recommendation', 'diet_rules')
+]
+
+
+def questions_payload(kb):
+    """Get all questions for diagnosis form"""
+    return {
+        'success': True,
+        'questions': kb.questions
+    }
+
+
+def documentation_payload(kb):
+    """Get system documentation data"""
+    # Format rules for display
+    all_rules = []
+
+    for layer, layer_name, section in RULE_LAYERS:
+        for rule in getattr(kb, section):
+            conclusion = rule['conclusion']
+            if isinstance(conclusion, list):
+                conclusion = ' OR '.join(conclusion)
+            all_rules.append({
+                'layer': layer,
+                'layer_name': layer_name,
+                'id': rule['id'],
+                'name': rule['name'],
+                'logic': rule['logic'],
+                'conclusion': conclusion
+            })
+
+    return {
+        'success': True,
+        'input_variables': kb.input_variables,
+        'output_variables': kb.output_variables,
+        'rules': all_rules
+    }
+
+
+def recommendation_details_payload(kb):
+    """Get the educational details of every recommendation"""
+    return {
+        'success': True,
+        'details': kb.recommendation_details
+    }
+
+
+def with_recommendation_details(result, kb):
+    """
+    Copy of a diagnosis result with the educational details of the
+    recommendations it contains, by output variable and conclusion
+    """
+    details = {}
+    for kind, catalog in kb.recommendation_details.items():
+        details[kind] = {
+            item: catalog[item] for item in result.get(kind, []) if item in catalog
+        }
+    return {**result, 'details': details}
+
+
+class Payload:
+    """
+    A response body prepared once: its bytes, a gzip-compressed copy and a
+    strong ETag for each
+    """
+
+    mimetype = 'application/octet-stream'
+
+    def __init__(self, body, version):
+        self.version = version
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        # mtime=0 keeps the compressed bytes, and so the ETag, reproducible
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.gzip_etag = self.etag + '-gz'
+
+
+class JsonPayload(Payload):
+    """
+    API data serialized once
+    """
+
+    mimetype = 'application/json'
+
+    def __init__(self, data, version):
+        super().__init__(dumps_bytes(data, sort_keys=True), version)
+
+
+class HtmlPayload(Payload):
+    """
+    A page rendered once
+    """
+
+    mimetype = 'text/html'
+
+    def __init__(self, html, version):
+        super().__init__(html.encode('utf-8'), version)
+
+
+class PayloadCache:
+    """
+    Prepared payloads by name, rebuilt when the knowledge base version changes
+    """
+
+    def __init__(self):
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, kb, build, payload_class=JsonPayload):
+        """
+        Get the payload for a knowledge base version, building it on first use
+
+        Args:
+            name (str): Payload name
+            kb (KnowledgeBase): Knowledge base the payload is built from
+            build (callable): Returns the payload data for a knowledge base
+            payload_class (type): Payload wrapping the built data
+        """
+        payload = self._payloads.get(name)
+        if payload is not None and payload.version == kb.version:
+            return payload
+
+        with self._lock:
+            payload = self._payloads.get(name)
+            if payload is None or payload.version != kb.version:
+                payload = payload_class(build(kb), kb.version)
+                self._payloads[name] = payload
+            return payload
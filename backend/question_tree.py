@@ -0,0 +1,182 @@
+"""
+Question Tree for Skin Disease Expert System
+Picks the next question to ask from a partial answer set, so that the
+diagnosis is fixed after as few questions as possible
+"""
+
+import math
+from collections import Counter
+
+
+class QuestionTree:
+    """
+    Decision tree over a decision table, built lazily and memoized
+
+    A node is a partial answer set. The outcome of a node is fixed once every
+    complete answer set that extends it has the same diagnosis result. Until
+    then the node asks the unanswered question with the highest information
+    gain about the result, all complete answer sets being equally likely.
+    Ties go to the question asked first in QUESTIONS.
+
+    Every node keeps the complete answer sets that extend it, so a child is
+    built from its parent's answer sets rather than from the whole table.
+    """
+
+    def __init__(self, table, questions, max_nodes=100000):
+        """
+        Args:
+            table (DecisionTable): Diagnosis of every complete answer set
+            questions (list): Question definitions, in their default order
+            max_nodes (int): Maximum number of nodes to memoize
+        """
+        self.table = table
+        self.codec = table.codec
+        self.max_nodes = max_nodes
+        self.questions = {question['id']: question for question in questions}
+
+        order = [question['id'] for question in questions]
+        self.fields = sorted(
+            (field for field in self.codec.fields if field['id'] in self.questions),
+            key=lambda field: order.index(field['id'])
+        )
+        self.masks = {field['id']: ((1 << field['width']) - 1) << field['shift'] for field in self.fields}
+        self.entries = [(code, table.slots[code]) for code in self.codec.iter_codes()]
+        self.built = 0
+        self._nodes = {}
+        self.root = self._add((0, 0), self._build(0, self.entries))
+
+    def next_step(self, answers):
+        """
+        Get the next question to ask, or the diagnosis if it is already fixed
+
+        Args:
+            answers (dict): Answers given so far
+
+        Returns:
+            dict: {'complete': True, 'result': ...} once the outcome is fixed,
+                else {'complete': False, 'question': ..., 'information_gain': ...,
+                'possible_diseases': [...]}. None when an answer is outside
+                the domain of its question.
+        """
+        packed = self.codec.pack_partial(answers)
+        if packed is None:
+            return None
+
+        node = self._node(*packed)
+        if node['result'] is not None:
+            return {'complete': True, 'result': self.table.results[node['result']]}
+
+        return {
+            'complete': False,
+            'question': self.questions[node['question']],
+            'information_gain': node['gain'],
+            'possible_diseases': node['diseases']
+        }
+
+    def expand(self, depth):
+        """
+        Build every node reached by following the tree's own questions for
+        up to depth answers, e.g. to precompute the top of the tree
+
+        Returns:
+            int: Number of nodes in those levels
+        """
+        level = [((0, 0), self.root)]
+        count = 1
+        for _ in range(depth):
+            children = []
+            for (mask, value), node in level:
+                if node['result'] is not None:
+                    continue
+                field_mask = self.masks[node['question']]
+                for bits in sorted({code & field_mask for code, _ in node['entries']}):
+                    key = (mask | field_mask, value | bits)
+                    children.append((key, self._child(node, key)))
+            level = children
+            count += len(children)
+        return count
+
+    def _node(self, mask, value):
+        """
+        Node of a partial answer set
+
+        The tree is walked from the root along the answered questions. When
+        the answers follow the tree, the node is reached that way; otherwise
+        it is built from the answer sets of the last node of the walk.
+        """
+        node = self._nodes.get((mask, value))
+        if node is not None:
+            return node
+
+        node = self.root
+        while node['result'] is None:
+            field_mask = self.masks[node['question']]
+            if not mask & field_mask:
+                break
+            key = (node['mask'] | field_mask, node['value'] | (value & field_mask))
+            node = self._child(node, key)
+            if key == (mask, value):
+                return node
+
+        if node['result'] is not None:
+            # Every answer set extending a fixed outcome has that outcome
+            return node
+        # The walk cannot reach this node, so it is never a parent: drop its answer sets
+        node = self._child(node, (mask, value))
+        node.pop('entries', None)
+        return node
+
+    def _child(self, parent, key):
+        """Node of key, built from the answer sets of its ancestor parent"""
+        node = self._nodes.get(key)
+        if node is None:
+            mask, value = key
+            node = self._build(mask, [entry for entry in parent['entries'] if entry[0] & mask == value])
+            self._add(key, node)
+        return node
+
+    def _add(self, key, node):
+        node['mask'], node['value'] = key
+        if len(self._nodes) < self.max_nodes:
+            self._nodes[key] = node
+        return node
+
+    def _build(self, mask, entries):
+        self.built += 1
+        outcomes = Counter(index for _, index in entries)
+
+        if len(outcomes) == 1:
+            return {'result': next(iter(outcomes))}
+
+        total = len(entries)
+        best = None
+        for field in self.fields:
+            field_mask = self.masks[field['id']]
+            if mask & field_mask:
+                continue
+            joint = Counter((code & field_mask, index) for code, index in entries)
+            branches = Counter()
+            for (answer, _), count in joint.items():
+                branches[answer] += count
+            # H(result | answer) = H(answer, result) - H(answer)
+            remaining = _entropy(joint.values(), total) - _entropy(branches.values(), total)
+            if best is None or remaining < best[0] - 1e-12:
+                best = (remaining, field['id'])
+
+        diseases = []
+        for index in outcomes:
+            disease = self.table.results[index]['disease']
+            if disease is not None and disease not in diseases:
+                diseases.append(disease)
+
+        return {
+            'result': None,
+            'question': best[1],
+            'gain': round(_entropy(outcomes.values(), total) - best[0], 6),
+            'diseases': [disease for disease in self.codec.disease['values'] if disease in diseases],
+            'entries': entries
+        }
+
+
+def _entropy(counts, total):
+    return -sum(count / total * math.log2(count / total) for count in counts)
@@ -0,0 +1,78 @@
+"""
+Result Cache for Skin Disease Expert System
+Bounded LRU cache of diagnosis results keyed by encoded answer records
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Thread-safe least-recently-used cache with hit, miss and eviction counters
+
+    Every clear() starts a new generation. A result computed before a clear
+    is dropped by put(), so a knowledge base reload cannot be undone by a
+    request that was still running on the old rules.
+    """
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError('Cache size must be at least 1')
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Get a cached result and mark it as recently used, None on a miss
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result, generation):
+        """
+        Store a result computed during the given generation
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drop every cached result and start a new generation
+        """
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        """
+        Get the cache counters
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,230 @@
+"""
+Result Store for Skin Disease Expert System
+Keeps diagnosis results server-side so that only a short id travels in the session cookie
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+
+from backend import serialization
+
+
+class ResultStore:
+    """
+    Base class for result stores
+
+    Stored values are dicts of JSON-serializable data. Every entry expires
+    ttl seconds after it was stored.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+
+    def put(self, value, result_id=None):
+        """
+        Store a value
+
+        Args:
+            value (dict): Value to store
+            result_id (str): Id of an earlier value to overwrite in place,
+                None to store under a new id
+
+        Returns:
+            str: Id to retrieve the value with
+        """
+        if result_id is None:
+            result_id = secrets.token_urlsafe(16)
+        self._put(result_id, value, time.time() + self.ttl)
+        return result_id
+
+    def get(self, result_id):
+        """
+        Get a stored value, None if it is unknown or expired
+        """
+        raise NotImplementedError
+
+    def delete(self, result_id):
+        """
+        Remove a stored value if it exists
+        """
+        raise NotImplementedError
+
+    def _put(self, result_id, value, expires):
+        raise NotImplementedError
+
+
+class MemoryResultStore(ResultStore):
+    """
+    Process-local store, the default. Not shared between worker processes.
+    """
+
+    def __init__(self, ttl=3600, max_entries=10000):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, result_id):
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[result_id]
+                return None
+            return value
+
+    def delete(self, result_id):
+        with self._lock:
+            self._entries.pop(result_id, None)
+
+    def _put(self, result_id, value, expires):
+        with self._lock:
+            self._purge(time.time())
+            # An overwritten entry moves to the back with its new expiry
+            self._entries.pop(result_id, None)
+            self._entries[result_id] = (expires, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _purge(self, now):
+        # Entries are kept in insertion order and share one TTL,
+        # so expired entries are always at the front
+        while self._entries:
+            result_id, (expires, _) = next(iter(self._entries.items()))
+            if expires >= now:
+                break
+            del self._entries[result_id]
+
+
+class SQLiteResultStore(ResultStore):
+    """
+    Store backed by an SQLite database file, shared by all worker processes
+    """
+
+    def __init__(self, path, ttl=3600):
+        super().__init__(ttl)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(id TEXT PRIMARY KEY, expires REAL NOT NULL, data TEXT NOT NULL)'
+            )
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe to share
+        # between threads and forked workers
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            with connection:
+                yield connection
+
+    def get(self, result_id):
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT data FROM results WHERE id = ? AND expires >= ?',
+                (result_id, time.time())
+            ).fetchone()
+        return None if row is None else serialization.loads(row[0])
+
+    def delete(self, result_id):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM results WHERE id = ?', (result_id,))
+
+    def _put(self, result_id, value, expires):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM results WHERE expires < ?', (time.time(),))
+            connection.execute(
+                'INSERT OR REPLACE INTO results (id, expires, data) VALUES (?, ?, ?)',
+                (result_id, expires, serialization.dumps(value))
+            )
+
+
+class FileResultStore(ResultStore):
+    """
+    Store keeping one JSON file per result in a directory
+    """
+
+    # Expired files are swept after this many writes
+    PURGE_INTERVAL = 100
+
+    def __init__(self, directory, ttl=3600):
+        super().__init__(ttl)
+        self.directory = directory
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, result_id):
+        # Ids come from the session cookie, only accept what put() generates
+        if not isinstance(result_id, str) or not result_id \
+                or not all(c.isalnum() or c in '-_' for c in result_id):
+            return None
+        return os.path.join(self.directory, result_id + '.json')
+
+    def get(self, result_id):
+        path = self._path(result_id)
+        if path is None:
+            return None
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return serialization.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, result_id):
+        path = self._path(result_id)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _put(self, result_id, value, expires):
+        path = self._path(result_id)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(serialization.dumps_bytes(value))
+        os.replace(temporary, path)
+
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self._purge(time.time())
+
+    def _purge(self, now):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.json') and os.path.getmtime(path) + self.ttl < now:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def create_result_store(url, ttl=3600):
+    """
+    Create a result store from a URL-like setting
+
+    Args:
+        url (str): 'memory', 'sqlite:path/to/results.db' or 'file:path/to/directory'
+        ttl (int): Seconds a stored result stays available
+    """
+    if url == 'memory':
+        return MemoryResultStore(ttl)
+    if url.startswith('sqlite:'):
+        return SQLiteResultStore(url[len('sqlite:'):], ttl)
+    if url.startswith('file:'):
+        return FileResultStore(url[len('file:'):], ttl)
+    raise ValueError(f'Unknown result store: {url}')
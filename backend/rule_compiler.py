@@ -0,0 +1,148 @@
+"""
+Rule Compiler for Skin Disease Expert System
+Turns each rule's conditions dict into a predicate over encoded answer records
+once, when the rules are loaded
+"""
+
+
+# ============================================
+# PREDICATE COMPILATION
+# ============================================
+
+def compile_disease_rule(rule, codec):
+    """
+    Compile a layer 1 rule into test(record) -> bool
+
+    Every condition becomes one mask over the answer record: an equality is a
+    single bit, a list of valid values or an appearance selection is the OR of
+    their bits. The rule holds when the record shares a bit with every mask.
+    """
+    return _all_masks(tuple(mask for _, mask in disease_rule_masks(rule, codec)))
+
+
+def compile_rule(rule, codec):
+    """
+    Compile a layer 2-4 rule into test(record) -> bool, where the record also
+    carries the bit of the inferred disease
+    """
+    return _all_masks(tuple(mask for _, mask in rule_masks(rule, codec)))
+
+
+def disease_rule_masks(rule, codec):
+    """
+    Conditions of a layer 1 rule as (fact, mask) pairs
+    """
+    masks = []
+
+    for key, required in rule['conditions'].items():
+        # disease_not conditions are not part of layer 1
+        if key == 'disease_not':
+            continue
+        masks.append((key, _value_mask(rule, codec, key, required)))
+
+    return masks
+
+
+def rule_masks(rule, codec):
+    """
+    Conditions of a layer 2-4 rule as (fact, mask) pairs, a disease_not
+    condition being a condition on the 'disease' fact
+    """
+    masks = []
+
+    for key, required in rule['conditions'].items():
+        if key == 'disease_not':
+            # The disease is always known here, so NOT x means any other disease
+            masks.append(('disease', codec.disease['mask'] & ~codec.bit('disease', required)))
+        elif key in codec.by_id and codec.by_id[key]['multiple']:
+            # A selection list never equals a required value
+            masks.append((key, 0))
+        else:
+            masks.append((key, _value_mask(rule, codec, key, required)))
+
+    return masks
+
+
+def _value_mask(rule, codec, key, required):
+    if key not in codec.by_id:
+        raise ValueError(f"Rule {rule['id']} tests unknown fact '{key}'")
+    values = required if isinstance(required, list) else [required]
+    return codec.value_mask(key, values)
+
+
+def _all_masks(masks):
+    def test(record):
+        for mask in masks:
+            if not record & mask:
+                return False
+        return True
+
+    return test
+
+
+# ============================================
+# REFERENCE EVALUATION
+# ============================================
+
+def evaluate_disease_conditions(conditions, facts):
+    """
+    Reference (uncompiled) evaluation of layer 1 rule conditions
+    Used by the self-checks to prove the compiled predicates equivalent
+    """
+    for key, required_value in conditions.items():
+        # Skip disease_not conditions (handled separately)
+        if key == 'disease_not':
+            continue
+
+        user_value = facts.get(key)
+
+        if user_value is None:
+            return False
+
+        # Handle appearance (multiple selection in both rule and user input)
+        if key == 'appearance':
+            # Need to check if ANY of the required values are in user's selection
+            if isinstance(user_value, list):
+                if not any(val in user_value for val in required_value):
+                    return False
+            else:
+                return False
+
+        # Handle single value or list of valid values
+        else:
+            if isinstance(required_value, list):
+                if user_value not in required_value:
+                    return False
+            else:
+                if user_value != required_value:
+                    return False
+
+    return True
+
+
+def evaluate_conditions(conditions, facts):
+    """
+    Reference (uncompiled) evaluation of layer 2-4 rule conditions,
+    including disease_not conditions
+    """
+    for key, required_value in conditions.items():
+        # Handle negative disease condition
+        if key == 'disease_not':
+            if facts.get('disease') == required_value:
+                return False
+            continue
+
+        user_value = facts.get(key)
+
+        if user_value is None:
+            return False
+
+        # Handle value comparison
+        if isinstance(required_value, list):
+            if user_value not in required_value:
+                return False
+        else:
+            if user_value != required_value:
+                return False
+
+    return True
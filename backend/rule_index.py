@@ -0,0 +1,71 @@
+"""
+Rule Index for Skin Disease Expert System
+Maps (fact, value) discriminators to the rules that can possibly fire for them
+"""
+
+from operator import itemgetter
+
+# Facts used to discriminate rules, in order of preference
+DISCRIMINATORS = ('disease', 'age_group', 'allergy')
+
+_position = itemgetter(0)
+
+
+class RuleIndex:
+    """
+    Index of one rule layer by the first discriminating fact each rule tests
+
+    A rule that requires e.g. disease = 'Eczema' is only a candidate when the
+    record carries that value. Every (fact, value) pair is a distinct record
+    bit, so buckets are keyed by the bit itself. Rules with a disease_not
+    condition, and rules that test none of the discriminators, go to an
+    always-check bucket. Candidates are returned in their original rule order
+    so that conclusions keep their order.
+    """
+
+    def __init__(self, rules, codec, items=None, discriminators=DISCRIMINATORS):
+        """
+        Args:
+            rules (list): Rules of one layer
+            codec (AnswerCodec): Encoding of the records the rules are matched against
+            items (list): Objects returned as candidates, one per rule
+                (defaults to the rules themselves)
+            discriminators (tuple): Facts to index on, in order of preference
+        """
+        if items is None:
+            items = rules
+        self.masks = tuple(codec.by_id[fact]['mask'] for fact in discriminators)
+        self.buckets = {}
+        self.always = []
+
+        for position, (rule, item) in enumerate(zip(rules, items)):
+            conditions = rule['conditions']
+            fact = None
+            if 'disease_not' not in conditions:
+                fact = next((name for name in discriminators if name in conditions), None)
+
+            if fact is None:
+                self.always.append((position, item))
+                continue
+
+            # A value without a bit can never match, so the rule is never a candidate
+            required = conditions[fact]
+            values = required if isinstance(required, list) else [required]
+            for value in dict.fromkeys(values):
+                bit = codec.bit(fact, value)
+                if bit:
+                    self.buckets.setdefault(bit, []).append((position, item))
+
+    def candidates(self, record):
+        """
+        Get the rules that may fire for the given record, in rule order
+        """
+        found = list(self.always)
+
+        for mask in self.masks:
+            bucket = self.buckets.get(record & mask)
+            if bucket:
+                found.extend(bucket)
+
+        found.sort(key=_position)
+        return [item for _, item in found]
@@ -0,0 +1,203 @@
+"""
+Profile-Guided Rule Ordering for Skin Disease Expert System
+Reorders the first-match disease rules so that the most frequent diagnoses
+are tested first, without changing any diagnosis
+
+Profiles are built and verified with backend.knowledge_tool:
+    python -m backend.knowledge_tool profile intake.ndjson -o profile.json
+    python -m backend.knowledge_tool verify-order profile.json
+
+Layer 1 returns the first rule that matches, so two rules that can match
+the same answers must keep their relative order (rule_1a/rule_1b, Eczema,
+before rule_3, Ringworm: both match itching with scaly skin). Rules that
+can never match the same answers are mutually exclusive and may be tested
+in any order: every answer set still fires the same rule.
+"""
+
+import json
+
+from backend.rule_compiler import disease_rule_masks
+
+
+# ============================================
+# OVERLAP GRAPH
+# ============================================
+
+def overlap_graph(rules, codec):
+    """
+    Find which layer 1 rules can match the same answer record
+
+    A record sets at most one bit of a single selection and any number of
+    bits of a multiple selection, so two rules overlap unless they require
+    disjoint values of some single selection. A rule with an empty mask
+    never matches and overlaps nothing.
+
+    Args:
+        rules (list): Layer 1 rule dicts, in priority order
+        codec (AnswerCodec): Encoding of the records the rules are matched against
+
+    Returns:
+        list: For each rule, the set of positions of the rules it overlaps
+    """
+    masks = [dict(disease_rule_masks(rule, codec)) for rule in rules]
+    graph = [set() for _ in rules]
+
+    for i, first in enumerate(masks):
+        for j in range(i + 1, len(masks)):
+            if _can_overlap(first, masks[j], codec):
+                graph[i].add(j)
+                graph[j].add(i)
+
+    return graph
+
+
+def _can_overlap(first, second, codec):
+    if not all(first.values()) or not all(second.values()):
+        return False
+    for fact in first.keys() & second.keys():
+        if not codec.by_id[fact]['multiple'] and not first[fact] & second[fact]:
+            return False
+    return True
+
+
+# ============================================
+# ORDERING
+# ============================================
+
+def profile_order(rules, codec, profile):
+    """
+    Order layer 1 rules by how often they fire, keeping every pair of
+    overlapping rules in its original order
+
+    Minimizes the expected number of rules tested per diagnosis: at each
+    step the rule with the highest fire count per rule still to be placed
+    before it (its own overlapping predecessors included) goes next,
+    together with those predecessors. Without a profile, or with equal
+    counts, the original order is kept.
+
+    Args:
+        rules (list): Layer 1 rule dicts, in priority order
+        codec (AnswerCodec): Encoding of the records the rules are matched against
+        profile (dict): Rule id -> number of times it fired
+
+    Returns:
+        list: Positions of the rules in their new order
+    """
+    graph = overlap_graph(rules, codec)
+    weights = [profile.get(rule['id'], 0) for rule in rules]
+
+    # Earlier rules each rule must follow, directly or through other rules
+    before = []
+    for position, neighbours in enumerate(graph):
+        required = 0
+        for other in neighbours:
+            if other < position:
+                required |= (1 << other) | before[other]
+        before.append(required)
+
+    remaining = (1 << len(rules)) - 1
+    order = []
+
+    while remaining:
+        best = None
+        for position in _positions(remaining):
+            group = (before[position] & remaining) | (1 << position)
+            members = _positions(group)
+            density = sum(weights[member] for member in members) / len(members)
+            if best is None or density > best[0]:
+                best = (density, members, group)
+
+        # Members are in original order, which satisfies every constraint among them
+        order.extend(best[1])
+        remaining &= ~best[2]
+
+    return order
+
+
+def _positions(bits):
+    positions = []
+    while bits:
+        low = bits & -bits
+        positions.append(low.bit_length() - 1)
+        bits ^= low
+    return positions
+
+
+def load_profile(path):
+    """
+    Read a profile file: a JSON object mapping rule ids to fire counts
+    """
+    with open(path, encoding='utf-8') as f:
+        profile = json.load(f)
+    if not isinstance(profile, dict) or not all(
+        isinstance(count, (int, float)) and count >= 0 for count in profile.values()
+    ):
+        raise ValueError(f'{path}: a profile maps rule ids to non-negative fire counts')
+    return profile
+
+
+def profile_answers(engine, answer_sets):
+    """
+    Count the layer 1 rule that fires for each answer set
+
+    Returns:
+        dict: Rule id -> fire count, every layer 1 rule included
+    """
+    profile = {rule['id']: 0 for rule in engine.knowledge_base.disease_rules}
+    for result in engine.iter_diagnose(answer for answer in answer_sets if answer is not None):
+        for step in result['explanation']:
+            if step['layer'] == 1:
+                profile[step['rule_id']] += 1
+    return profile
+
+
+# ============================================
+# VERIFICATION
+# ============================================
+
+def verify_order(knowledge_base, profile):
+    """
+    Verify that reordering by a profile changes no diagnosis
+
+    Checks that the order is a permutation keeping every overlapping pair in
+    its original order, which guarantees the same first match on any record,
+    and then compares a reordered engine with a plain one on every
+    complete answer set.
+
+    Returns:
+        list: Error messages, empty when the order is safe
+    """
+    from backend.inference_engine import InferenceEngine
+
+    plain = InferenceEngine()
+    plain.reload(knowledge_base)
+    reordered = InferenceEngine(rule_profile=profile)
+    reordered.reload(knowledge_base)
+
+    rules = knowledge_base.disease_rules
+    codec = plain.codec
+    order = profile_order(rules, codec, profile)
+    errors = []
+
+    if sorted(order) != list(range(len(rules))):
+        errors.append(f'Order {order} is not a permutation of the {len(rules)} rules')
+        return errors
+    position = {rule: index for index, rule in enumerate(order)}
+    for rule, neighbours in enumerate(overlap_graph(rules, codec)):
+        for other in neighbours:
+            if rule < other and position[rule] > position[other]:
+                errors.append(f"Overlapping rules {rules[rule]['id']} and {rules[other]['id']} swapped")
+
+    tested = [rule.id for rule in reordered._snapshot.disease_rules]
+    if tested != [rules[index]['id'] for index in order]:
+        errors.append('Reordered engine does not test the rules in profile order')
+
+    for code in codec.iter_codes():
+        answers = codec.unpack(code)
+        if plain.diagnose(answers) != reordered.diagnose(answers):
+            errors.append(f'Diagnosis differs for {answers}')
+            if len(errors) >= 20:
+                break
+
+    return errors
+
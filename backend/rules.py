@@ -0,0 +1,82 @@
+"""
+Rule Records for Skin Disease Expert System
+Frozen, slotted form of the knowledge base rules used by the engine
+"""
+
+from types import MappingProxyType
+
+from backend.rule_compiler import compile_disease_rule, compile_rule
+
+
+class Rule:
+    """
+    One compiled rule
+
+    Attributes:
+        id (str), name (str), logic (str), layer (int): As in the knowledge base
+        conditions (mapping): Read-only view of the rule's conditions
+        conclusion: The conclusion as written, a value or a list of values
+        conclusions (tuple): The conclusion normalized to a tuple of values
+        test (callable): Compiled predicate over encoded answer records
+        explanation (dict): Trace entry added when the rule fires; the
+            engine hands out copies of it, never the entry itself
+    """
+
+    __slots__ = (
+        'id', 'name', 'logic', 'layer', 'conditions',
+        'conclusion', 'conclusions', 'test', 'explanation'
+    )
+
+    def __init__(self, rule, layer, test):
+        """
+        Args:
+            rule (dict): Rule as defined in the knowledge base
+            layer (int): Layer the rule belongs to
+            test (callable): Compiled predicate of the rule
+        """
+        conclusion = rule['conclusion']
+        conclusions = tuple(conclusion) if isinstance(conclusion, list) else (conclusion,)
+        fields = {
+            'id': rule['id'],
+            'name': rule['name'],
+            'logic': rule['logic'],
+            'layer': layer,
+            'conditions': MappingProxyType(rule['conditions']),
+            'conclusion': conclusion,
+            'conclusions': conclusions,
+            'test': test,
+            'explanation': {
+                'layer': layer,
+                'rule_id': rule['id'],
+                'name': rule['name'],
+                'logic': rule['logic'],
+                'conclusion': conclusion
+            }
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __repr__(self):
+        return f'Rule(id={self.id!r}, layer={self.layer!r}, name={self.name!r})'
+
+
+def compile_rules(rules, layer, codec):
+    """
+    Compile one layer of knowledge base rules into Rule records
+
+    Args:
+        rules (list): Rule dicts of one layer
+        layer (int): Layer number, 1 for disease identification
+        codec (AnswerCodec): Encoding of the records the rules are matched against
+
+    Returns:
+        tuple: Rule records in knowledge base order
+    """
+    compile_test = compile_disease_rule if layer == 1 else compile_rule
+    return tuple(Rule(rule, layer, compile_test(rule, codec)) for rule in rules)
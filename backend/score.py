@@ -0,0 +1,215 @@
+"""
+Offline Scoring for Skin Disease Expert System
+Streams answer records from NDJSON or CSV through the inference engine
+
+Usage:
+    python -m backend.score intake.ndjson -o scored.ndjson
+    python -m backend.score intake.csv --workers 8 --chunk-size 2000
+    cat intake.ndjson | python -m backend.score > scored.ndjson
+"""
+
+import argparse
+import csv
+import io
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from backend.inference_engine import InferenceEngine
+from backend.serialization import dumps, loads
+
+OUTPUT_COLUMNS = ['id', 'success', 'disease', 'contagious', 'treatment', 'lifestyle', 'diet', 'rules']
+
+# Engine used by the current process (set before forking, or by the pool initializer)
+_engine = None
+
+
+def read_ndjson(stream):
+    """
+    Yield one answer record per non-empty NDJSON line
+    Lines that are not JSON objects are yielded as None
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else None
+
+
+def read_csv(stream, appearance_separator='|'):
+    """
+    Yield one answer record per CSV row
+    The appearance column holds several values joined by appearance_separator
+    """
+    for row in csv.DictReader(stream):
+        record = {key: value.strip() for key, value in row.items()
+                  if key is not None and value is not None}
+        appearance = record.get('appearance', '')
+        record['appearance'] = [item.strip() for item in appearance.split(appearance_separator)
+                                if item.strip()]
+        yield record
+
+
+def score_chunk(records, output_format, id_field, separator):
+    """
+    Diagnose a chunk of records and format one output line per record
+    """
+    valid = [record for record in records if record is not None]
+    results = iter(_engine.diagnose_many(valid))
+    lines = []
+
+    for record in records:
+        if record is None:
+            result = {'success': False, 'message': 'Invalid record'}
+            record_id = None
+        else:
+            result = next(results)
+            record_id = record.get(id_field)
+
+        if output_format == 'csv':
+            lines.append(_csv_row(record_id, result, separator))
+        else:
+            lines.append(dumps({'id': record_id, **result}) + '\n')
+
+    return lines
+
+
+def _csv_row(record_id, result, separator):
+    """Flatten a diagnosis result into one CSV line"""
+    row = {
+        'id': record_id,
+        'success': result['success'],
+        'disease': result.get('disease') or '',
+        'contagious': result.get('contagious'),
+        'treatment': separator.join(result.get('treatment', [])),
+        'lifestyle': separator.join(result.get('lifestyle', [])),
+        'diet': separator.join(result.get('diet', [])),
+        'rules': separator.join(rule['rule_id'] for rule in result.get('explanation', []))
+    }
+    return _format_csv([row.get(column) for column in OUTPUT_COLUMNS])
+
+
+def _format_csv(values):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(
+        ['' if value is None else value for value in values]
+    )
+    return buffer.getvalue()
+
+
+def _init_worker(compiled):
+    global _engine
+    if _engine is None:
+        _engine = InferenceEngine(compiled=compiled)
+    if compiled:
+        # Built before the pool forks, so that workers inherit the table
+        _engine.decision_table
+
+
+def _chunks(records, chunk_size):
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score(records, output, output_format='ndjson', workers=1, chunk_size=1000,
+          compiled=False, id_field='id', separator='|'):
+    """
+    Score a stream of answer records and write results as they are produced
+
+    At most two chunks per worker are in flight at a time, so memory use does
+    not grow with the size of the input.
+
+    Returns:
+        int: Number of records scored
+    """
+    _init_worker(compiled)
+    count = 0
+
+    if output_format == 'csv':
+        output.write(_format_csv(OUTPUT_COLUMNS))
+
+    if workers <= 1:
+        for chunk in _chunks(records, chunk_size):
+            output.writelines(score_chunk(chunk, output_format, id_field, separator))
+            count += len(chunk)
+        return count
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(compiled,)) as pool:
+        pending = deque()
+
+        for chunk in _chunks(records, chunk_size):
+            pending.append((len(chunk), pool.submit(score_chunk, chunk, output_format,
+                                                    id_field, separator)))
+            if len(pending) >= workers * 2:
+                size, future = pending.popleft()
+                output.writelines(future.result())
+                count += size
+
+        while pending:
+            size, future = pending.popleft()
+            output.writelines(future.result())
+            count += size
+
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m backend.score',
+        description='Score answer records from NDJSON or CSV through the inference engine'
+    )
+    parser.add_argument('input', nargs='?', default='-',
+                        help='Input file, or - for stdin (default)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='Output file, or - for stdout (default)')
+    parser.add_argument('--format', choices=['ndjson', 'csv'],
+                        help='Input format (default: from file extension, else ndjson)')
+    parser.add_argument('--output-format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--separator', default='|',
+                        help='Separator for multi-value columns in CSV (default: |)')
+    parser.add_argument('--id-field', default='id',
+                        help='Record field copied into each result (default: id)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes (default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='Records per unit of work (default: 1000)')
+    parser.add_argument('--compiled', action='store_true',
+                        help='Build the decision table once before scoring, shared by all workers')
+    args = parser.parse_args(argv)
+
+    input_format = args.format
+    if input_format is None:
+        input_format = 'csv' if args.input.lower().endswith('.csv') else 'ndjson'
+
+    source = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+
+    try:
+        if input_format == 'csv':
+            records = read_csv(source, args.separator)
+        else:
+            records = read_ndjson(source)
+
+        count = score(records, output, args.output_format, args.workers,
+                      max(1, args.chunk_size), args.compiled, args.id_field, args.separator)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(f'Scored {count} records', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
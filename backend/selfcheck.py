@@ -0,0 +1,361 @@
+"""
+Self-checks for Skin Disease Expert System
+Run with: python -m backend.selfcheck
+"""
+
+import random
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from backend import columnar
+from backend.decision_table import DecisionTable
+from backend.inference_engine import InferenceEngine
+from backend.knowledge_base import (
+    DISEASE_RULES, TREATMENT_RULES, LIFESTYLE_RULES, DIET_RULES, OUTPUT_VARIABLES
+)
+from backend.rule_compiler import (
+    compile_disease_rule, compile_rule, evaluate_disease_conditions, evaluate_conditions
+)
+from backend.rule_order import profile_answers, verify_order
+
+
+def check_decision_table():
+    """
+    Prove that the compiled decision table agrees with the interpreted
+    engine on every answer set in the input space
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    engine = InferenceEngine()
+    table = DecisionTable(engine._evaluate)
+    errors = []
+
+    for code in table.codec.iter_codes():
+        answers = table.codec.unpack(code)
+        if table.codec.pack(answers) != code:
+            errors.append(f'Answer code {code} does not round-trip through the codec')
+        if table.codec.decode(table.codec.encode(answers)) != answers:
+            errors.append(f'Answers {answers} do not round-trip through a record')
+
+    for answers in table.verify(InferenceEngine()._evaluate):
+        errors.append(f'Decision table disagrees with the engine for {answers}')
+
+    return errors
+
+
+def check_compiled_predicates(samples=20000, seed=11, stride=1):
+    """
+    Prove that every compiled rule predicate agrees with the reference
+    evaluation of its conditions, on the whole input space and on random
+    incomplete or out-of-domain answer sets
+
+    Args:
+        stride (int): Check every stride-th complete answer set only, for
+            a quicker run
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    codec = InferenceEngine().codec
+    diseases = OUTPUT_VARIABLES['disease']['possible_values']
+
+    inputs = [codec.unpack(code) for code in islice(codec.iter_codes(), 0, None, stride)]
+    inputs.extend(_odd_answers(codec, samples, seed))
+
+    errors = []
+    for rule in DISEASE_RULES:
+        test = compile_disease_rule(rule, codec)
+        for facts in inputs:
+            if test(codec.encode(facts)) != evaluate_disease_conditions(rule['conditions'], facts):
+                errors.append(f"{rule['id']} disagrees with its conditions for {facts}")
+
+    # Layers 2-4 always see the disease inferred by layer 1
+    for rule in TREATMENT_RULES + LIFESTYLE_RULES + DIET_RULES:
+        test = compile_rule(rule, codec)
+        for index, facts in enumerate(inputs):
+            disease = diseases[index % len(diseases)]
+            record = codec.encode(facts) | codec.bit('disease', disease)
+            facts = dict(facts, disease=disease)
+            if test(record) != evaluate_conditions(rule['conditions'], facts):
+                errors.append(f"{rule['id']} disagrees with its conditions for {facts}")
+
+    return errors
+
+
+def _odd_answers(codec, samples, seed):
+    """
+    Random answer sets with missing fields, unknown values and malformed
+    appearance selections
+    """
+    rng = random.Random(seed)
+    answers = []
+
+    for _ in range(samples):
+        facts = {}
+        for field in codec.fields:
+            values = field['values'] + ['Unknown', None]
+            if field['multiple']:
+                choice = rng.random()
+                if choice < 0.7:
+                    facts[field['id']] = rng.sample(values, rng.randint(0, 4))
+                elif choice < 0.85:
+                    facts[field['id']] = rng.choice(values)
+            elif rng.random() < 0.8:
+                facts[field['id']] = rng.choice(values)
+        answers.append(facts)
+
+    return answers
+
+
+def check_concurrent_diagnose(workers=16, requests=20000, seed=7):
+    """
+    Hammer one shared engine from a thread pool and check that every
+    result's explanation, and the per-thread get_explanation(), matches
+    the explanation computed serially for the same input
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    engine = InferenceEngine()
+    codes = list(engine.codec.iter_codes())
+
+    rng = random.Random(seed)
+    inputs = [engine.codec.unpack(rng.choice(codes)) for _ in range(requests)]
+    expected = [_rule_ids(InferenceEngine().diagnose(answers)['explanation']) for answers in inputs]
+
+    def run(index):
+        result = engine.diagnose(inputs[index])
+        explanation = engine.get_explanation()
+        return index, _rule_ids(result['explanation']), _rule_ids(explanation)
+
+    errors = []
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for index, from_result, from_shim in pool.map(run, range(requests)):
+                if from_result != expected[index]:
+                    errors.append(f'Explanation {from_result} does not match input {inputs[index]}')
+                if from_shim != expected[index]:
+                    errors.append(f'get_explanation() {from_shim} does not match input {inputs[index]}')
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    return errors
+
+
+def check_incremental_matcher(sessions=3000, seed=5):
+    """
+    Feed answers one at a time, in random order and with changed and
+    retracted answers, and check that the incremental state always equals
+    the state rebuilt from scratch, and that a session reported complete
+    already has its final diagnosis
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    engine = InferenceEngine()
+    matcher = engine._snapshot.matcher
+    codes = list(engine.codec.iter_codes())
+    rng = random.Random(seed)
+    errors = []
+
+    for _ in range(sessions):
+        answers = engine.codec.unpack(rng.choice(codes))
+        other = engine.codec.unpack(rng.choice(codes))
+        steps = [(fact, answers[fact]) for fact in answers]
+        steps += [(fact, other[fact]) for fact in rng.sample(list(other), 3)]
+        steps += [(fact, None) for fact in rng.sample(list(answers), 2)]
+        rng.shuffle(steps)
+
+        state = None
+        for fact, value in steps + list(answers.items()):
+            state, progress = engine.match(state, {fact: value})
+            if state != matcher.assert_facts(matcher.start(), state['answers']):
+                errors.append(f"Incremental state differs from a fresh match for {state['answers']}")
+            if progress['complete']:
+                # No answer still to come may change a complete diagnosis
+                given = engine.diagnose(state['answers'])
+                if given['disease'] != progress['disease'] \
+                        or given != engine.diagnose(dict(answers, **state['answers'])):
+                    errors.append(f"Session reported complete too early for {state['answers']}")
+
+        if not progress['complete']:
+            errors.append(f'Session with every answer given is not complete: {answers}')
+
+    return errors
+
+
+def check_question_tree(sessions=500, seed=9):
+    """
+    Follow the adaptive questionnaire with random complete answer sets and
+    check that it stops on the diagnosis of the full answer set
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    engine = InferenceEngine(compiled=True)
+    codes = list(engine.codec.iter_codes())
+    rng = random.Random(seed)
+    errors = []
+
+    for _ in range(sessions):
+        answers = engine.codec.unpack(rng.choice(codes))
+        given = {}
+        step = engine.next_question(given)
+        while not step['complete']:
+            question = step['question']['id']
+            if question in given:
+                errors.append(f'Question {question} asked twice for {answers}')
+                break
+            given[question] = answers[question]
+            step = engine.next_question(given)
+
+        if step['complete'] and step['result'] != engine.diagnose(answers):
+            errors.append(f'Questionnaire stopped on the wrong diagnosis for {answers}')
+
+    return errors
+
+
+def check_metrics(samples=5000, seed=13):
+    """
+    Check that an engine recording metrics returns the same results as a
+    plain one, and that its counters agree with those results
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    plain = InferenceEngine()
+    measured = InferenceEngine(metrics=True)
+    codes = list(plain.codec.iter_codes())
+    rng = random.Random(seed)
+    errors = []
+    fires = Counter()
+    no_diagnosis = 0
+
+    for _ in range(samples):
+        answers = plain.codec.unpack(rng.choice(codes))
+        expected = plain.diagnose(answers)
+        if measured.diagnose(answers) != expected:
+            errors.append(f'Result with metrics differs for {answers}')
+        no_diagnosis += expected['disease'] is None
+        fires.update((step['layer'], step['rule_id']) for step in expected['explanation'])
+
+    metrics = measured.metrics
+    if metrics.diagnoses != samples or metrics.no_diagnosis != no_diagnosis:
+        errors.append(f'Counted {metrics.diagnoses} diagnoses, {metrics.no_diagnosis} without a disease; '
+                      f'expected {samples} and {no_diagnosis}')
+    if metrics.fires != fires:
+        errors.append('Rule fire counters differ from the fired rules')
+    if metrics.layer_seconds[1].count != samples:
+        errors.append('Layer 1 was not timed once per diagnosis')
+    for key, count in metrics.fires.items():
+        if metrics.evaluations[key] < count:
+            errors.append(f'Rule {key[1]} fired more often than it was evaluated')
+
+    return errors
+
+
+def check_rule_order():
+    """
+    Verify profile-guided disease rule orders for the recorded fire counts
+    of uniform answers and for a profile favouring the last rules most
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    engine = InferenceEngine()
+    kb = engine.knowledge_base
+    uniform = profile_answers(engine, (engine.codec.unpack(code) for code in engine.codec.iter_codes()))
+    reversed_profile = {rule['id']: position for position, rule in enumerate(kb.disease_rules)}
+
+    errors = []
+    for name, profile in (('uniform', uniform), ('reversed', reversed_profile)):
+        errors += [f'{name} profile: {error}' for error in verify_order(kb, profile)]
+    return errors
+
+
+def check_columnar(samples=20000, seed=17):
+    """
+    Check that columnar evaluation gives every row the disease, fired rule
+    and recommendations of diagnose(), over every complete answer set and a
+    sample of incomplete ones. Skipped (None) without NumPy.
+
+    Returns:
+        list: Error messages, empty when the check passes
+    """
+    if columnar.np is None:
+        return None
+
+    engine = InferenceEngine()
+    codec = engine.codec
+    codes = list(codec.iter_codes())
+    rng = random.Random(seed)
+    answer_sets = [codec.unpack(code) for code in codes]
+    for _ in range(samples):
+        answers = codec.unpack(rng.choice(codes))
+        for fact in rng.sample(list(answers), rng.randint(1, len(answers))):
+            del answers[fact]
+        answer_sets.append(answers)
+
+    batch = engine.diagnose_columns(columnar.answers_to_columns(answer_sets, engine.knowledge_base.input_variables))
+    errors = []
+
+    for row, answers in enumerate(answer_sets):
+        expected = engine.diagnose(answers)
+        position = batch['disease'][row]
+        rule = batch['rule'][row]
+        disease = batch['diseases'][position] if position >= 0 else None
+        fired = batch['rules'][rule] if rule >= 0 else None
+        got = {
+            output: {value for value, member in zip(batch[output]['values'], batch[output]['members'][row]) if member}
+            for output in ('treatment', 'lifestyle', 'diet')
+        }
+        if disease != expected['disease'] \
+                or fired != (expected['explanation'][0]['rule_id'] if expected['disease'] else None) \
+                or any(got[output] != set(expected[output]) for output in got):
+            errors.append(f'Columnar result differs for {answers}')
+
+    return errors
+
+
+def _rule_ids(explanation):
+    return [rule['rule_id'] for rule in explanation]
+
+
+CHECKS = [
+    ('decision table consistency', check_decision_table),
+    ('compiled predicates', check_compiled_predicates),
+    ('concurrent diagnose', check_concurrent_diagnose),
+    ('incremental matcher', check_incremental_matcher),
+    ('question tree', check_question_tree),
+    ('metrics', check_metrics),
+    ('rule order', check_rule_order),
+    ('columnar evaluation', check_columnar),
+]
+
+
+def main():
+    failed = False
+
+    for name, check in CHECKS:
+        errors = check()
+        if errors is None:
+            print(f'{name}: skipped')
+            continue
+        status = 'FAIL' if errors else 'ok'
+        print(f'{name}: {status}')
+        for error in errors[:20]:
+            print(f'  {error}')
+        if len(errors) > 20:
+            print(f'  ... {len(errors) - 20} more')
+        failed = failed or bool(errors)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
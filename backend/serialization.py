@@ -0,0 +1,67 @@
+"""
+JSON Serialization for Skin Disease Expert System
+Encodes with orjson when it is installed and falls back to the standard library
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps_bytes(obj, sort_keys=False, indent=False, default=None):
+    """
+    Serialize to compact UTF-8 JSON bytes
+
+    Args:
+        obj: JSON-serializable data
+        sort_keys (bool): Sort object keys
+        indent (bool): Pretty-print with an indent of 2
+        default (callable): Converts objects JSON does not support
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+
+    return dumps(obj, sort_keys, indent, default).encode('utf-8')
+
+
+def dumps(obj, sort_keys=False, indent=False, default=None):
+    """
+    Serialize to a compact JSON string, see dumps_bytes()
+    """
+    if orjson is not None:
+        return dumps_bytes(obj, sort_keys, indent, default).decode('utf-8')
+
+    if indent:
+        return json.dumps(obj, sort_keys=sort_keys, indent=2, default=default, ensure_ascii=False)
+    return json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'), default=default,
+                      ensure_ascii=False)
+
+
+def loads(data):
+    """
+    Parse JSON from a string or bytes
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compact_result(result):
+    """
+    Copy of a diagnosis result whose explanation lists rule ids only
+
+    The rule names, logic and conclusions can be looked up by id in the
+    documentation payload.
+    """
+    return {
+        **result,
+        'explanation': [rule['rule_id'] for rule in result['explanation']]
+    }
@@ -0,0 +1,81 @@
+"""
+Answer Validation for Skin Disease Expert System
+Checks answer payloads against the input variables before any inference runs
+"""
+
+
+class AnswerValidator:
+    """
+    Validator compiled once from the input variable definitions
+
+    An answer set is a JSON object keyed by variable id. A 'Selection' takes
+    one of its values, a 'Multiple Selection' a list of distinct values of at
+    most the number of options. null marks a question as unanswered.
+    """
+
+    def __init__(self, input_variables):
+        """
+        Args:
+            input_variables (dict): Variable definitions, grouped by category
+        """
+        self.fields = {}
+
+        for variables in input_variables.values():
+            for variable in variables:
+                values = list(variable['values'])
+                self.fields[variable['id']] = (
+                    variable['type'] == 'Multiple Selection',
+                    frozenset(values),
+                    values
+                )
+
+    def validate(self, answers):
+        """
+        Validate one answer set
+
+        Returns:
+            list: Structured errors ({'field', 'code', 'message'}), empty
+                when the answers are valid
+        """
+        if not isinstance(answers, dict):
+            return [_error(None, 'invalid_type', 'Answers must be a JSON object.')]
+
+        errors = []
+
+        for key, value in answers.items():
+            field = self.fields.get(key)
+            if field is None:
+                errors.append(_error(key, 'unknown_field', f"'{key}' is not a question."))
+                continue
+            if value is None:
+                continue
+
+            multiple, allowed, options = field
+            if multiple:
+                errors.extend(_check_selection(key, value, allowed, options))
+            elif not isinstance(value, str) or value not in allowed:
+                errors.append(_error(key, 'invalid_value', f"'{key}' must be one of: {', '.join(options)}."))
+
+        return errors
+
+
+def _check_selection(key, value, allowed, options):
+    if not isinstance(value, list):
+        return [_error(key, 'invalid_type', f"'{key}' must be a list of options.")]
+    if len(value) > len(options):
+        return [_error(key, 'too_many_values', f"'{key}' accepts at most {len(options)} options.")]
+
+    for item in value:
+        if not isinstance(item, str) or item not in allowed:
+            return [_error(key, 'invalid_value', f"'{key}' options must be among: {', '.join(options)}.")]
+    if len(set(value)) != len(value):
+        return [_error(key, 'duplicate_value', f"'{key}' lists the same option more than once.")]
+    return []
+
+
+def _error(field, code, message):
+    return {
+        'field': field,
+        'code': code,
+        'message': message
+    }
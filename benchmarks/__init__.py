@@ -0,0 +1,4 @@
+"""
+Benchmarks for Skin Disease Expert System
+Run with: python -m benchmarks
+"""
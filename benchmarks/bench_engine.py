@@ -0,0 +1,127 @@
+"""
+Inference engine benchmarks: diagnose() in each engine mode, the cost of
+each rule layer, and synthetic rule bases of growing size
+"""
+
+import random
+import time
+
+from backend import columnar
+from backend.inference_engine import InferenceEngine
+from benchmarks.synthetic import synthetic_knowledge_base
+
+
+def sample_answers(codec, count, seed=1, partial_share=0.1):
+    """
+    Answer sets drawn uniformly from the input space, so that more than a
+    quarter of them fall through to no diagnosis, plus a share of
+    incomplete ones with one to three questions unanswered
+    """
+    rng = random.Random(seed)
+    codes = list(codec.iter_codes())
+    answers = []
+
+    for _ in range(count):
+        facts = codec.unpack(rng.choice(codes))
+        if rng.random() < partial_share:
+            for field in rng.sample(list(facts), rng.randint(1, 3)):
+                del facts[field]
+        answers.append(facts)
+
+    return answers
+
+
+def time_per_item(function, items, repeat=5):
+    """
+    Best-of-repeat time of function(item) over all items, in ns per item
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(items)
+
+
+def _entry(ns_per_op, **extra):
+    return {'ns_per_op': round(ns_per_op, 1), 'ops_per_sec': round(1e9 / ns_per_op), **extra}
+
+
+def diagnose_benchmarks(count, repeat):
+    """Time diagnose() with the interpreted, cached and compiled engines"""
+    engines = {
+        'diagnose.interpreted': InferenceEngine(),
+        'diagnose.cached': InferenceEngine(cache_size=4096),
+        'diagnose.compiled': InferenceEngine(compiled=True)
+    }
+    # Build the decision table before timing, as a server does at startup
+    engines['diagnose.compiled'].warm_up()
+    answers = sample_answers(engines['diagnose.interpreted'].codec, count)
+    no_diagnosis = sum(1 for facts in answers
+                       if engines['diagnose.interpreted'].diagnose(facts)['disease'] is None)
+
+    results = {}
+    for name, engine in engines.items():
+        results[name] = _entry(time_per_item(engine.diagnose, answers, repeat),
+                               no_diagnosis_share=round(no_diagnosis / len(answers), 3))
+    return results
+
+
+def columnar_benchmark(count, repeat):
+    """
+    Time diagnose_columns() per row over a batch of count rows, when NumPy
+    is installed
+    """
+    if columnar.np is None:
+        return {}
+
+    engine = InferenceEngine()
+    columns = columnar.answers_to_columns(sample_answers(engine.codec, count), engine.knowledge_base.input_variables)
+    return {'diagnose.columnar': _entry(time_per_item(engine.diagnose_columns, [columns], repeat) / count)}
+
+
+def layer_benchmarks(count, repeat):
+    """Time each of the four rule layers separately, over encoded records"""
+    engine = InferenceEngine()
+    snapshot = engine._snapshot
+    codec = snapshot.codec
+    records = [codec.encode(facts) for facts in sample_answers(codec, count)]
+
+    # Layers 2-4 only run once a disease is known
+    with_disease = []
+    for record in records:
+        disease = engine._infer_disease(snapshot, record, [])
+        if disease:
+            with_disease.append(record | codec.bit('disease', disease))
+
+    layers = [
+        ('layer.1_disease', engine._infer_disease, records),
+        ('layer.2_treatment', engine._infer_treatment, with_disease),
+        ('layer.3_lifestyle', engine._infer_lifestyle, with_disease),
+        ('layer.4_diet', engine._infer_diet, with_disease)
+    ]
+    return {
+        name: _entry(time_per_item(lambda record: infer(snapshot, record, []), items, repeat))
+        for name, infer, items in layers
+    }
+
+
+def synthetic_benchmarks(sizes, count, repeat):
+    """Time the interpreted engine on synthetic rule bases of each size"""
+    results = {}
+
+    for size in sizes:
+        engine = InferenceEngine()
+        start = time.perf_counter()
+        engine.reload(synthetic_knowledge_base(size))
+        compile_seconds = time.perf_counter() - start
+
+        answers = sample_answers(engine.codec, count)
+        results[f'synthetic.{size}_rules'] = _entry(
+            time_per_item(engine.diagnose, answers, repeat),
+            compile_ms=round(compile_seconds * 1000, 1)
+        )
+
+    return results
@@ -0,0 +1,48 @@
+"""
+HTTP benchmarks: /api/diagnose end to end through Flask's test client
+"""
+
+import time
+
+from benchmarks.bench_engine import sample_answers
+
+
+def percentile(sorted_values, share):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, round(share * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def diagnose_endpoint_benchmark(count):
+    """
+    POST every answer set to /api/diagnose once and report latency
+    percentiles and throughput
+    """
+    from app import app, engine
+
+    client = app.test_client()
+    answers = sample_answers(engine.codec, count)
+
+    # Warm up the session cookie, the result store and the JSON provider
+    for facts in answers[:50]:
+        client.post('/api/diagnose', json={'answers': facts})
+
+    latencies = []
+    start = time.perf_counter_ns()
+    for facts in answers:
+        request_start = time.perf_counter_ns()
+        response = client.post('/api/diagnose', json={'answers': facts})
+        latencies.append(time.perf_counter_ns() - request_start)
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/diagnose answered {response.status_code}')
+    elapsed = time.perf_counter_ns() - start
+
+    latencies.sort()
+    return {
+        'http.diagnose': {
+            'p50_us': round(percentile(latencies, 0.50) / 1000, 1),
+            'p90_us': round(percentile(latencies, 0.90) / 1000, 1),
+            'p99_us': round(percentile(latencies, 0.99) / 1000, 1),
+            'requests_per_sec': round(count * 1e9 / elapsed)
+        }
+    }
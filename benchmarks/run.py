@@ -0,0 +1,135 @@
+"""
+Benchmark runner
+
+Usage:
+    python -m benchmarks [--quick] [--only engine|layers|synthetic|http]
+                         [--output results.json]
+                         [--baseline baseline.json] [--threshold 0.2]
+                         [--save-baseline baseline.json]
+
+Results are written as JSON. With --baseline, every timing that got slower
+than the baseline by more than the threshold is reported and the exit
+status is 1, so the run can gate a change.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from benchmarks import bench_engine, bench_http
+
+# ============================================
+# SUITES
+# ============================================
+
+# (answer sets, repeats, synthetic sizes, HTTP requests)
+FULL = (5000, 5, (1000, 10000), 2000)
+QUICK = (1000, 3, (1000,), 300)
+
+SUITES = ('engine', 'layers', 'synthetic', 'http')
+
+# Timings compared against a baseline; lower is better for all of them
+TIMINGS = ('ns_per_op', 'p50_us', 'p90_us', 'p99_us')
+
+
+def run(suites, quick=False):
+    """
+    Run the selected suites
+
+    Returns:
+        dict: Benchmark name -> measurements
+    """
+    count, repeat, sizes, requests = QUICK if quick else FULL
+    results = {}
+
+    if 'engine' in suites:
+        results.update(bench_engine.diagnose_benchmarks(count, repeat))
+        results.update(bench_engine.columnar_benchmark(count * 20, repeat))
+    if 'layers' in suites:
+        results.update(bench_engine.layer_benchmarks(count, repeat))
+    if 'synthetic' in suites:
+        results.update(bench_engine.synthetic_benchmarks(sizes, max(100, count // 10), repeat))
+    if 'http' in suites:
+        results.update(bench_http.diagnose_endpoint_benchmark(requests))
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline
+
+    Returns:
+        list: (benchmark, timing, baseline value, new value) for every
+            timing more than threshold slower than the baseline
+    """
+    regressions = []
+
+    for name, measurements in results.items():
+        reference = baseline.get(name, {})
+        for timing in TIMINGS:
+            if timing in measurements and reference.get(timing):
+                if measurements[timing] > reference[timing] * (1 + threshold):
+                    regressions.append((name, timing, reference[timing], measurements[timing]))
+
+    return regressions
+
+
+def _print_results(results, baseline):
+    for name, measurements in results.items():
+        reference = baseline.get(name, {}) if baseline else {}
+        fields = []
+        for key, value in measurements.items():
+            text = f'{key}={value}'
+            if key in TIMINGS and reference.get(key):
+                text += f' ({(value / reference[key] - 1) * 100:+.1f}%)'
+            fields.append(text)
+        print(f'{name:28} ' + '  '.join(fields))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the benchmarks')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs, for a fast check')
+    parser.add_argument('--only', action='append', choices=SUITES, help='run only this suite (repeatable)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against the baseline (default: 0.2, i.e. 20%%)')
+    parser.add_argument('--save-baseline', help='also write the results as a new baseline file')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    start = time.perf_counter()
+    results = run(args.only or SUITES, quick=args.quick)
+    document = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'quick': args.quick,
+            'seconds': round(time.perf_counter() - start, 1)
+        },
+        'results': results
+    }
+
+    _print_results(results, baseline)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2)
+                f.write('\n')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, timing, before, after in regressions:
+            print(f'REGRESSION {name} {timing}: {before} -> {after}', file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
@@ -0,0 +1,87 @@
+"""
+Synthetic knowledge bases for scaling benchmarks
+Random rules over the real input variables, in the same shape as the built-in rules
+"""
+
+import random
+
+from backend.knowledge_loader import KnowledgeBase, default_knowledge_base
+
+
+def synthetic_knowledge_base(rule_count, seed=0, disease_count=50):
+    """
+    Build a knowledge base with about rule_count rules, a quarter per layer
+
+    Layer 1 rules test two to four input variables; layer 2-4 rules test
+    the disease (or a disease_not) and possibly one profile variable, like
+    the built-in rules.
+    """
+    rng = random.Random(seed)
+    data = default_knowledge_base().to_dict()
+    variables = [variable for group in data['input_variables'].values() for variable in group]
+    diseases = [f'Disease {i}' for i in range(1, disease_count + 1)]
+    per_layer = max(1, rule_count // 4)
+
+    data['disease_rules'] = [
+        {
+            'id': f'syn_1_{i}',
+            'name': f'Synthetic disease rule {i}',
+            'layer': 1,
+            'logic': 'synthetic',
+            'conditions': _disease_conditions(rng, variables),
+            'conclusion': rng.choice(diseases)
+        }
+        for i in range(per_layer)
+    ]
+
+    profile = [variable for variable in variables if variable['type'] == 'Selection']
+    for layer, section, multiple in ((2, 'treatment_rules', False),
+                                     (3, 'lifestyle_rules', True),
+                                     (4, 'diet_rules', True)):
+        rules = []
+        for i in range(per_layer):
+            conditions = {}
+            if rng.random() < 0.1:
+                conditions['disease_not'] = rng.choice(diseases)
+            else:
+                conditions['disease'] = rng.choice(diseases)
+            if rng.random() < 0.5:
+                variable = rng.choice(profile)
+                conditions[variable['id']] = rng.choice(variable['values'])
+
+            conclusion = f'Recommendation {layer}.{rng.randrange(per_layer)}'
+            if multiple and rng.random() < 0.5:
+                conclusion = [conclusion, f'Recommendation {layer}.{rng.randrange(per_layer)}']
+
+            rules.append({
+                'id': f'syn_{layer}_{i}',
+                'name': f'Synthetic layer {layer} rule {i}',
+                'layer': layer,
+                'logic': 'synthetic',
+                'conditions': conditions,
+                'conclusion': conclusion
+            })
+        data[section] = rules
+
+    data['output_variables']['disease']['possible_values'] = diseases
+    data['disease_info'] = {
+        disease: {'description': f'Synthetic {disease}', 'contagious': False} for disease in diseases
+    }
+    data['recommendation_details'] = {}
+
+    return KnowledgeBase(data, source=f'synthetic:{rule_count}')
+
+
+def _disease_conditions(rng, variables):
+    conditions = {}
+
+    for variable in rng.sample(variables, rng.randint(2, 4)):
+        values = variable['values']
+        if variable['type'] == 'Multiple Selection':
+            conditions[variable['id']] = rng.sample(values, rng.randint(1, 3))
+        elif rng.random() < 0.3 and len(values) > 2:
+            conditions[variable['id']] = rng.sample(values, 2)
+        else:
+            conditions[variable['id']] = rng.choice(values)
+
+    return conditions
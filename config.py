@@ -0,0 +1,71 @@
+"""
+Configuration for Skin Disease Expert System
+Every setting can be overridden through an environment variable
+"""
+
+import os
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    return default if value is None else int(value)
+
+
+def _env_flag(name, default):
+    """Read a boolean flag such as '1', 'true' or 'no' from the environment"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    """Default application configuration"""
+
+    # Key signing the session cookie. Must be set, and the same for every
+    # worker, in production; unset gives a random key per server start.
+    SECRET_KEY = os.environ.get('SKIN_ES_SECRET_KEY') or None
+
+    # Address and number of worker processes of the production server (gunicorn.conf.py)
+    BIND = os.environ.get('SKIN_ES_BIND', '0.0.0.0:5000')
+    WORKERS = _env_int('SKIN_ES_WORKERS', os.cpu_count() or 1)
+
+    # Knowledge base file or directory (JSON/YAML), unset for the built-in one
+    KNOWLEDGE_BASE = os.environ.get('SKIN_ES_KNOWLEDGE_BASE') or None
+
+    # Seconds between checks of the knowledge base files for changes (0 disables hot reload)
+    KNOWLEDGE_BASE_POLL_INTERVAL = float(os.environ.get('SKIN_ES_KNOWLEDGE_BASE_POLL_INTERVAL', 2))
+
+    # Answer complete questionnaires from a precomputed decision table
+    COMPILED_ENGINE = _env_flag('SKIN_ES_COMPILED_ENGINE', True)
+
+    # Number of diagnosis results kept in the LRU cache (0 disables it)
+    RESULT_CACHE_SIZE = _env_int('SKIN_ES_RESULT_CACHE_SIZE', 0)
+
+    # JSON file of disease rule fire counts (python -m backend.knowledge_tool profile);
+    # the most frequent disease rules are then tested first
+    RULE_PROFILE = os.environ.get('SKIN_ES_RULE_PROFILE') or None
+
+    # Log the static analysis findings (dead values, shadowed and unreachable
+    # rules) of every knowledge base version when it is loaded
+    ANALYZE_KNOWLEDGE_BASE = _env_flag('SKIN_ES_ANALYZE_KNOWLEDGE_BASE', True)
+
+    # Record layer latencies and rule counters, served at /metrics
+    METRICS = _env_flag('SKIN_ES_METRICS', False)
+
+    # Seconds browsers and CDNs may cache the HTML pages before revalidating
+    # them, 0 to revalidate on every use. The API payloads are always
+    # revalidated, since a knowledge base reload can change them at any time.
+    PAGE_MAX_AGE = _env_int('SKIN_ES_PAGE_MAX_AGE', 0)
+
+    # Where diagnosis results are kept: 'memory' (per process),
+    # 'sqlite:path/to/results.db' or 'file:path/to/directory'. Under
+    # gunicorn with several workers, unset means instance/results.db.
+    RESULT_STORE = os.environ.get('SKIN_ES_RESULT_STORE', 'memory')
+
+    # Seconds a stored diagnosis result stays available to the report page
+    RESULT_TTL = _env_int('SKIN_ES_RESULT_TTL', 3600)
+
+    # Largest accepted request body in bytes, larger requests get 413
+    MAX_CONTENT_LENGTH = _env_int('SKIN_ES_MAX_CONTENT_LENGTH', 1024 * 1024)
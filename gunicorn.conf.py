@@ -0,0 +1,50 @@
+"""
+Gunicorn configuration for Skin Disease Expert System
+Run with: gunicorn -c gunicorn.conf.py
+
+The app is loaded once in the master process: the knowledge base, compiled
+rules, decision table and cached payloads are built before the workers are
+forked and shared by them copy-on-write.
+
+Every worker must see every stored result, so with more than one worker the
+result store defaults to an SQLite file in instance/, and an explicit
+'memory' store is refused.
+"""
+
+import gc
+import os
+
+from config import Config
+
+wsgi_app = 'app:app'
+bind = Config.BIND
+workers = Config.WORKERS
+
+if workers > 1:
+    if 'SKIN_ES_RESULT_STORE' not in os.environ:
+        Config.RESULT_STORE = 'sqlite:' + os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       'instance', 'results.db')
+    elif Config.RESULT_STORE == 'memory':
+        raise RuntimeError(
+            f"SKIN_ES_RESULT_STORE=memory keeps results per process and cannot serve {workers} "
+            'workers: use a sqlite: or file: store, or SKIN_ES_WORKERS=1'
+        )
+
+# Build everything in the master, before forking
+preload_app = True
+
+
+def when_ready(server):
+    """Finish the shared precomputation, then freeze it for the workers"""
+    from app import app, warm_up
+
+    warm_up()
+
+    if not Config.SECRET_KEY:
+        server.log.warning('SKIN_ES_SECRET_KEY is not set: sessions will not survive a restart')
+    server.log.info('Result store: %s', app.config['RESULT_STORE'])
+
+    # Move everything built so far out of the collector's reach, so that
+    # collections in the workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,24 @@
+"""
+Shared test setup: run from the repository root with python -m pytest
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SKIN_ES_SECRET_KEY', 'test-secret-key')
+
+# Complete answer set diagnosed as Eczema
+ECZEMA = {
+    'age_group': 'Adult', 'allergy': 'None', 'itching': 'Yes', 'burning_sensation': 'No',
+    'pain': 'No', 'appearance': ['Scaly / Flaky'], 'lesion_size': 'Larger than 5mm'
+}
+
+
+@pytest.fixture
+def client():
+    """Test client of the Flask app, with a fresh cookie jar"""
+    from app import app
+    return app.test_client()
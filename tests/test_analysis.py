@@ -0,0 +1,109 @@
+"""
+Tests for the static analysis of knowledge bases
+"""
+
+from backend.analysis import analyze
+from backend.knowledge_loader import KnowledgeBase, default_knowledge_base
+
+
+def modified(change):
+    """Built-in knowledge base after change(data)"""
+    data = default_knowledge_base().to_dict()
+    change(data)
+    return KnowledgeBase(data)
+
+
+def disease_rule(rule_id, conditions, conclusion='Eczema'):
+    return {
+        'id': rule_id, 'name': rule_id, 'layer': 1, 'conditions': conditions,
+        'logic': 'IF ...', 'conclusion': conclusion, 'contagious': False
+    }
+
+
+def findings_of(kb, kind):
+    return [finding for finding in analyze(kb)['findings'] if finding['kind'] == kind]
+
+
+def test_shipped_knowledge_base_has_no_errors():
+    report = analyze(default_knowledge_base())
+
+    assert report['answer_sets'] > 0
+    assert [finding for finding in report['findings'] if finding['severity'] == 'error'] == []
+
+
+def test_findings_are_sorted_by_severity():
+    kb = modified(lambda data: data['disease_rules'].append(disease_rule('rule_x', {'itching': 'Sometimes'})))
+    severities = [finding['severity'] for finding in analyze(kb)['findings']]
+
+    assert severities == sorted(severities, key=('error', 'warning', 'info').index)
+
+
+def test_unknown_fact():
+    kb = modified(lambda data: data['disease_rules'].append(disease_rule('rule_x', {'fever': 'Yes'})))
+    findings = findings_of(kb, 'unknown_fact')
+
+    assert [(finding['rule'], finding['severity']) for finding in findings] == [('rule_x', 'error')]
+    assert 'fever' in findings[0]['message']
+    # The rule is left out of the rest of the analysis
+    assert [finding for finding in analyze(kb)['findings'] if finding['rule'] == 'rule_x'] == findings
+
+
+def test_disease_not_is_not_an_unknown_fact():
+    def change(data):
+        data['treatment_rules'].append({
+            'id': 'rule_tx', 'name': 'rule_tx', 'layer': 2, 'conditions': {'disease_not': 'Eczema'},
+            'logic': 'IF NOT Eczema', 'conclusion': data['treatment_rules'][0]['conclusion']
+        })
+
+    assert findings_of(modified(change), 'unknown_fact') == []
+
+
+def test_never_matching_rule_and_dead_value():
+    kb = modified(lambda data: data['disease_rules'].append(disease_rule('rule_x', {'itching': 'Sometimes'})))
+
+    assert [(finding['rule'], finding['severity']) for finding in findings_of(kb, 'never_matches')] == \
+        [('rule_x', 'error')]
+    assert ('rule_x', 'warning') in [(finding['rule'], finding['severity']) for finding in findings_of(kb, 'dead_value')]
+
+
+def test_shadowed_rule():
+    def change(data):
+        data['disease_rules'].append(disease_rule('rule_x', dict(data['disease_rules'][2]['conditions'])))
+
+    findings = findings_of(modified(change), 'shadowed')
+
+    assert [(finding['rule'], finding['severity']) for finding in findings] == [('rule_x', 'error')]
+    assert 'rule_2' in findings[0]['message']
+
+
+def test_overlapping_rule_is_partially_shadowed():
+    kb = modified(lambda data: data['disease_rules'].append(disease_rule('rule_x', {'itching': 'Yes'})))
+    findings = [finding for finding in findings_of(kb, 'partially_shadowed') if finding['rule'] == 'rule_x']
+
+    assert [finding['severity'] for finding in findings] == ['info']
+
+
+def test_unreachable_rule_and_value():
+    def change(data):
+        data['disease_rules'] = [rule for rule in data['disease_rules'] if rule['conclusion'] != 'Skin Ulcer']
+
+    kb = modified(change)
+    ulcer_rules = {rule['id'] for rule in kb.all_rules[len(kb.disease_rules):]
+                   if rule['conditions'].get('disease') == 'Skin Ulcer'}
+    unreachable = findings_of(kb, 'unreachable_rule')
+
+    assert ulcer_rules
+    assert ulcer_rules <= {finding['rule'] for finding in unreachable}
+    assert {finding['severity'] for finding in unreachable} == {'error'}
+    assert any("'Skin Ulcer'" in finding['message'] and finding['severity'] == 'warning'
+               for finding in findings_of(kb, 'unreachable_value'))
+
+
+def test_undeclared_value():
+    def change(data):
+        rule = dict(data['treatment_rules'][0], id='rule_tx', conclusion='Homeopathy')
+        data['treatment_rules'].append(rule)
+
+    findings = findings_of(modified(change), 'undeclared_value')
+
+    assert [(finding['rule'], finding['severity']) for finding in findings] == [('rule_tx', 'warning')]
@@ -0,0 +1,289 @@
+"""
+Tests for the ASGI entry point: every route answers as under WSGI
+"""
+
+import asyncio
+import gzip
+from datetime import timedelta
+
+import pytest
+
+from app import app
+from asgi import application, runs_inline
+from conftest import ECZEMA
+
+JSON = 'application/json'
+
+# Headers compared between the two entry points, besides status and body
+COMPARED = ('content-type', 'cache-control', 'etag', 'content-encoding', 'vary')
+
+
+def asgi_request(method, path, body=b'', headers=None, query='', chunks=None, root_path=''):
+    """
+    Send one request through the ASGI application
+
+    Args:
+        chunks (list): Body chunks sent without a Content-Length header,
+            instead of body
+
+    Returns:
+        tuple: (status, list of (name, value) headers, body)
+    """
+    headers = dict(headers or {})
+    if chunks is None:
+        chunks = [body]
+        headers.setdefault('Content-Length', str(len(body)))
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'root_path': root_path,
+        'query_string': query.encode('latin-1'),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 12345)
+    }
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': position < len(chunks) - 1}
+                for position, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start, body = sent
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in start['headers']]
+    return start['status'], headers, body['body']
+
+
+def wsgi_request(method, path, body=b'', headers=None, query=''):
+    headers = dict(headers or {})
+    client = app.test_client()
+    # The test client sends the cookies of its own jar only
+    if 'Cookie' in headers:
+        name, value = headers.pop('Cookie').split('=', 1)
+        client.set_cookie(name, value)
+    response = client.open(path, method=method, data=body, headers=headers, query_string=query)
+    return response.status_code, [(name.lower(), value) for name, value in response.headers], response.data
+
+
+def _compared(headers):
+    return sorted((name, value) for name, value in headers if name in COMPARED)
+
+
+def _cookie(headers):
+    values = [value for name, value in headers if name == 'set-cookie']
+    return values[0] if values else None
+
+
+def _json(body):
+    return JSON, body if isinstance(body, bytes) else app.json.dumps(body).encode('utf-8')
+
+
+# (method, path, headers, body, query) of one request to each route
+REQUESTS = [
+    ('GET', '/', {}, b'', ''),
+    ('GET', '/diagnosis', {}, b'', ''),
+    ('GET', '/documentation', {'Accept-Encoding': 'gzip'}, b'', ''),
+    ('GET', '/report', {}, b'', ''),
+    ('GET', '/api/questions', {}, b'', ''),
+    ('GET', '/api/questions', {'Accept-Encoding': 'gzip, deflate'}, b'', ''),
+    ('GET', '/api/documentation', {}, b'', ''),
+    ('GET', '/api/recommendation-details', {}, b'', ''),
+    ('GET', '/api/get-result', {}, b'', ''),
+    ('GET', '/static/css/style.css', {}, b'', ''),
+    ('GET', '/metrics', {}, b'', ''),
+    ('GET', '/missing', {}, b'', ''),
+    ('POST', '/api/diagnose', {'Content-Type': JSON}, app.json.dumps({'answers': ECZEMA}).encode(), ''),
+    ('POST', '/api/diagnose', {'Content-Type': JSON}, app.json.dumps({'answers': ECZEMA}).encode(),
+     'details=true&explanation=ids'),
+    ('POST', '/api/diagnose', {'Content-Type': JSON}, b'{"answers": {"itching": "Maybe"}}', ''),
+    ('POST', '/api/diagnose', {'Content-Type': JSON}, b'{bad', ''),
+    ('POST', '/api/diagnose/batch', {'Content-Type': JSON}, app.json.dumps([ECZEMA, {'itching': 'Yes'}]).encode(), ''),
+    ('POST', '/api/diagnose/batch', {'Content-Type': 'application/x-ndjson'},
+     b'{"itching": "Yes"}\n' + app.json.dumps(ECZEMA).encode() + b'\n', ''),
+    ('POST', '/api/diagnose/batch', {'Content-Type': JSON}, b'[{"itching": "Maybe"}]', ''),
+    ('POST', '/api/next-question', {'Content-Type': JSON}, b'{"answers": {"itching": "Yes"}}', ''),
+    ('POST', '/api/next-question', {'Content-Type': JSON}, b'{"answers": ', ''),
+    ('POST', '/api/session/answer', {'Content-Type': JSON}, b'{"answers": {"itching": "Yes"}}', ''),
+    ('POST', '/api/reset', {}, b'', ''),
+    ('DELETE', '/api/diagnose', {}, b'', ''),
+]
+
+
+@pytest.mark.parametrize('method, path, headers, body, query', REQUESTS,
+                         ids=[f'{method} {path} {query}' for method, path, _, _, query in REQUESTS])
+def test_route_matches_wsgi(method, path, headers, body, query):
+    asgi_status, asgi_headers, asgi_body = asgi_request(method, path, body, headers, query)
+    wsgi_status, wsgi_headers, wsgi_body = wsgi_request(method, path, body, headers, query)
+
+    assert asgi_status == wsgi_status
+    assert _compared(asgi_headers) == _compared(wsgi_headers)
+    assert asgi_body == wsgi_body
+    assert (_cookie(asgi_headers) is None) == (_cookie(wsgi_headers) is None)
+
+
+def test_conditional_request_matches_wsgi():
+    _, headers, _ = wsgi_request('GET', '/api/questions')
+    etag = dict(headers)['etag']
+    status, headers, body = asgi_request('GET', '/api/questions', headers={'If-None-Match': etag})
+    assert status == 304
+    assert body == b''
+
+
+@pytest.mark.parametrize('path', ['/skin/api/questions', '/api/questions'])
+def test_root_path(path):
+    # Recent servers include the root path in the path, older ones do not
+    status, _, body = asgi_request('GET', path, root_path='/skin')
+    assert status == 200
+    assert body == wsgi_request('GET', '/api/questions')[2]
+
+
+def test_gzip_body():
+    _, headers, body = asgi_request('GET', '/api/questions', headers={'Accept-Encoding': 'gzip'})
+    assert dict(headers)['content-encoding'] == 'gzip'
+    assert app.json.loads(gzip.decompress(body))['success'] is True
+
+
+# ============================================
+# SESSIONS
+# ============================================
+
+def _session_cookie(headers):
+    return _cookie(headers).split(';', 1)[0]
+
+
+def test_session_cookie_attributes_match_wsgi():
+    body = app.json.dumps({'answers': ECZEMA}).encode()
+    _, asgi_headers, _ = asgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+    _, wsgi_headers, _ = wsgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+
+    def attributes(headers):
+        return sorted(part.strip() for part in _cookie(headers).split(';')[1:])
+
+    assert attributes(asgi_headers) == attributes(wsgi_headers)
+
+
+def test_result_from_asgi_is_read_by_wsgi_and_back():
+    body = app.json.dumps({'answers': ECZEMA}).encode()
+    _, headers, _ = asgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+    cookie = _session_cookie(headers)
+
+    _, _, result = wsgi_request('GET', '/api/get-result', headers={'Cookie': cookie})
+    assert app.json.loads(result)['disease'] == 'Eczema'
+    _, _, result = asgi_request('GET', '/api/get-result', headers={'Cookie': cookie})
+    assert app.json.loads(result)['user_answers'] == ECZEMA
+
+    _, headers, _ = wsgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+    _, _, result = asgi_request('GET', '/api/get-result', headers={'Cookie': _session_cookie(headers)})
+    assert app.json.loads(result)['disease'] == 'Eczema'
+
+
+def test_reset_clears_the_session():
+    body = app.json.dumps({'answers': ECZEMA}).encode()
+    _, headers, _ = asgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+    _, headers, _ = asgi_request('POST', '/api/reset', headers={'Cookie': _session_cookie(headers)})
+    assert 'Max-Age=0' in _cookie(headers) or 'Expires=Thu, 01 Jan 1970' in _cookie(headers)
+
+
+def test_permanent_session_lifetime_applies(monkeypatch):
+    # An expired cookie is ignored, as the Flask session interface does
+    body = app.json.dumps({'answers': ECZEMA}).encode()
+    _, headers, _ = asgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+    cookie = _session_cookie(headers)
+
+    monkeypatch.setitem(app.config, 'PERMANENT_SESSION_LIFETIME', timedelta(seconds=-1))
+    _, _, result = asgi_request('GET', '/api/get-result', headers={'Cookie': cookie})
+    assert app.json.loads(result)['success'] is False
+
+
+# ============================================
+# REQUEST BODIES
+# ============================================
+
+@pytest.mark.parametrize('length', ['abc', '-1', '1e3', ''])
+def test_bad_content_length_is_rejected(length):
+    status, headers, body = asgi_request('POST', '/api/diagnose', b'{}', {'Content-Length': length,
+                                                                          'Content-Type': JSON})
+    assert status == 400
+    assert dict(headers)['content-type'] == JSON
+    assert app.json.loads(body)['success'] is False
+
+
+def test_large_body_is_rejected_without_reading_it(monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 100)
+    body = app.json.dumps({'answers': ECZEMA}).encode()
+    assert len(body) > 100
+
+    asgi = asgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+    wsgi = wsgi_request('POST', '/api/diagnose', body, {'Content-Type': JSON})
+    assert asgi[0] == wsgi[0] == 413
+    assert asgi[2] == wsgi[2]
+
+
+def test_large_chunked_body_is_rejected(monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 100)
+    body = app.json.dumps({'answers': ECZEMA}).encode()
+    status, _, _ = asgi_request('POST', '/api/diagnose', headers={'Content-Type': JSON},
+                                chunks=[body[:60], body[60:]])
+    assert status == 413
+
+
+def test_chunked_body():
+    body = app.json.dumps({'answers': ECZEMA}).encode()
+    status, _, result = asgi_request('POST', '/api/diagnose', headers={'Content-Type': JSON},
+                                     chunks=[body[:10], body[10:50], body[50:]])
+    assert status == 200
+    assert app.json.loads(result)['disease'] == 'Eczema'
+
+
+# ============================================
+# SCHEDULING AND LIFESPAN
+# ============================================
+
+def test_inline_routes(monkeypatch):
+    import asgi
+    from backend.inference_engine import InferenceEngine
+
+    monkeypatch.setattr(asgi, 'engine', InferenceEngine(compiled=True))
+    # Diagnoses stay off the event loop until the decision table is built
+    assert not runs_inline('POST', '/api/diagnose')
+    asgi.engine.warm_up()
+
+    assert runs_inline('GET', '/api/questions')
+    assert runs_inline('POST', '/api/diagnose')
+    assert not runs_inline('POST', '/api/diagnose/batch')
+    assert not runs_inline('POST', '/api/next-question')
+    assert not runs_inline('GET', '/static/css/style.css')
+
+
+def test_sqlite_store_runs_in_a_thread(monkeypatch, tmp_path):
+    import asgi
+    from backend.result_store import SQLiteResultStore
+
+    monkeypatch.setattr(asgi, 'result_store', SQLiteResultStore(str(tmp_path / 'results.db')))
+    assert runs_inline('GET', '/api/questions')
+    assert not runs_inline('POST', '/api/diagnose')
+
+
+def test_lifespan_warms_up(monkeypatch):
+    import asgi
+    calls = []
+    monkeypatch.setattr(asgi, 'warm_up', lambda: calls.append(True))
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(application({'type': 'lifespan'}, receive, send))
+    assert calls == [True]
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,79 @@
+"""
+Tests for the batch diagnosis endpoint
+"""
+
+import json
+
+import pytest
+
+from app import app, engine, result_store
+from conftest import ECZEMA
+
+NO_DIAGNOSIS = {**ECZEMA, 'itching': 'No'}
+
+
+@pytest.fixture
+def evaluations(monkeypatch):
+    """Encoded records the engine evaluated or looked up, in order"""
+    records = []
+    shared_result = engine._shared_result
+    monkeypatch.setattr(engine, '_shared_result',
+                        lambda record, snapshot: records.append(record) or shared_result(record, snapshot))
+    return records
+
+
+def test_results_in_input_order(client):
+    items = [ECZEMA, NO_DIAGNOSIS, {**ECZEMA, 'lesion_size': 'Smaller than 5mm'}, NO_DIAGNOSIS]
+    data = client.post('/api/diagnose/batch', json=items).get_json()
+
+    assert data['success'] is True
+    assert data['count'] == 4
+    assert data['results'] == [json.loads(json.dumps(engine.diagnose(answers))) for answers in items]
+
+
+def test_answers_key(client):
+    data = client.post('/api/diagnose/batch', json={'answers': [ECZEMA]}).get_json()
+    assert data['results'][0]['disease'] == 'Eczema'
+
+
+def test_identical_answer_sets_share_one_evaluation(client, evaluations):
+    # Selection order does not make a different answer set
+    reordered = {**ECZEMA, 'appearance': list(reversed(ECZEMA['appearance'] + ['Circular']))}
+    items = [ECZEMA, {**ECZEMA, 'appearance': ECZEMA['appearance'] + ['Circular']}, dict(ECZEMA), reordered]
+    data = client.post('/api/diagnose/batch', json=items).get_json()
+
+    assert len(evaluations) == 2
+    assert data['results'][0] == data['results'][2]
+    assert data['results'][1] == data['results'][3]
+
+
+def test_ndjson_in_and_out(client):
+    body = '\n'.join(json.dumps(answers) for answers in (ECZEMA, NO_DIAGNOSIS, ECZEMA)) + '\n\n'
+    response = client.post('/api/diagnose/batch?explanation=ids', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [result['disease'] for result in results] == ['Eczema', None, 'Eczema']
+    assert all(isinstance(rule, str) for rule in results[0]['explanation'])
+
+
+def test_json_body_gets_a_json_response(client):
+    response = client.post('/api/diagnose/batch', json=[ECZEMA])
+    assert response.mimetype == 'application/json'
+
+
+def test_no_session_writes(client):
+    entries = len(result_store._entries)
+    response = client.post('/api/diagnose/batch', json=[ECZEMA, NO_DIAGNOSIS])
+
+    assert response.status_code == 200
+    assert 'Set-Cookie' not in response.headers
+    assert client.get_cookie(app.config['SESSION_COOKIE_NAME']) is None
+    assert len(result_store._entries) == entries
+
+
+def test_empty_batch(client):
+    for response in (client.post('/api/diagnose/batch', json=[]),
+                     client.post('/api/diagnose/batch', data='', content_type='application/x-ndjson')):
+        assert response.get_json()['success'] is False
@@ -0,0 +1,29 @@
+"""
+Tests for the export-static command
+"""
+
+import gzip
+import os
+
+from app import app
+
+
+def test_export_static(tmp_path, client):
+    result = app.test_cli_runner().invoke(args=['export-static', str(tmp_path), '--gzip'])
+    assert result.exit_code == 0, result.output
+
+    for route, path in (('/', 'index.html'), ('/diagnosis', 'diagnosis/index.html'),
+                        ('/documentation', 'documentation/index.html'), ('/report', 'report/index.html')):
+        body = (tmp_path / path).read_bytes()
+        assert body == client.get(route).get_data()
+        assert gzip.decompress((tmp_path / (path + '.gz')).read_bytes()) == body
+
+    for name in os.listdir(app.static_folder):
+        assert (tmp_path / 'static' / name).exists()
+
+
+def test_export_without_gzip(tmp_path):
+    result = app.test_cli_runner().invoke(args=['export-static', str(tmp_path)])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / 'index.html').exists()
+    assert not (tmp_path / 'index.html.gz').exists()
@@ -0,0 +1,46 @@
+"""
+Tests for the result store choice of the gunicorn configuration
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs the configuration file the way gunicorn does and prints the result store
+SCRIPT = "import runpy; runpy.run_path('gunicorn.conf.py'); from config import Config; print(Config.RESULT_STORE)"
+
+
+def _run(**env):
+    environ = {key: value for key, value in os.environ.items() if not key.startswith('SKIN_ES_')}
+    environ.update(env)
+    return subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, env=environ,
+                          capture_output=True, text=True)
+
+
+def test_one_worker_keeps_the_memory_store():
+    process = _run(SKIN_ES_WORKERS='1')
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip() == 'memory'
+
+
+def test_several_workers_default_to_sqlite():
+    process = _run(SKIN_ES_WORKERS='4')
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip() == 'sqlite:' + os.path.join(ROOT, 'instance', 'results.db')
+
+
+@pytest.mark.parametrize('store', ['sqlite:/tmp/results.db', 'file:/tmp/results'])
+def test_several_workers_keep_an_explicit_shared_store(store):
+    process = _run(SKIN_ES_WORKERS='4', SKIN_ES_RESULT_STORE=store)
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip() == store
+
+
+def test_several_workers_refuse_the_memory_store():
+    process = _run(SKIN_ES_WORKERS='4', SKIN_ES_RESULT_STORE='memory')
+    assert process.returncode != 0
+    assert 'SKIN_ES_RESULT_STORE=memory' in process.stderr
@@ -0,0 +1,61 @@
+"""
+Tests for the results of the inference engine: each caller owns its result
+"""
+
+import copy
+import json
+import pickle
+
+import pytest
+
+from backend.inference_engine import InferenceEngine
+from conftest import ECZEMA
+
+PARTIAL = {key: value for key, value in ECZEMA.items() if key != 'age_group'}
+
+
+@pytest.fixture(scope='module')
+def compiled():
+    engine = InferenceEngine(compiled=True)
+    engine.warm_up()
+    return engine
+
+
+def _poison(result):
+    result['disease'] = 'POISON'
+    for key in ('treatment', 'lifestyle', 'diet', 'explanation'):
+        result[key].append('POISON')
+    result['explanation'][0]['rule_id'] = 'POISON'
+
+
+@pytest.mark.parametrize('answers', [ECZEMA, PARTIAL])
+@pytest.mark.parametrize('options', [{}, {'cache_size': 16}, {'compiled': True}])
+def test_changing_a_result_does_not_change_later_results(answers, options, compiled):
+    engine = compiled if options.get('compiled') else InferenceEngine(**options)
+    expected = InferenceEngine().diagnose(answers)
+
+    _poison(engine.diagnose(answers))
+    result, trace = engine.evaluate(answers)
+    _poison(result)
+
+    assert engine.diagnose(answers) == expected
+    assert trace is result['explanation']
+
+
+def test_duplicate_answer_sets_get_their_own_results(compiled):
+    first, second = compiled.diagnose_many([ECZEMA, dict(ECZEMA)])
+
+    assert first == second
+    assert first is not second
+    _poison(first)
+    assert second == compiled.diagnose(ECZEMA)
+
+
+@pytest.mark.parametrize('answers', [ECZEMA, {}])
+def test_results_are_plain_data(answers, compiled):
+    result = compiled.diagnose(answers)
+
+    assert json.loads(json.dumps(result)) == result
+    assert pickle.loads(pickle.dumps(result)) == result
+    assert copy.deepcopy(result) == result
+    assert all(type(step) is dict for step in result['explanation'])
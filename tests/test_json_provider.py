@@ -0,0 +1,56 @@
+"""
+Tests for the app's JSON provider and the compact explanation option
+"""
+
+from flask import flash, get_flashed_messages, session
+
+from app import app
+from conftest import ECZEMA
+
+
+def test_plain_dumps_and_loads():
+    data = {'b': [1, 'é'], 'a': None}
+
+    assert app.json.loads(app.json.dumps(data)) == data
+    assert app.json.loads(app.json.dumps(data).encode('utf-8')) == data
+    assert app.json.dumps(data, sort_keys=True) == '{"a":null,"b":[1,"é"]}'
+
+
+def test_standard_library_options_are_honoured():
+    data = {'a': [1, 'é']}
+
+    assert app.json.dumps(data, separators=(', ', ': '), ensure_ascii=True) == '{"a": [1, "\\u00e9"]}'
+    assert app.json.loads('{"a": 1}', object_hook=lambda obj: sorted(obj)) == ['a']
+
+
+def test_tagged_session_values_survive_a_round_trip(client):
+    with client.session_transaction() as stored:
+        stored['pair'] = ('a', 1)
+        stored['raw'] = b'\x00\xff'
+
+    with client.session_transaction() as stored:
+        assert stored['pair'] == ('a', 1)
+        assert stored['raw'] == b'\x00\xff'
+
+
+def test_flashed_messages_survive_a_round_trip():
+    serializer = app.session_interface.get_signing_serializer(app)
+
+    with app.test_request_context():
+        flash('hi')
+        cookie = serializer.dumps(dict(session))
+
+    with app.test_request_context():
+        session.update(serializer.loads(cookie))
+        assert get_flashed_messages(with_categories=True) == [('message', 'hi')]
+
+
+def test_explanation_ids(client):
+    full = client.post('/api/diagnose', json={'answers': ECZEMA}).get_json()
+    compact = client.post('/api/diagnose?explanation=ids', json={'answers': ECZEMA}).get_json()
+    in_body = client.post('/api/diagnose', json={'answers': ECZEMA, 'explanation': 'ids'}).get_json()
+
+    assert compact['explanation'] == [rule['rule_id'] for rule in full['explanation']]
+    assert in_body == compact
+    assert {key: value for key, value in compact.items() if key != 'explanation'} == \
+        {key: value for key, value in full.items() if key != 'explanation'}
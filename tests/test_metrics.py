@@ -0,0 +1,66 @@
+"""
+Tests for the /metrics endpoint
+"""
+
+import re
+
+import pytest
+
+from app import engine
+from backend.metrics import EngineMetrics
+from conftest import ECZEMA
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{([a-zA-Z_]+="[^"]*",?)*\})? (-?[0-9.e+-]+|\+Inf|NaN)$')
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    monkeypatch.setattr(engine, 'metrics', EngineMetrics())
+    return engine.metrics
+
+
+def _samples(text):
+    """(name, labels, value) of every sample, checking each has a declared type"""
+    types = {}
+    samples = []
+
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert kind in ('counter', 'gauge', 'histogram')
+            types[name] = kind
+            continue
+        if line.startswith('# HELP '):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name = match.group(1)
+        family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in types else name
+        assert family in types, line
+        samples.append((name, match.group(2) or '', float(match.group(4))))
+
+    return samples
+
+
+def test_disabled_by_default(client):
+    assert engine.metrics is None
+    assert client.get('/metrics').status_code == 404
+
+
+def test_exposition(client, metrics):
+    client.post('/api/diagnose', json={'answers': ECZEMA})
+    client.post('/api/diagnose', json={'answers': {**ECZEMA, 'itching': 'No'}})
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    samples = _samples(response.get_data(as_text=True))
+    values = {(name, labels): value for name, labels, value in samples}
+
+    assert values[('skin_es_diagnoses_total', '')] == 2
+    assert values[('skin_es_no_diagnosis_total', '')] == 1
+    assert values[('skin_es_diagnosis_seconds_count', '')] == 2
+    buckets = [value for name, _, value in samples if name == 'skin_es_diagnosis_seconds_bucket']
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 2
+    assert f'version="{engine.version}"' in response.get_data(as_text=True)
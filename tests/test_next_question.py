@@ -0,0 +1,39 @@
+"""
+Tests for the adaptive questionnaire endpoint
+"""
+
+import pytest
+
+from conftest import ECZEMA
+
+
+def test_first_question(client):
+    for response in (client.post('/api/next-question', json={}),
+                     client.post('/api/next-question', json={'answers': {}}),
+                     client.post('/api/next-question')):
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['complete'] is False
+        assert data['question']['id']
+
+
+def test_complete_answers_give_the_diagnosis(client):
+    data = client.post('/api/next-question', json={'answers': ECZEMA}).get_json()
+    assert data['complete'] is True
+    assert data['result']['disease'] == 'Eczema'
+
+
+@pytest.mark.parametrize('body, content_type, code', [
+    (b'{"answers": ', 'application/json', 'invalid_json'),
+    (b'answers=itching', 'application/x-www-form-urlencoded', 'invalid_json'),
+    (b'["itching"]', 'application/json', 'invalid_type'),
+    (b'"itching"', 'application/json', 'invalid_type'),
+    (b'{"answers": ["itching"]}', 'application/json', 'invalid_type'),
+    (b'{"answers": {"itching": "Maybe"}}', 'application/json', 'invalid_value'),
+])
+def test_malformed_body_is_rejected(client, body, content_type, code):
+    response = client.post('/api/next-question', data=body, content_type=content_type)
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['success'] is False
+    assert [error['code'] for error in data['errors']] == [code]
@@ -0,0 +1,46 @@
+"""
+Tests for the cached questions, documentation and recommendation details payloads
+"""
+
+import pytest
+
+from backend.knowledge_loader import KnowledgeBase, default_knowledge_base
+
+PAYLOADS = ['/api/questions', '/api/documentation', '/api/recommendation-details']
+
+
+@pytest.mark.parametrize('path', PAYLOADS)
+def test_payloads_are_revalidated(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+    assert response.cache_control.max_age is None
+    assert response.headers['ETag']
+
+    revalidated = client.get(path, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.cache_control.no_cache
+
+
+def test_gzip_payload_has_its_own_etag(client):
+    plain = client.get('/api/questions')
+    compressed = client.get('/api/questions', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.content_encoding == 'gzip'
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert 'Accept-Encoding' in compressed.vary
+
+
+def test_reload_changes_the_etag(client):
+    from app import engine
+
+    before = client.get('/api/questions')
+    data = default_knowledge_base().to_dict()
+    data['questions'][0]['question'] = 'Changed question?'
+    try:
+        assert engine.reload(KnowledgeBase(data))
+        after = client.get('/api/questions', headers={'If-None-Match': before.headers['ETag']})
+        assert after.status_code == 200
+        assert after.headers['ETag'] != before.headers['ETag']
+        assert b'Changed question?' in after.data
+    finally:
+        engine.reload(default_knowledge_base())
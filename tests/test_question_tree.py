@@ -0,0 +1,110 @@
+"""
+Tests for the question tree: answers, and how many nodes it builds
+"""
+
+import random
+import time
+
+import pytest
+
+from backend.inference_engine import InferenceEngine
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return InferenceEngine(compiled=True)
+
+
+@pytest.fixture
+def tree(engine):
+    """A fresh tree over the engine's decision table"""
+    snapshot = engine._snapshot
+    snapshot.question_tree = None
+    return engine._question_tree(snapshot)
+
+
+def _walk(engine, answers):
+    """Follow the tree's questions with one complete answer set"""
+    given = {}
+    step = engine.next_question(given)
+    while not step['complete']:
+        question = step['question']['id']
+        given[question] = answers[question]
+        step = engine.next_question(given)
+    return given, step
+
+
+def test_stops_on_the_diagnosis(engine, tree):
+    rng = random.Random(3)
+    codes = list(engine.codec.iter_codes())
+    for _ in range(200):
+        answers = engine.codec.unpack(rng.choice(codes))
+        given, step = _walk(engine, answers)
+        assert step['result'] == engine.diagnose(answers)
+        assert len(given) <= len(answers)
+
+
+def test_walk_builds_one_node_per_answer(engine, tree):
+    answers = engine.codec.unpack(next(iter(engine.codec.iter_codes())))
+    built = tree.built
+    given, _ = _walk(engine, answers)
+    assert tree.built - built == len(given)
+
+    # The same walk again is answered from memoized nodes
+    built = tree.built
+    _walk(engine, answers)
+    assert tree.built == built
+
+
+def test_expand_precomputes_the_top_levels(engine, tree):
+    count = tree.expand(4)
+    assert tree.built == count
+    assert count > 1000
+
+    # Every walk of up to four answers is answered without building a node
+    rng = random.Random(4)
+    codes = list(engine.codec.iter_codes())
+    for _ in range(200):
+        answers = engine.codec.unpack(rng.choice(codes))
+        given = {}
+        step = engine.next_question(given)
+        while not step['complete'] and len(given) < 4:
+            question = step['question']['id']
+            given[question] = answers[question]
+            step = engine.next_question(given)
+    assert tree.built == count
+
+
+def test_whole_reachable_tree_builds_each_node_once(engine, tree):
+    start = time.perf_counter()
+    count = tree.expand(len(tree.fields))
+    # Children are built from their parent's answer sets: a few seconds,
+    # where filtering the whole table for every node took minutes
+    assert time.perf_counter() - start < 30
+    assert count == tree.built
+    # One more level adds nothing: every path has reached a fixed outcome
+    assert tree.expand(len(tree.fields) + 1) == count
+    assert tree.built == count
+
+
+def test_answers_outside_the_tree_order(engine, tree):
+    answers = engine.codec.unpack(next(iter(engine.codec.iter_codes())))
+    root_question = tree.root['question']
+    partial = {field: value for field, value in answers.items() if field != root_question}
+
+    step = engine.next_question(partial)
+    assert step['complete'] or step['question']['id'] == root_question
+    built = tree.built
+    assert engine.next_question(partial) == step
+    assert tree.built == built
+
+
+def test_warm_up_builds_the_table_and_the_top_levels():
+    engine = InferenceEngine(compiled=True)
+    assert engine._snapshot.decision_table is None
+    assert engine._snapshot.question_tree is None
+
+    engine.warm_up()
+    tree = engine._snapshot.question_tree
+    assert engine._snapshot.decision_table is not None
+    assert tree.built == tree.expand(4)
@@ -0,0 +1,40 @@
+"""
+Tests for the recommendation details catalog and the ?details=true option
+"""
+
+from app import engine
+from conftest import ECZEMA
+
+
+def test_catalog(client):
+    response = client.get('/api/recommendation-details')
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data['success'] is True
+    assert data['details'] == engine.knowledge_base.recommendation_details
+
+
+def test_details_match_the_fired_conclusions(client):
+    catalog = engine.knowledge_base.recommendation_details
+    plain = client.post('/api/diagnose', json={'answers': ECZEMA}).get_json()
+    data = client.post('/api/diagnose?details=true', json={'answers': ECZEMA}).get_json()
+
+    assert 'details' not in plain
+    assert {key: value for key, value in data.items() if key != 'details'} == plain
+    assert set(data['details']) == {'treatment', 'lifestyle', 'diet'}
+    for kind, details in data['details'].items():
+        assert details
+        assert set(details) == {item for item in data[kind] if item in catalog[kind]}
+        assert all(details[item] == catalog[kind][item] for item in details)
+
+
+def test_details_in_the_body(client):
+    data = client.post('/api/diagnose', json={'answers': ECZEMA, 'details': True}).get_json()
+    assert data['details']['treatment']
+
+
+def test_no_diagnosis_has_empty_details(client):
+    data = client.post('/api/diagnose?details=true', json={'answers': {**ECZEMA, 'itching': 'No'}}).get_json()
+    assert data['disease'] is None
+    assert data['details'] == {'treatment': {}, 'lifestyle': {}, 'diet': {}}
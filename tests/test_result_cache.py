@@ -0,0 +1,84 @@
+"""
+Tests for the LRU result cache and its invalidation on knowledge base reload
+"""
+
+import pytest
+
+from backend.inference_engine import InferenceEngine
+from backend.knowledge_loader import KnowledgeBase, default_knowledge_base
+from backend.result_cache import ResultCache
+from conftest import ECZEMA
+
+
+def test_hits_and_misses():
+    cache = ResultCache(4)
+    assert cache.get('a') is None
+    cache.put('a', {'n': 1}, cache.generation)
+    assert cache.get('a') == {'n': 1}
+    assert cache.get('a') == {'n': 1}
+    assert cache.get('b') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (2, 2, 0, 1)
+
+
+def test_evicts_least_recently_used():
+    cache = ResultCache(2)
+    cache.put('a', 1, cache.generation)
+    cache.put('b', 2, cache.generation)
+    cache.get('a')
+    cache.put('c', 3, cache.generation)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+
+def test_clear_drops_results_of_the_previous_generation():
+    cache = ResultCache(4)
+    generation = cache.generation
+    cache.put('a', 1, generation)
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.generation == generation + 1
+    # A request that started before the clear cannot store its stale result
+    cache.put('b', 2, generation)
+    assert cache.get('b') is None
+
+
+def test_size_must_be_positive():
+    with pytest.raises(ValueError):
+        ResultCache(0)
+
+
+def test_engine_counts_hits_and_misses():
+    engine = InferenceEngine(cache_size=16)
+    first = engine.diagnose(ECZEMA)
+    second = engine.diagnose(dict(ECZEMA))
+
+    assert second == first
+    assert second is not first
+    stats = engine.cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+
+
+def test_reload_invalidates_cached_results():
+    engine = InferenceEngine(cache_size=16)
+    assert engine.diagnose(ECZEMA)['disease_description'].startswith('A chronic')
+
+    data = default_knowledge_base().to_dict()
+    data['disease_info']['Eczema']['description'] = 'Changed description'
+    assert engine.reload(KnowledgeBase(data))
+
+    assert len(engine.cache) == 0
+    assert engine.diagnose(ECZEMA)['disease_description'] == 'Changed description'
+
+
+def test_reload_of_the_same_version_keeps_the_cache():
+    engine = InferenceEngine(cache_size=16)
+    engine.diagnose(ECZEMA)
+    assert not engine.reload(default_knowledge_base())
+    assert len(engine.cache) == 1
@@ -0,0 +1,118 @@
+"""
+Tests for the memory, SQLite and file result stores
+"""
+
+import os
+import time
+
+import pytest
+
+from backend.result_store import (
+    FileResultStore, MemoryResultStore, SQLiteResultStore, create_result_store
+)
+
+RESULT = {
+    'answers': {'itching': 'Yes', 'appearance': ['Scaly / Flaky']},
+    'result': {'disease': 'Eczema', 'treatment': ['Topical Corticosteroid']}
+}
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'file'])
+def make_store(request, tmp_path):
+    """Factory of stores of one backend, taking the TTL"""
+    def make(ttl=3600):
+        if request.param == 'memory':
+            return MemoryResultStore(ttl)
+        if request.param == 'sqlite':
+            return SQLiteResultStore(str(tmp_path / 'results.db'), ttl)
+        return FileResultStore(str(tmp_path / 'results'), ttl)
+    return make
+
+
+def test_put_get(make_store):
+    store = make_store()
+    result_id = store.put(RESULT)
+    assert store.get(result_id) == RESULT
+
+
+def test_ids_are_unique(make_store):
+    store = make_store()
+    first, second = store.put(RESULT), store.put({'other': 1})
+    assert first != second
+    assert store.get(first) == RESULT
+    assert store.get(second) == {'other': 1}
+
+
+def test_overwrite_in_place(make_store):
+    store = make_store()
+    result_id = store.put(RESULT)
+    other = store.put({'other': 1})
+
+    assert store.put({'n': 2}, result_id) == result_id
+    assert store.get(result_id) == {'n': 2}
+    assert store.get(other) == {'other': 1}
+
+
+def test_unknown_id(make_store):
+    store = make_store()
+    assert store.get('unknown') is None
+    assert store.get('../../etc/passwd') is None
+
+
+def test_delete(make_store):
+    store = make_store()
+    result_id = store.put(RESULT)
+    store.delete(result_id)
+    assert store.get(result_id) is None
+    # Deleting twice, or an unknown id, is not an error
+    store.delete(result_id)
+    store.delete('unknown')
+
+
+def test_expiry(make_store, monkeypatch):
+    store = make_store(ttl=60)
+    result_id = store.put(RESULT)
+    now = time.time()
+
+    monkeypatch.setattr(time, 'time', lambda: now + 30)
+    assert store.get(result_id) == RESULT
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    assert store.get(result_id) is None
+
+
+def test_sqlite_creates_parent_directory(tmp_path):
+    path = tmp_path / 'instance' / 'nested' / 'results.db'
+    store = create_result_store(f'sqlite:{path}')
+    assert os.path.exists(path)
+    assert store.get(store.put(RESULT)) == RESULT
+
+
+def test_file_creates_directory(tmp_path):
+    directory = tmp_path / 'instance' / 'results'
+    store = create_result_store(f'file:{directory}')
+    assert os.path.isdir(directory)
+    assert store.get(store.put(RESULT)) == RESULT
+
+
+def test_memory_evicts_oldest():
+    store = MemoryResultStore(max_entries=2)
+    first = store.put({'n': 1})
+    second, third = store.put({'n': 2}), store.put({'n': 3})
+    assert store.get(first) is None
+    assert store.get(second) == {'n': 2}
+    assert store.get(third) == {'n': 3}
+
+
+def test_memory_overwrite_is_not_evicted_first():
+    store = MemoryResultStore(max_entries=2)
+    first, second = store.put({'n': 1}), store.put({'n': 2})
+    store.put({'n': 3}, first)
+    third = store.put({'n': 4})
+    assert store.get(first) == {'n': 3}
+    assert store.get(second) is None
+    assert store.get(third) == {'n': 4}
+
+
+def test_unknown_store():
+    with pytest.raises(ValueError):
+        create_result_store('redis://localhost')
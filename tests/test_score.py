@@ -0,0 +1,100 @@
+"""
+Tests for the offline scoring CLI
+"""
+
+import io
+import json
+
+import pytest
+
+from backend import score
+from backend.inference_engine import InferenceEngine
+from conftest import ECZEMA
+
+CSV = (
+    'id,age_group,allergy,itching,burning_sensation,pain,appearance,lesion_size\n'
+    'a,Adult,None,Yes,No,No,Scaly / Flaky,Larger than 5mm\n'
+    'b,Adult,None,No,No,No,Circular | Scaly / Flaky,Smaller than 5mm\n'
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_engine(monkeypatch):
+    """Each test starts without the engine of the previous one"""
+    monkeypatch.setattr(score, '_engine', None)
+
+
+def _records(count):
+    return [{'id': index, **ECZEMA} if index % 3 else {'id': index, **ECZEMA, 'itching': 'No'}
+            for index in range(count)]
+
+
+def _scored(records, **options):
+    output = io.StringIO()
+    count = score.score(iter(records), output, **options)
+    return count, output.getvalue()
+
+
+def test_read_ndjson_marks_invalid_lines():
+    lines = ['{"id": 1}\n', '\n', 'not json\n', '[1, 2]\n', '{"id": 2}\n']
+    assert list(score.read_ndjson(lines)) == [{'id': 1}, None, None, {'id': 2}]
+
+
+def test_read_csv_splits_appearance():
+    records = list(score.read_csv(io.StringIO(CSV)))
+    assert records[0]['appearance'] == ['Scaly / Flaky']
+    assert records[1]['appearance'] == ['Circular', 'Scaly / Flaky']
+    assert records[1]['lesion_size'] == 'Smaller than 5mm'
+
+
+def test_ndjson_output_in_input_order():
+    records = _records(25) + [None]
+    count, text = _scored(records, chunk_size=4)
+    lines = [json.loads(line) for line in text.splitlines()]
+    engine = InferenceEngine()
+
+    assert count == 26
+    assert [line['id'] for line in lines] == list(range(25)) + [None]
+    for record, line in zip(records[:-1], lines):
+        assert {key: value for key, value in line.items() if key != 'id'} == engine.diagnose(record)
+    assert lines[-1] == {'id': None, 'success': False, 'message': 'Invalid record'}
+
+
+def test_csv_output():
+    _, text = _scored(score.read_csv(io.StringIO(CSV)), output_format='csv')
+    lines = text.splitlines()
+
+    assert lines[0] == ','.join(score.OUTPUT_COLUMNS)
+    assert lines[1].startswith('a,True,Eczema,')
+    assert len(lines) == 3
+
+
+def test_workers_give_the_serial_output():
+    records = _records(40)
+    assert _scored(records, workers=2, chunk_size=3) == _scored(records)
+
+
+def test_compiled_builds_the_table_before_the_pool(monkeypatch):
+    built = []
+
+    class Pool:
+        def __init__(self, *args, **kwargs):
+            built.append(score._engine._snapshot.decision_table is not None)
+            raise RuntimeError('stop')
+
+    monkeypatch.setattr(score, 'ProcessPoolExecutor', Pool)
+    with pytest.raises(RuntimeError):
+        _scored(_records(5), workers=2, compiled=True)
+    assert built == [True]
+
+
+def test_main_with_files(tmp_path, capsys):
+    source = tmp_path / 'intake.csv'
+    source.write_text(CSV, encoding='utf-8')
+    target = tmp_path / 'scored.ndjson'
+
+    assert score.main([str(source), '-o', str(target), '--compiled']) == 0
+    lines = [json.loads(line) for line in target.read_text(encoding='utf-8').splitlines()]
+    assert [line['id'] for line in lines] == ['a', 'b']
+    assert lines[0]['disease'] == 'Eczema'
+    assert 'Scored 2 records' in capsys.readouterr().err
@@ -0,0 +1,41 @@
+"""
+Runs the self-checks of backend.selfcheck with smaller samples, so that the
+decision table proof and the concurrency stress test are part of the suite
+"""
+
+import pytest
+
+from backend import columnar, selfcheck
+
+
+def test_decision_table():
+    assert selfcheck.check_decision_table() == []
+
+
+def test_compiled_predicates():
+    assert selfcheck.check_compiled_predicates(samples=2000, stride=7) == []
+
+
+def test_concurrent_diagnose():
+    assert selfcheck.check_concurrent_diagnose(workers=8, requests=2000) == []
+
+
+def test_incremental_matcher():
+    assert selfcheck.check_incremental_matcher(sessions=300) == []
+
+
+def test_question_tree():
+    assert selfcheck.check_question_tree(sessions=100) == []
+
+
+def test_metrics():
+    assert selfcheck.check_metrics(samples=1000) == []
+
+
+def test_rule_order():
+    assert selfcheck.check_rule_order() == []
+
+
+@pytest.mark.skipif(columnar.np is None, reason='NumPy is not installed')
+def test_columnar():
+    assert selfcheck.check_columnar(samples=1000) == []
@@ -0,0 +1,112 @@
+"""
+Tests for the step-by-step session API, including overlapping pushes
+"""
+
+from app import app, result_store
+from backend.inference_engine import InferenceEngine
+from conftest import ECZEMA
+
+UNANSWERED = dict.fromkeys(
+    ['age_group', 'allergy', 'itching', 'burning_sensation', 'pain', 'appearance', 'lesion_size']
+)
+
+
+def _session(client):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return app.session_interface.get_signing_serializer(app).loads(cookie.value)
+
+
+def _stored_answers(client):
+    return result_store.get(_session(client)['match_id'])['state']['answers']
+
+
+def _overlapping(client, first, second):
+    """
+    Send two pushes with the same session cookie, as a browser does when
+    the second is sent before the first one's response arrived
+    """
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME']).value
+    other = app.test_client()
+    other.set_cookie(app.config['SESSION_COOKIE_NAME'], cookie)
+
+    client.post('/api/session/answer', json={'answers': first})
+    return other, other.post('/api/session/answer', json={'answers': second}).get_json()
+
+
+def test_progress(client):
+    data = client.post('/api/session/answer', json={'answers': {**UNANSWERED, 'itching': 'Yes'}}).get_json()
+    assert data['success'] is True
+    assert data['complete'] is False
+    assert data['possible_diseases']
+    assert _stored_answers(client) == {'itching': 'Yes'}
+
+
+def test_complete_answers_store_the_result(client):
+    data = client.post('/api/session/answer', json={'answers': ECZEMA}).get_json()
+    assert data['complete'] is True
+    assert data['result']['disease'] == 'Eczema'
+    assert client.get('/api/get-result').get_json()['disease'] == 'Eczema'
+
+
+def test_pushes_overwrite_one_stored_state(client):
+    client.post('/api/session/answer', json={'answers': {'age_group': 'Adult'}})
+    match_id = _session(client)['match_id']
+    entries = len(result_store._entries)
+
+    for value in ('Yes', 'No', 'Yes'):
+        client.post('/api/session/answer', json={'answers': {**UNANSWERED, 'age_group': 'Adult', 'itching': value}})
+
+    assert _session(client)['match_id'] == match_id
+    assert len(result_store._entries) == entries
+    assert _stored_answers(client) == {'age_group': 'Adult', 'itching': 'Yes'}
+
+
+def test_overlapping_pushes_share_the_stored_state(client):
+    client.post('/api/session/answer', json={'answers': {'age_group': 'Adult'}})
+
+    # The cookie only holds the id, so the later push builds on the state
+    # the earlier one stored
+    other, _ = _overlapping(client, {'itching': 'Yes'}, {'pain': 'No'})
+    assert _session(other)['match_id'] == _session(client)['match_id']
+    assert _stored_answers(other) == {'age_group': 'Adult', 'itching': 'Yes', 'pain': 'No'}
+
+
+def test_overlapping_full_form_pushes_lose_no_answer(client):
+    form = {**UNANSWERED, 'age_group': 'Adult'}
+    client.post('/api/session/answer', json={'answers': form})
+
+    # The page sends the whole form, so the later push carries every answer
+    form_first = {**form, 'itching': 'Yes'}
+    form_second = {**form_first, 'pain': 'No'}
+    other, data = _overlapping(client, form_first, form_second)
+    assert data['success'] is True
+    assert _stored_answers(other) == {'age_group': 'Adult', 'itching': 'Yes', 'pain': 'No'}
+
+
+def test_retract_answer(client):
+    client.post('/api/session/answer', json={'answers': {'itching': 'Yes', 'pain': 'No'}})
+    client.post('/api/session/answer', json={'answers': {**UNANSWERED, 'pain': 'No'}})
+    assert _stored_answers(client) == {'pain': 'No'}
+
+
+def test_invalid_push(client):
+    response = client.post('/api/session/answer', json={'answers': {'itching': 'Maybe'}})
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['code'] == 'invalid_value'
+
+
+def test_unchanged_answers_are_not_rechecked(monkeypatch):
+    matcher = InferenceEngine()._snapshot.matcher
+    form = {**UNANSWERED, **ECZEMA, 'pain': None}
+    state = matcher.assert_facts(matcher.start(), form)
+
+    checked = []
+    check = matcher._check
+    monkeypatch.setattr(matcher, '_check', lambda position, *args: checked.append(position) or check(position, *args))
+    changed = matcher.assert_facts(state, {**form, 'pain': 'No'})
+
+    # Eczema is decided either way, so only the rules testing pain are re-checked
+    assert state['disease'] == changed['disease'] == 'Eczema'
+    assert sorted(set(checked)) == matcher.alpha['pain']
+    assert changed == matcher.assert_facts(matcher.start(), ECZEMA)
+    assert matcher.assert_facts(state, form) == state
@@ -0,0 +1,113 @@
+"""
+Tests for answer validation, directly and through /api/diagnose and
+/api/diagnose/batch
+"""
+
+import pytest
+
+from backend.knowledge_base import INPUT_VARIABLES
+from backend.validation import AnswerValidator
+from conftest import ECZEMA
+
+APPEARANCES = [variable for variable in INPUT_VARIABLES['lesion_appearance'] if variable['id'] == 'appearance'][0]['values']
+
+# (answers, field, code) of each kind of invalid answer
+INVALID = [
+    (['itching'], None, 'invalid_type'),
+    ('itching', None, 'invalid_type'),
+    ({**ECZEMA, 'fever': 'Yes'}, 'fever', 'unknown_field'),
+    ({**ECZEMA, 'itching': 'Maybe'}, 'itching', 'invalid_value'),
+    ({**ECZEMA, 'itching': ['Yes']}, 'itching', 'invalid_value'),
+    ({**ECZEMA, 'itching': 1}, 'itching', 'invalid_value'),
+    ({**ECZEMA, 'appearance': 'Scaly / Flaky'}, 'appearance', 'invalid_type'),
+    ({**ECZEMA, 'appearance': ['Glowing']}, 'appearance', 'invalid_value'),
+    ({**ECZEMA, 'appearance': [1]}, 'appearance', 'invalid_value'),
+    ({**ECZEMA, 'appearance': APPEARANCES + ['Circular']}, 'appearance', 'too_many_values'),
+    ({**ECZEMA, 'appearance': ['Circular', 'Circular']}, 'appearance', 'duplicate_value'),
+]
+
+
+@pytest.fixture(scope='module')
+def validator():
+    return AnswerValidator(INPUT_VARIABLES)
+
+
+def test_valid_answers(validator):
+    assert validator.validate(ECZEMA) == []
+    assert validator.validate({'itching': 'Yes'}) == []
+    assert validator.validate({**ECZEMA, 'appearance': list(APPEARANCES)}) == []
+
+
+def test_null_means_unanswered(validator):
+    assert validator.validate({**ECZEMA, 'pain': None, 'appearance': None}) == []
+
+
+@pytest.mark.parametrize('answers, field, code', INVALID)
+def test_error_codes(validator, answers, field, code):
+    errors = validator.validate(answers)
+    assert [(error['field'], error['code']) for error in errors] == [(field, code)]
+    assert errors[0]['message']
+
+
+def test_every_invalid_field_is_reported(validator):
+    errors = validator.validate({'fever': 'Yes', 'itching': 'Maybe', 'pain': None})
+    assert [(error['field'], error['code']) for error in errors] == [
+        ('fever', 'unknown_field'), ('itching', 'invalid_value')
+    ]
+
+
+# ============================================
+# HTTP
+# ============================================
+
+@pytest.mark.parametrize('answers, field, code', INVALID[2:])
+def test_diagnose_rejects_invalid_answers(client, answers, field, code):
+    response = client.post('/api/diagnose', json={'answers': answers})
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['success'] is False
+    assert [(error['field'], error['code']) for error in data['errors']] == [(field, code)]
+
+
+def test_diagnose_rejects_non_object_answers(client):
+    response = client.post('/api/diagnose', json={'answers': ['itching']})
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['code'] == 'invalid_type'
+
+
+def test_diagnose_rejection_writes_no_session(client):
+    response = client.post('/api/diagnose', json={'answers': {**ECZEMA, 'itching': 'Maybe'}})
+    assert response.status_code == 400
+    assert 'Set-Cookie' not in response.headers
+    assert client.get('/api/get-result').get_json()['success'] is False
+
+
+def test_diagnose_accepts_null_as_unanswered(client):
+    response = client.post('/api/diagnose', json={'answers': {**ECZEMA, 'pain': None}})
+    assert response.status_code == 200
+    assert response.get_json()['disease'] == 'Eczema'
+
+
+@pytest.mark.parametrize('answers, field, code', INVALID)
+def test_batch_rejects_invalid_answers(client, answers, field, code):
+    response = client.post('/api/diagnose/batch', json=[ECZEMA, answers])
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['invalid_indexes'] == [1]
+    assert [(error['field'], error['code']) for error in data['errors'][0]['errors']] == [(field, code)]
+
+
+def test_batch_rejects_invalid_ndjson_lines(client):
+    body = b'{"itching": "Yes"}\n{"itching": "Maybe"}\nnot json\n'
+    response = client.post('/api/diagnose/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['invalid_indexes'] == [1, 2]
+    assert data['errors'][0]['errors'][0]['code'] == 'invalid_value'
+    assert data['errors'][1]['errors'][0]['code'] == 'invalid_type'
+
+
+def test_batch_accepts_null_as_unanswered(client):
+    response = client.post('/api/diagnose/batch', json=[ECZEMA, {**ECZEMA, 'pain': None}])
+    assert response.status_code == 200
+    assert [result['disease'] for result in response.get_json()['results']] == ['Eczema', 'Eczema']